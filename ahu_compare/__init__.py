@@ -0,0 +1,34 @@
+"""Shared data layer for the AHU comparison apps."""
+from .cascade import EMPTY_NODE, CascadeIndex, CascadeNode
+from .comparison import (
+    MISSING_VALUE,
+    ComparisonMatrix,
+    RowReader,
+    build_matrix,
+    comparison_csv,
+    comparison_rows,
+    comparison_sheet,
+    display_items,
+    excluded_columns,
+    matrix_from_columns,
+    unit_column,
+)
+from .diff import EditionDiff, diff_columns, edition_diff
+from .engine import ComparisonResult, Dataset, SimilarUnit, SizedUnit, compare, default_dataset
+from .loader import (
+    DEFAULT_SHEET,
+    DEFAULT_WORKBOOK,
+    catalogue_version,
+    load_catalogue,
+    read_workbook,
+)
+from .reload import DatasetHandle
+from .render import UNIT_COLORS, group_table_items, render_table_html, table_css, unit_color
+from .schema import FIELD_ALIASES, HEADER_TRIGGERS, Schema, resolve_schema
+from .selection import CASCADE_FIELDS, Selection, branch_column, resolve_node, selection_from_values
+from .similar import SIMILARITY_FEATURES, SimilarityIndex
+from .sizes import SizeAreaTable
+from .sizing import RANKINGS, SIZING_FILTERS, AirflowIndex
+from .specs import SpecColumn, SpecTable, parse_spec
+from .units import UnitState, UnitStates
+from .xlsx import comparison_xlsx, write_comparison_xlsx
@@ -0,0 +1,186 @@
+"""Stage timings of the comparison hot path.
+
+``run_benchmarks`` times, for the real catalogue and copies of it scaled by
+``synthetic.scale_catalogue``:
+
+* ``load.xlsx`` - parsing the workbook (unscaled, skipped for a Feather catalogue)
+* ``load.snapshot`` - reading the Feather snapshot of the (scaled) frame
+* ``cascade.build`` - building the sidebar ``CascadeIndex``
+* ``cascade.select`` - resolving the selections of every unit
+* ``compare`` - ``Dataset.compare``, matrix and layout
+* ``display_items`` - the page layout alone
+* ``csv`` - the CSV export
+* ``chart.<name>`` - each chart, built uncached (skipped without Plotly)
+
+for 2..10 compared units, with selections drawn from a seeded generator so
+runs are reproducible.  Results are plain dicts, written as JSON by the
+``bench`` command; ``compare_results`` lines a run up against a baseline.
+"""
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .cascade import CascadeIndex
+from .comparison import comparison_csv, display_items
+from .engine import Dataset
+from .loader import (
+    DEFAULT_SHEET,
+    DEFAULT_WORKBOOK,
+    catalogue_version,
+    is_columnar,
+    read_snapshot,
+    read_workbook,
+    write_snapshot,
+)
+from .selection import PLATE_RECOVERIES, RRG, Selection
+from .synthetic import scale_catalogue
+
+try:
+    from . import charts
+except ImportError:  # pragma: no cover - Plotly is optional here
+    charts = None
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_UNITS = tuple(range(2, 11))
+
+
+def timed(func, repeat):
+    """Run ``func`` ``repeat`` times; return per-run timings in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def _record(results, scale, rows, stage, units, times):
+    results.append({
+        "scale": scale, "rows": rows, "stage": stage, "units": units, "repeat": len(times),
+        "min_ms": round(min(times), 4), "median_ms": round(statistics.median(times), 4),
+        "mean_ms": round(statistics.fmean(times), 4),
+    })
+
+
+def sample_selections(dataset, count, seed):
+    """``count`` selections of random catalogue rows."""
+    df, schema = dataset.frame, dataset.schema
+    rng = random.Random(seed)
+    selections = []
+    for pos in rng.sample(range(len(df)), min(count, len(df))):
+        row = df.iloc[pos]
+        recovery = row[schema.recovery]
+        selections.append(Selection(
+            year=row[schema.year], quarter=row[schema.quarter], region=row[schema.region],
+            brand=row[schema.brand], unit=row[schema.unit_name], recovery=recovery, size=row[schema.size],
+            type=row[schema.type] if recovery == RRG and schema.type else None,
+            material=row[schema.material] if recovery in PLATE_RECOVERIES and schema.material else None,
+        ))
+    return selections
+
+
+def _bench_frame(results, dataset, scale, units, repeat, seed):
+    df, schema = dataset.frame, dataset.schema
+    rows = len(df)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "catalogue.feather")
+        write_snapshot(df, snapshot)
+        _record(results, scale, rows, "load.snapshot", None, timed(lambda: read_snapshot(snapshot), repeat))
+
+    branches = [schema.type, schema.material]
+    _record(results, scale, rows, "cascade.build", None,
+            timed(lambda: CascadeIndex(df, schema.cascade_levels, branches=branches), repeat))
+    # Build the dataset's own derived structures outside the timed stages
+    dataset.warm()
+
+    for n in units:
+        selections = sample_selections(dataset, n, seed + n)
+        _record(results, scale, rows, "cascade.select", n,
+                timed(lambda: [dataset.node(s) for s in selections], repeat))
+        _record(results, scale, rows, "compare", n, timed(lambda: dataset.compare(selections), repeat))
+        result = dataset.compare(selections)
+        _record(results, scale, rows, "display_items", n,
+                timed(lambda: display_items(result.matrix, schema), repeat))
+        _record(results, scale, rows, "csv", n, timed(lambda: comparison_csv(result.matrix), repeat))
+        if charts is None:
+            continue
+        for name in charts.CHART_NAMES:
+            # Traces built afresh each time, as on a miss of the app's TraceCache
+            _record(results, scale, rows, f"chart.{name}", n, timed(
+                lambda: charts.TraceCache().figure(dataset, name, result.selections, row_positions=result.row_positions),
+                repeat))
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, scales=DEFAULT_SCALES,
+                   units=DEFAULT_UNITS, repeat=5, seed=0, progress=None):
+    """Time every stage; returns ``{"meta": {...}, "results": [...]}``."""
+    results = []
+    base = Dataset.load(path, sheet_name)
+    if not is_columnar(path):
+        _record(results, 1, len(base.frame), "load.xlsx", None,
+                timed(lambda: read_workbook(path, sheet_name), max(1, min(repeat, 3))))
+
+    for scale in scales:
+        if progress:
+            progress(f"scale {scale}x")
+        if scale == 1:
+            dataset = Dataset(base.frame, base.version, path, sheet_name)
+        else:
+            frame = scale_catalogue(base.frame, base.schema, scale)
+            dataset = Dataset(frame, f"{base.version}-x{scale}", path, sheet_name)
+        _bench_frame(results, dataset, scale, units, repeat, seed)
+
+    meta = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "workbook": os.path.basename(path),
+        "catalogue_version": catalogue_version(path),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "seed": seed,
+    }
+    return {"meta": meta, "results": results}
+
+
+def _key(entry):
+    return entry["scale"], entry["stage"], entry["units"]
+
+
+def compare_results(current, baseline, threshold=1.2):
+    """Lines of ``(key, baseline_ms, current_ms, ratio, regressed)`` for entries present in both runs.
+
+    Medians are compared; ``regressed`` is set when the current run is
+    slower than the baseline by more than ``threshold``.
+    """
+    before = {_key(e): e["median_ms"] for e in baseline["results"]}
+    lines = []
+    for entry in current["results"]:
+        key = _key(entry)
+        if key not in before:
+            continue
+        old, new = before[key], entry["median_ms"]
+        ratio = new / old if old else float("inf")
+        lines.append((key, old, new, ratio, ratio > threshold))
+    return lines
@@ -0,0 +1,159 @@
+"""Precomputed index for the sidebar's cascading filters.
+
+The sidebar narrows the catalogue one level at a time (Year -> Quarter ->
+Region -> Brand -> Unit name -> Recovery type -> Unit size, then Type or
+Material).  Re-masking the whole frame at every level on every rerun costs
+O(rows) per level per unit, so the index below turns the cascade into a trie
+built once per loaded catalogue: each node holds the sorted options of the
+next level and the row positions that match the path so far.
+
+The trie is built from integer codes (categorical codes, or factorized
+values) split with NumPy, one level at a time under the groups of the level
+above; pandas' groupby spent most of a large catalogue's build boxing each
+group key.
+"""
+import numpy as np
+import pandas as pd
+
+
+class CascadeNode:
+    """One position in the cascade.
+
+    ``options`` are the sorted values offered at the next level, ``rows`` the
+    positions (for ``df.iloc``) of every row matching the path to this node.
+    """
+
+    __slots__ = ("rows", "options", "children", "branches")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.options = []
+        self.children = {}
+        self.branches = {}
+
+    def child(self, value):
+        """Follow ``value`` to the next level; unknown values lead to an empty node."""
+        return self.children.get(value, EMPTY_NODE)
+
+    def branch(self, column):
+        """Return a node whose options are the values of ``column`` among this node's rows.
+
+        Branch columns are only indexed on the leaves of the cascade.
+        """
+        return self.branches.get(column, EMPTY_NODE)
+
+    @property
+    def empty(self):
+        return len(self.rows) == 0
+
+
+EMPTY_NODE = CascadeNode(np.empty(0, dtype=np.intp))
+
+
+def _codes(series):
+    """Integer code of each value of ``series`` (-1 where missing) and the value of each code."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(dtype=np.int64), series.cat.categories.tolist()
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64, copy=False), uniques.tolist()
+
+
+def _split(group, codes):
+    """Split the rows of each group (-1: no group) by ``codes`` (-1: missing).
+
+    Returns the subgroup of every row (-1 where either is missing) and, per
+    subgroup, its parent group, its code and its row positions in ascending
+    order.  Subgroups are numbered in (parent, code) order.
+    """
+    keep = np.flatnonzero((group >= 0) & (codes >= 0))
+    subgroup = np.full(len(group), -1, dtype=np.int64)
+    if not len(keep):
+        return subgroup, [], [], []
+    width = int(codes[keep].max()) + 1
+    keys, inverse = np.unique(group[keep] * width + codes[keep], return_inverse=True)
+    subgroup[keep] = inverse
+    order = np.argsort(inverse, kind="stable")
+    rows = np.split(keep[order], np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1])
+    return subgroup, (keys // width).tolist(), (keys % width).tolist(), rows
+
+
+def group_indices(df, columns):
+    """``{key tuple: row positions}`` of ``df`` grouped by ``columns``, dropping rows with a missing key.
+
+    The same groups as ``df.groupby(columns, dropna=True, observed=True).indices``.
+    """
+    if not columns:
+        return {(): np.arange(len(df), dtype=np.intp)}
+    group = np.zeros(len(df), dtype=np.int64)
+    keys = [()]
+    for col in columns:
+        codes, values = _codes(df[col])
+        group, parents, codes, rows = _split(group, codes)
+        keys = [keys[p] + (values[c],) for p, c in zip(parents, codes)]
+    return dict(zip(keys, rows))
+
+
+def row_groups(df, columns, group=None):
+    """Group number of each row of ``df`` by ``columns``, -1 where a key (or ``group``) is missing.
+
+    Starting from ``group`` (one group by default), groups are numbered in
+    key order, as by ``group_indices``.
+    """
+    if group is None:
+        group = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        group = _split(group, _codes(df[col])[0])[0]
+    return group
+
+
+class CascadeIndex:
+    """Trie over ``levels`` of ``df``, with optional ``branches`` under each leaf.
+
+    Rows with a missing value at some level stop there, exactly as the
+    ``df[df[col] == value]`` cascade never matches them below that level.
+    """
+
+    def __init__(self, df, levels, branches=()):
+        self.levels = list(levels)
+        self.branches = [col for col in branches if col is not None]
+        self.root = CascadeNode(np.arange(len(df), dtype=np.intp))
+
+        # Group of each row at the current depth, and the node of each group
+        group = np.zeros(len(df), dtype=np.int64)
+        nodes = [self.root]
+        for col in self.levels:
+            codes, values = _codes(df[col])
+            group, parents, codes, rows = _split(group, codes)
+            children = []
+            for parent, code, positions in zip(parents, codes, rows):
+                child = nodes[parent].children[values[code]] = CascadeNode(positions)
+                children.append(child)
+            nodes = children
+
+        for col in self.branches:
+            codes, values = _codes(df[col])
+            _, parents, codes, rows = _split(group, codes)
+            for parent, code, positions in zip(parents, codes, rows):
+                leaf = nodes[parent]
+                branch = leaf.branches.get(col)
+                if branch is None:
+                    branch = leaf.branches[col] = CascadeNode(leaf.rows)
+                branch.children[values[code]] = CascadeNode(positions)
+
+        self._sort_options(self.root)
+
+    def _sort_options(self, node):
+        node.options = sorted(node.children)
+        for child in node.children.values():
+            self._sort_options(child)
+        for branch in node.branches.values():
+            self._sort_options(branch)
+
+    def node(self, *path):
+        """Walk ``path`` (one value per level) from the root."""
+        node = self.root
+        for value in path:
+            node = node.child(value)
+            if node is EMPTY_NODE:
+                break
+        return node
@@ -0,0 +1,233 @@
+"""Plotly figures shown between the comparison table sections.
+
+Each builder takes the whole catalogue, the compared ``Selection`` objects and
+the ``df.iloc`` position of each unit's row (None when its selection matched
+nothing), and returns a figure or None when no unit has data for it; the
+unit-area chart reads the catalogue's ``SizeAreaTable`` instead.
+
+Figures are put together from one trace per unit (``unit_trace``), so a
+caller that keeps each unit's traces only rebuilds those of the units whose
+selection changed and assembles the figure with ``figure_from_traces``.
+A trace only depends on the catalogue and the unit's slot and selection, so
+``TraceCache`` keys built traces by ``(catalogue version, chart name, slot,
+selection, colors)``, at most ``maxsize`` of them: reruns, sessions and
+reports that show a unit again reuse its traces, and a reload simply stops
+hitting the old version's entries.
+
+``figure_png`` renders a figure for the XLSX export; static export needs the
+optional kaleido package.
+"""
+import logging
+
+import numpy as np
+import plotly.graph_objects as go
+
+try:
+    import kaleido
+except ImportError:  # pragma: no cover - static image export is optional
+    kaleido = None
+
+from . import geometry
+from .cache import LRUCache
+from .render import UNIT_COLORS, unit_color
+from .sizes import SizeAreaTable
+
+logger = logging.getLogger(__name__)
+
+
+def _area_trace(i, selection, size_areas, colors):
+    _, labels, areas = size_areas.points(selection)
+    if not len(areas):
+        return None
+    label = f"Unit {i+1}: {selection.brand}"
+    return go.Scatter(
+        x=areas, y=np.char.add(f"{selection.brand} - Size ", labels.astype(str)).astype(object), text=labels,
+        name=label, legendgroup=label, showlegend=True, mode="markers+text", textposition="top center",
+        marker=dict(color=unit_color(i, colors), symbol="circle"),
+        hovertemplate=(f"Selection_Label={label}<br>Unit Cross Section Area (m²)=%{{x}}"
+                       "<br>Brand_UnitSize=%{y}<br>Unit Size=%{text}<extra></extra>"),
+    )
+
+
+def _unit_label(i, selection):
+    return f"Unit {i+1}: {selection.brand} - {selection.size}"
+
+
+def _outline_trace(i, selection, colors, x, y, markers):
+    label = _unit_label(i, selection)
+    return go.Scatter(
+        x=x, y=y, name=label, legendgroup=label, showlegend=True,
+        mode="lines+markers" if markers else "lines",
+        line=dict(color=unit_color(i, colors), dash="solid"), marker=dict(symbol="circle"),
+        hovertemplate=f"Label={label}<br>X=%{{x}}<br>Y=%{{y}}<extra></extra>",
+    )
+
+
+def _section_trace(df, schema, i, selection, row_position, colors, points):
+    xs, ys = geometry.coordinate_block(df, schema, [row_position])
+    xs, ys = xs[:, points], ys[:, points]
+    if not geometry.complete(xs, ys)[0]:
+        return None
+    return _outline_trace(i, selection, colors, xs[0], ys[0], markers=True)
+
+
+def _duct_trace(df, schema, i, selection, row_position, colors):
+    xs, ys = geometry.coordinate_block(df, schema, [row_position])
+    xs, ys = xs[0, 10:15], ys[0, 10:15]
+    diameter = geometry.column_block(df, [schema.duct_connection_diameter], [row_position])[:, 0]
+
+    if geometry.rectangular(xs[None], ys[None])[0]:
+        known = np.isfinite(xs) & np.isfinite(ys)
+        if not known.any():
+            return None
+        x, y = xs[known], ys[known]
+    elif geometry.round_duct(diameter)[0]:
+        x, y = geometry.circles(diameter)
+        x, y = x[0], y[0]
+    else:
+        return None
+    return _outline_trace(i, selection, colors, x, y, markers=False)
+
+
+def _heater_trace(df, schema, i, selection, row_position, colors):
+    capacities = geometry.column_block(
+        df, [schema.capacity_range1, schema.capacity_range2, schema.capacity_range3], [row_position])[0]
+    if not np.isfinite(capacities).all():
+        return None
+    label = _unit_label(i, selection)
+    return go.Bar(
+        x=[f"Range {n}" for n in range(1, len(capacities) + 1)], y=capacities, name=label, legendgroup=label,
+        showlegend=True, offsetgroup=label, alignmentgroup="True", marker=dict(color=unit_color(i, colors)),
+        hovertemplate=f"Selection={label}<br>Capacity Range=%{{x}}<br>Value (kW)=%{{y}}<extra></extra>",
+    )
+
+
+_OUTLINE_LAYOUT = dict(xaxis_title="Width (mm)", yaxis_title="Height (mm)", legend_title_text="Selection",
+                       legend_tracegroupgap=0, margin=dict(t=60))
+
+# Layout arguments of each chart, and whether its axes share one scale
+_LAYOUTS = {
+    "unit_area_chart": (dict(title='Unit Cross Section Area (Supply Filter) vs. Unit Size',
+                             xaxis_title="Unit Cross Section Area (m²)", yaxis_title="Brand and Unit Size",
+                             legend_title_text="Selection_Label", legend_tracegroupgap=0, margin=dict(t=60)),
+                        False),
+    "chart1": (dict(title='Internal Cross Section area (Supply Filter)', **_OUTLINE_LAYOUT), True),
+    "chart2": (dict(title='Internal Cross Section area (Supply Fan)', **_OUTLINE_LAYOUT), True),
+    "chart3": (dict(title='Supply Duct connection, mm', **_OUTLINE_LAYOUT), True),
+    "electrical_heater_chart": (dict(title='Electrical Heater Capacity (kW)', barmode="group",
+                                     xaxis_title="Capacity Range", yaxis_title="Capacity (kW)",
+                                     legend_title_text="Selection", legend_tracegroupgap=0, margin=dict(t=60)),
+                                False),
+}
+_layout_json = {}
+
+
+def _layout(name):
+    """Validated layout of chart ``name`` as plain JSON, built once."""
+    layout = _layout_json.get(name)
+    if layout is None:
+        arguments, equal_axes = _LAYOUTS[name]
+        fig = go.Figure().update_layout(**arguments)
+        if equal_axes:
+            fig.update_yaxes(scaleanchor="x", scaleratio=1)
+        layout = _layout_json[name] = fig.layout.to_plotly_json()
+    return layout
+
+
+# Chart slots of the comparison page (see ``display_items``)
+CHART_NAMES = tuple(_LAYOUTS)
+
+
+def chart_title(name):
+    return _LAYOUTS[name][0]["title"]
+
+
+def unit_trace(name, df, schema, i, selection, row_position, colors=UNIT_COLORS, size_areas=None):
+    """Trace of unit ``i`` in chart ``name`` as plain (validated) JSON, or None when it has no data.
+
+    ``size_areas`` is the catalogue's ``SizeAreaTable``, built here when the
+    unit-area chart is asked for without it.
+    """
+    if name == "unit_area_chart":
+        if size_areas is None:
+            size_areas = SizeAreaTable(df, schema)
+        trace = _area_trace(i, selection, size_areas, colors)
+    elif name == "chart1":
+        trace = _section_trace(df, schema, i, selection, row_position, colors, slice(0, 5))
+    elif name == "chart2":
+        trace = _section_trace(df, schema, i, selection, row_position, colors, slice(5, 10))
+    elif name == "chart3":
+        trace = _duct_trace(df, schema, i, selection, row_position, colors)
+    elif name == "electrical_heater_chart":
+        trace = _heater_trace(df, schema, i, selection, row_position, colors)
+    else:
+        raise KeyError(name)
+    return None if trace is None else trace.to_plotly_json()
+
+
+def figure_from_traces(name, traces):
+    """Figure of chart ``name`` from ``unit_trace`` results (None entries skipped); None when all are.
+
+    The traces and the layout were validated when they were built, so the
+    figure is assembled without validating them again; that step costs far
+    more than the assembly itself.
+    """
+    traces = [trace for trace in traces if trace is not None]
+    if not traces:
+        return None
+    return go.Figure({"data": traces, "layout": _layout(name)}, _validate=False)
+
+
+def figure_png(fig, width=1000, height=500):
+    """PNG bytes of ``fig``, or None when static export is unavailable (no kaleido or browser)."""
+    if kaleido is None:
+        return None
+    try:
+        return fig.to_image(format="png", width=width, height=height)
+    except Exception as e:
+        logger.warning("Could not render %s as PNG: %s", fig.layout.title.text, e)
+        return None
+
+
+class TraceCache:
+    """Built unit traces keyed by ``(version, chart name, slot, selection, colors)``, at most ``maxsize`` of them.
+
+    Cached traces are shared between reruns, sessions and reports and must
+    not be modified by callers.  "No data" (None) is cached as well.
+    """
+
+    def __init__(self, maxsize=1024):
+        self._traces = LRUCache(maxsize)
+
+    def __len__(self):
+        return len(self._traces)
+
+    @property
+    def hits(self):
+        return self._traces.hits
+
+    @property
+    def misses(self):
+        return self._traces.misses
+
+    def trace(self, dataset, name, i, selection, colors=UNIT_COLORS, row_position=None):
+        """``unit_trace`` of unit ``i``; ``row_position`` is looked up in ``dataset`` when not given."""
+        colors = tuple(colors)
+        key = (dataset.version, name, i, selection, colors)
+
+        def build():
+            position = dataset.row_position(selection) if row_position is None else row_position
+            return unit_trace(name, dataset.frame, dataset.schema, i, selection, position, colors,
+                              dataset.size_areas)
+
+        return self._traces.get_or_create(key, build)
+
+    def figure(self, dataset, name, selections, colors=UNIT_COLORS, row_positions=None):
+        """Figure of chart ``name`` for ``selections`` from their cached traces; None when nothing is plotted."""
+        if row_positions is None:
+            row_positions = [None] * len(selections)
+        return figure_from_traces(name, [self.trace(dataset, name, i, selection, colors, position)
+                                         for i, (selection, position) in enumerate(zip(selections, row_positions))])
+
+    def clear(self):
+        self._traces.clear()
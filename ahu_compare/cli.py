@@ -0,0 +1,331 @@
+"""Command-line entry points (``python -m ahu_compare ...``).
+
+``bench`` times each stage of the comparison hot path and writes a JSON
+report; see ``ahu_compare.bench``.
+
+``generate`` writes a synthetic catalogue of any size, as XLSX and/or
+Feather, modelled on the workbook; see ``ahu_compare.synthetic``.
+
+``diff`` writes the changed-parameters report between two editions, e.g.
+``python -m ahu_compare diff 2025Q1 2025Q2 --region CER``; see
+``ahu_compare.diff``.
+
+``serve`` answers the cascade options, unit parameters and comparisons as JSON
+over HTTP, e.g. ``python -m ahu_compare serve --port 8000``; see
+``ahu_compare.service``.
+
+``export`` writes one comparison sheet per selection set, the same sheet the
+app's sidebar download produces, or with ``-f pdf`` one printable report per
+set (see ``ahu_compare.report``).  Selection sets are read from a CSV file with
+one row per unit::
+
+    set,year,quarter,region,brand,unit,recovery,size,type,material
+    Topvex vs Gold,2025,Q2,CER,Systemair,Topvex,RRG,SR30,NH.RRG,
+    Topvex vs Gold,2025,Q3,CER,Swegon,Gold F RX,RRG,F RX 100,Condensing,
+
+(rows sharing a ``set`` form one comparison, in file order) or from a JSON
+list of ``{"name": ..., "units": [{"year": ..., ...}, ...]}`` objects.
+
+The catalogue is loaded once in the parent process, with its cascade index
+built, before the worker pool starts; forked workers share it copy-on-write,
+other start methods load the memory-mapped snapshot instead of the XLSX.
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import Dataset
+from .loader import DEFAULT_SHEET, DEFAULT_WORKBOOK, snapshot_dir
+from .xlsx import write_comparison_xlsx
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "xlsx", "pdf")
+# images.DEFAULT_IMAGE_DIR, not imported so that CSV exports run without Pillow
+DEFAULT_IMAGE_DIR = "images"
+
+# Set in the parent before the pool starts (and inherited by forked workers),
+# or loaded by _init_worker in spawned ones
+_dataset = None
+_image_dir = DEFAULT_IMAGE_DIR
+# Each process's ReportRenderer, made on its first PDF so its caches serve the reports after it
+_renderer = None
+
+
+def read_selection_sets(path):
+    """List of ``(name, [unit field dicts])`` read from a CSV or JSON file."""
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        sets = []
+        for n, entry in enumerate(data, 1):
+            if isinstance(entry, dict):
+                sets.append((str(entry.get("name") or f"comparison_{n:04d}"), list(entry["units"])))
+            else:
+                sets.append((f"comparison_{n:04d}", list(entry)))
+        return sets
+
+    sets = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for n, row in enumerate(csv.DictReader(f), 1):
+            row = {key.strip().lower(): value for key, value in row.items() if key}
+            name = (row.pop("set", None) or "").strip() or f"comparison_{n:04d}"
+            sets.setdefault(name, []).append(row)
+    return list(sets.items())
+
+
+def _file_stem(name):
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "comparison"
+
+
+def _init_worker(path, sheet_name, image_dir=DEFAULT_IMAGE_DIR):
+    global _dataset, _image_dir
+    _image_dir = image_dir
+    if _dataset is None:
+        _dataset = Dataset.load(path, sheet_name)
+
+
+def _report_renderer():
+    global _renderer
+    if _renderer is None:
+        from .report import ReportRenderer
+
+        _renderer = ReportRenderer(_image_dir, snapshot_dir(_dataset.path or DEFAULT_WORKBOOK))
+    return _renderer
+
+
+def _export(job):
+    name, units, out_path, fmt = job
+    result = _dataset.compare([_dataset.selection(values) for values in units])
+    if fmt == "xlsx":
+        write_comparison_xlsx(result.matrix, out_path)
+    elif fmt == "pdf":
+        _report_renderer().write(_dataset, result, out_path, title=name)
+    else:
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            f.write(result.csv())
+    return name, out_path, result.found
+
+
+def _shared_units_key(job):
+    return sorted(json.dumps(values, sort_keys=True, default=str) for values in job[1])
+
+
+def export(args):
+    global _dataset, _image_dir
+    sets = read_selection_sets(args.selections)
+    if not sets:
+        logger.error("No selection sets in %s", args.selections)
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+
+    jobs = []
+    used = set()
+    for name, units in sets:
+        stem = _file_stem(name)
+        file_name, n = f"{stem}.{args.format}", 1
+        while file_name in used:
+            n += 1
+            file_name = f"{stem}_{n}.{args.format}"
+        used.add(file_name)
+        jobs.append((name, units, os.path.join(args.out, file_name), args.format))
+
+    if args.format == "pdf":
+        # Sets sharing units end up in the same chunk, so one worker's image and chart caches serve them
+        jobs.sort(key=_shared_units_key)
+    _image_dir = args.images
+
+    start = time.perf_counter()
+    _dataset = Dataset.load(args.workbook, args.sheet)
+    _dataset.index  # built once here so forked workers inherit it
+    loaded = time.perf_counter()
+
+    workers = max(1, min(args.workers, len(jobs)))
+    if workers == 1:
+        results = [_export(job) for job in jobs]
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(args.workbook, args.sheet, args.images)) as pool:
+            results = list(pool.map(_export, jobs, chunksize=chunksize))
+    done = time.perf_counter()
+
+    incomplete = 0
+    for name, out_path, found in results:
+        missing = [str(i + 1) for i, ok in enumerate(found) if not ok]
+        if missing:
+            incomplete += 1
+            logger.warning("%s: no catalogue row for unit(s) %s", name, ", ".join(missing))
+        if args.verbose:
+            print(out_path)
+
+    elapsed = done - loaded
+    print(f"Exported {len(results)} comparisons to {args.out} in {elapsed:.2f} s "
+          f"({len(results) / elapsed if elapsed else float('inf'):.1f}/s, {workers} worker(s); "
+          f"catalogue loaded in {loaded - start:.2f} s)", file=sys.stderr)
+    if incomplete:
+        print(f"{incomplete} comparison(s) have units without a catalogue row", file=sys.stderr)
+    return 0
+
+
+def _int_list(text):
+    values = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        values.extend(range(int(first), int(last or first) + 1))
+    return values
+
+
+def bench(args):
+    from .bench import compare_results, run_benchmarks
+
+    report = run_benchmarks(args.workbook, args.sheet, scales=args.scales, units=args.units,
+                            repeat=args.repeat, seed=args.seed,
+                            progress=lambda msg: print(msg, file=sys.stderr))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+
+    for entry in report["results"]:
+        units = "" if entry["units"] is None else f"{entry['units']:>3} units"
+        print(f"{entry['scale']:>4}x {entry['rows']:>8} rows  {entry['stage']:<30} {units:<9} "
+              f"{entry['median_ms']:>10.3f} ms")
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = 0
+    for (scale, stage, units), old, new, ratio, regressed in compare_results(report, baseline, args.threshold):
+        regressions += regressed
+        if regressed or args.verbose:
+            print(f"{'REGRESSION' if regressed else 'ok':<10} {scale:>4}x {stage:<30} "
+                  f"{'' if units is None else units:>3} {old:>10.3f} -> {new:>10.3f} ms ({ratio:.2f}x)")
+    print(f"{regressions} stage(s) slower than {args.threshold:.2f}x the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def _text_list(text):
+    return [part.strip() for part in text.split(",") if part.strip()]
+
+
+def generate(args):
+    from .synthetic import generate_catalogue, write_catalogue
+
+    start = time.perf_counter()
+    template = Dataset.load(args.workbook, args.sheet)
+    df = generate_catalogue(template.frame, template.schema, args.rows, brands=args.brands, years=args.years,
+                            quarters=args.quarters, regions=args.regions, drift=args.drift, seed=args.seed)
+    generated = time.perf_counter()
+    print(f"Generated {len(df)} rows x {len(df.columns)} columns in {generated - start:.2f} s", file=sys.stderr)
+    for path in args.out:
+        write_start = time.perf_counter()
+        write_catalogue(df, path, args.sheet)
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB) in {time.perf_counter() - write_start:.2f} s",
+              file=sys.stderr)
+    return 0
+
+
+def _edition(text):
+    match = re.fullmatch(r"\s*(\d{4})\W*(Q\d)\s*", text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected an edition such as 2025Q1, not {text!r}")
+    return int(match.group(1)), match.group(2).upper()
+
+
+def diff(args):
+    dataset = Dataset.load(args.workbook, args.sheet)
+    changes = dataset.diff(args.old, args.new, region=args.region, brand=args.brand)
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        f.write(changes.csv())
+    print(f"{changes.changed_units} of {changes.matched} units changed ({len(changes.changes)} parameters), "
+          f"{len(changes.added)} added, {len(changes.removed)} removed; wrote {args.out}", file=sys.stderr)
+    return 0
+
+
+def serve(args):
+    from .service import serve as run_service
+
+    logging.getLogger("ahu_compare").setLevel(logging.INFO if args.verbose else logging.WARNING)
+    run_service(args.workbook, args.sheet, host=args.host, port=args.port, cache_size=args.cache_size,
+                watch=not args.no_watch)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ahu_compare", description="AHU catalogue comparison tools.")
+    parser.add_argument("--workbook", default=DEFAULT_WORKBOOK, help="catalogue workbook (default: %(default)s)")
+    parser.add_argument("--sheet", default=DEFAULT_SHEET, help="catalogue sheet (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("export", help="write one comparison sheet per selection set")
+    p.add_argument("selections", help="CSV or JSON file of selection sets")
+    p.add_argument("-o", "--out", default="comparisons", help="output directory (default: %(default)s)")
+    p.add_argument("-f", "--format", choices=EXPORT_FORMATS, default="csv")
+    p.add_argument("--images", default=DEFAULT_IMAGE_DIR,
+                   help="logo and photo directory for PDF reports (default: %(default)s)")
+    p.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                   help="worker processes (default: number of CPUs)")
+    p.add_argument("-v", "--verbose", action="store_true", help="print each written file")
+    p.set_defaults(func=export)
+
+    p = subparsers.add_parser("diff", help="list the parameters changed between two editions")
+    p.add_argument("old", type=_edition, help="earlier edition, e.g. 2025Q1")
+    p.add_argument("new", type=_edition, help="later edition, e.g. 2025Q2")
+    p.add_argument("--region", help="only this region (default: all)")
+    p.add_argument("--brand", help="only this brand (default: all)")
+    p.add_argument("-o", "--out", default="changes.csv", help="CSV report (default: %(default)s)")
+    p.set_defaults(func=diff)
+
+    p = subparsers.add_parser("serve", help="serve options, units and comparisons as JSON over HTTP")
+    p.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    p.add_argument("-p", "--port", type=int, default=8000, help="port (default: %(default)s)")
+    p.add_argument("--cache-size", type=int, default=1024,
+                   help="responses kept in the cache (default: %(default)s)")
+    p.add_argument("--no-watch", action="store_true", help="do not reload the workbook when it changes")
+    p.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    p.set_defaults(func=serve)
+
+    p = subparsers.add_parser("bench", help="time the load, cascade, table, CSV and chart stages")
+    p.add_argument("-o", "--out", default="bench.json", help="JSON report (default: %(default)s)")
+    p.add_argument("--scales", type=_int_list, default=[1, 10, 100],
+                   help="catalogue size multipliers, e.g. 1,10,100 (default)")
+    p.add_argument("--units", type=_int_list, default=list(range(2, 11)),
+                   help="numbers of compared units, e.g. 2-10 (default)")
+    p.add_argument("-r", "--repeat", type=int, default=5, help="runs per stage (default: %(default)s)")
+    p.add_argument("--seed", type=int, default=0, help="seed for the sampled selections (default: %(default)s)")
+    p.add_argument("--baseline", help="earlier JSON report to compare against")
+    p.add_argument("--threshold", type=float, default=1.2,
+                   help="slowdown ratio reported as a regression (default: %(default)s)")
+    p.add_argument("-v", "--verbose", action="store_true", help="list every stage compared with the baseline")
+    p.set_defaults(func=bench)
+
+    p = subparsers.add_parser("generate", help="write a synthetic catalogue modelled on the workbook")
+    p.add_argument("-n", "--rows", type=int, required=True, help="number of rows")
+    p.add_argument("-o", "--out", action="append", required=True,
+                   help="output file, .xlsx or .feather/.arrow; may be repeated")
+    p.add_argument("--brands", type=int, help="total number of brands (default: the workbook's)")
+    p.add_argument("--years", type=_int_list, help="years, newest first (default: the workbook's, then earlier)")
+    p.add_argument("--quarters", type=_text_list, default=["Q1", "Q2", "Q3", "Q4"],
+                   help="quarters (default: Q1,Q2,Q3,Q4)")
+    p.add_argument("--regions", type=_text_list, help="regions (default: the workbook's)")
+    p.add_argument("--drift", type=float, default=0.05,
+                   help="largest per-edition size change, as a fraction (default: %(default)s)")
+    p.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    p.set_defaults(func=generate)
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,229 @@
+"""The parameters x units block behind the comparison table and CSV export."""
+import numpy as np
+import pandas as pd
+
+from .selection import RRG
+
+MISSING_VALUE = "-"
+
+
+def excluded_columns(schema, recoveries):
+    """Columns kept out of the parameter rows, and section titles to hide, for these recovery types.
+
+    Identity columns are shown in the column headings instead, coordinates and
+    the Supply Filter cross-section area only feed charts, and Capacity Note /
+    Cabling are placed next to their related rows by the table layout.  When
+    every unit shares a recovery type, the other exchanger's fields are hidden.
+    """
+    excluded = [
+        schema.brand, schema.logo, schema.unit_photo, schema.year, schema.quarter, schema.region,
+        schema.unit_name, schema.recovery, schema.size, schema.type, schema.material,
+        schema.capacity_note, schema.cabling, schema.unit_area_supply_filter,
+    ]
+    for x_col, y_col in schema.coords:
+        excluded += [x_col, y_col]
+    excluded_headers = set()
+
+    if all(rec == "HEX" for rec in recoveries):
+        excluded += [schema.wheel_diameter, schema.distance_between_lamels, schema.type,
+                     schema.sens_efficiency_nominal_rrg, schema.sens_efficiency_opt_rrg]
+        excluded_headers.add("Rotary wheel")
+
+    if all(rec == RRG for rec in recoveries):
+        excluded += [schema.material, schema.sens_efficiency_nominal_pcr_hex, schema.sens_efficiency_opt_pcr_hex]
+        excluded_headers.add("PCR/HEX recovery exchanger")
+
+    return frozenset(col for col in excluded if col is not None), frozenset(excluded_headers)
+
+
+class ComparisonMatrix:
+    """Values of every catalogue column for the compared units.
+
+    ``values[j, i]`` is column ``columns[j]`` of unit ``i`` ("-" when the
+    unit's selection matched no row).  ``shown[j]`` says whether the column is
+    listed as a parameter row, and ``sections[j]`` holds the title of the
+    table section opened just before it (or None).
+    """
+
+    __slots__ = ("columns", "values", "shown", "sections", "headings", "excluded", "excluded_headers", "_positions")
+
+    def __init__(self, columns, values, shown, sections, headings, excluded, excluded_headers):
+        self.columns = columns
+        self.values = values
+        self.shown = shown
+        self.sections = sections
+        self.headings = headings
+        self.excluded = excluded
+        self.excluded_headers = excluded_headers
+        self._positions = {col: j for j, col in enumerate(columns)}
+
+    @property
+    def num_units(self):
+        return self.values.shape[1]
+
+    def row(self, col):
+        """Values of ``col`` for every unit."""
+        j = self._positions.get(col)
+        if j is None:
+            return np.full(self.num_units, MISSING_VALUE, dtype=object)
+        return self.values[j]
+
+
+class RowReader:
+    """Rows of a frame as object arrays, read column by column when asked for.
+
+    ``reader[positions]`` holds what ``df.iloc[positions].to_numpy(dtype=object)``
+    does (a single row for an int position) at a fraction of the cost, and
+    without converting the whole frame to Python objects up front, which
+    would copy a memory-mapped catalogue into every process.  Categorical
+    columns are read through their codes, NumPy columns by fancy indexing.
+    """
+
+    __slots__ = ("_columns",)
+
+    def __init__(self, df):
+        self._columns = []
+        for j in range(df.shape[1]):
+            series = df.iloc[:, j]
+            dtype = series.dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                # Code -1 (missing) reads the trailing NaN
+                values = np.array(dtype.categories.tolist() + [np.nan], dtype=object)
+                self._columns.append(("codes", series.cat.codes.to_numpy(), values))
+            elif isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+                self._columns.append(("numpy", series.to_numpy(), None))
+            else:
+                self._columns.append(("array", series.array, None))
+
+    def __len__(self):
+        return len(self._columns[0][1]) if self._columns else 0
+
+    def __getitem__(self, positions):
+        single = np.ndim(positions) == 0
+        positions = np.atleast_1d(np.asarray(positions, dtype=np.intp))
+        out = np.empty((len(positions), len(self._columns)), dtype=object)
+        for j, (kind, data, values) in enumerate(self._columns):
+            if kind == "codes":
+                out[:, j] = values[data[positions]]
+            elif kind == "numpy":
+                out[:, j] = data[positions]
+            else:
+                out[:, j] = data.take(positions).to_numpy(dtype=object)
+        return out[0] if single else out
+
+
+def build_matrix(df, schema, row_positions, selections, rows=None):
+    """Gather the compared rows of ``df`` into a ``ComparisonMatrix``.
+
+    ``row_positions`` holds, per unit, the ``df.iloc`` position of its row or
+    None when its selection matched nothing.  All rows are fetched with one
+    ``iloc`` and transposed; exclusion and section rules become column masks.
+    ``rows`` may be a ``RowReader`` of ``df`` (or ``df.to_numpy(dtype=object)``),
+    which fetches the rows much faster than ``iloc``.
+    """
+    columns = df.columns
+    values = np.full((len(columns), len(row_positions)), MISSING_VALUE, dtype=object)
+    present = [i for i, pos in enumerate(row_positions) if pos is not None]
+    if present:
+        positions = [row_positions[i] for i in present]
+        if rows is None:
+            block = df.iloc[positions].to_numpy(dtype=object)
+        else:
+            block = rows[positions]
+        values[:, present] = block.T
+    return _matrix(columns, values, schema, selections)
+
+
+def unit_column(df, row_position, rows=None):
+    """One unit's values of every column of ``df`` ("-" throughout when ``row_position`` is None)."""
+    if row_position is None:
+        return np.full(len(df.columns), MISSING_VALUE, dtype=object)
+    if rows is None:
+        return df.iloc[row_position].to_numpy(dtype=object)
+    return np.array(rows[row_position], dtype=object)
+
+
+def matrix_from_columns(columns, schema, unit_columns, selections):
+    """``ComparisonMatrix`` from each unit's ``unit_column``, e.g. kept per unit between reruns."""
+    if unit_columns:
+        values = np.column_stack(unit_columns)
+    else:
+        values = np.empty((len(columns), 0), dtype=object)
+    return _matrix(columns, values, schema, selections)
+
+
+def _matrix(columns, values, schema, selections):
+    excluded, excluded_headers = excluded_columns(schema, [s.recovery for s in selections])
+    shown = ~columns.isin(list(excluded))
+    titles = pd.Series(columns.map(dict(schema.header_triggers)), dtype=object)
+    opens_section = titles.notna() & ~titles.duplicated() & ~titles.isin(list(excluded_headers))
+    sections = titles.where(opens_section, None).to_numpy(dtype=object)
+
+    return ComparisonMatrix(columns, values, shown, sections, [s.heading for s in selections],
+                            excluded, excluded_headers)
+
+
+def comparison_sheet(matrix):
+    """Rows of the exported comparison sheet, one at a time, as ``(kind, cells)``.
+
+    ``kind`` is "heading" for the first row, "section" for "General data" and
+    each section title, "blank" for the spacer before a section and "row" for
+    a parameter with its unit values.
+    """
+    blank = [""] * matrix.num_units
+    yield "heading", ["Parameter"] + list(matrix.headings)
+    yield "section", ["General data"] + blank
+    for col, values, shown, section in zip(matrix.columns, matrix.values, matrix.shown, matrix.sections):
+        if section is not None:
+            yield "blank", [""] + blank
+            yield "section", [section] + blank
+        if shown:
+            yield "row", [col] + list(values)
+
+
+def comparison_rows(matrix):
+    """Rows of the exported comparison sheet: a heading row, then sections and parameters."""
+    return [cells for _, cells in comparison_sheet(matrix)]
+
+
+def comparison_csv(matrix):
+    """Render the matrix as the "Download Comparison as CSV" sheet."""
+    return pd.DataFrame(comparison_rows(matrix)).to_csv(index=False, header=False)
+
+
+def display_items(matrix, schema):
+    """Ordered layout of the comparison page: section headers, parameter rows and chart slots.
+
+    Items are dicts: ``{"type": "header", "title": ...}``, ``{"type": "row",
+    "col": ...}`` or ``{"type": "chart", "name": ...}``.  Charts follow the
+    column they illustrate; the unit-area chart replaces the Execution row.
+    """
+    items = []
+    for col_name, shown, header_title in zip(matrix.columns, matrix.shown, matrix.sections):
+        if col_name == schema.execution:
+            if schema.unit_size_quantity and schema.unit_size_quantity not in matrix.excluded:
+                items.append({"type": "row", "col": schema.unit_size_quantity})
+            items.append({"type": "chart", "name": "unit_area_chart"})
+            continue
+
+        if header_title:
+            items.append({"type": "header", "title": header_title})
+
+        if shown and col_name != schema.unit_size_quantity:
+            items.append({"type": "row", "col": col_name})
+
+        if col_name == schema.internal_height_supply_filter:
+            items.append({"type": "chart", "name": "chart1"})
+        elif col_name == schema.unit_area_supply_fan:
+            items.append({"type": "chart", "name": "chart2"})
+        elif col_name == schema.duct_connection_height:
+            items.append({"type": "chart", "name": "chart3"})
+        elif col_name == schema.heating_elements_type:
+            for col in (schema.capacity_range1, schema.capacity_range2, schema.capacity_range3, schema.capacity_note):
+                if col:
+                    items.append({"type": "row", "col": col})
+            items.append({"type": "chart", "name": "electrical_heater_chart"})
+        elif col_name == schema.base_frame_height:
+            if schema.cabling:
+                items.append({"type": "row", "col": schema.cabling})
+    return items
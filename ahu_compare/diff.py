@@ -0,0 +1,164 @@
+"""Changes to the catalogue between two editions (Year and Quarter).
+
+Spotting what a competitor changed between quarters meant putting the same
+unit of both quarters into two comparison slots, unit by unit.
+``edition_diff`` takes the rows of the two editions (within a Region, and
+optionally one Brand), aligns them by Region, Brand, Unit name, Recovery
+type, Unit size and Type/Material, and compares every parameter column of all aligned
+pairs at once, column by column on NumPy arrays (categorical columns by
+their codes).  Two missing values count as equal.
+
+The result lists one row per changed cell, plus the units only one edition
+has.  Identity columns (the cascade levels, Type and Material) align the
+rows and the chart coordinates (x1..y15) only redraw the dimension columns,
+so neither is compared.
+"""
+import numpy as np
+import pandas as pd
+
+from .selection import CASCADE_FIELDS, PLATE_RECOVERIES, RRG, selection_groups
+
+# Cascade levels that identify a unit within an edition: Region, Brand, Unit name, Recovery type, Unit size
+UNIT_LEVELS = slice(2, None)
+UNIT_FIELDS = CASCADE_FIELDS[UNIT_LEVELS] + ("variant",)
+
+
+def _mask(df, column, value):
+    if column is None or value is None:
+        return np.ones(len(df), dtype=bool)
+    values = df[column]
+    mask = (values == value).to_numpy(dtype=bool, na_value=False)
+    if not mask.any():
+        # Values as typed, e.g. "2025" for the year 2025
+        mask = (values.astype(str) == str(value).strip()).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+def _comparable(series):
+    """``series`` as an array whose ``==`` compares values, and its missing mask."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        return codes, codes < 0
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf":
+        values = series.to_numpy()
+        return values, np.isnan(values) if series.dtype.kind == "f" else np.zeros(len(values), dtype=bool)
+    values = series.to_numpy(dtype=object)
+    return values, series.isna().to_numpy()
+
+
+def diff_columns(schema, columns):
+    """Columns compared between editions: every column but the identity and chart coordinate columns."""
+    skipped = set(schema.cascade_levels) | {schema.type, schema.material}
+    skipped |= {col for pair in schema.coords for col in pair}
+    return [col for col in columns if col not in skipped]
+
+
+def _unit_fields(frame, schema):
+    """Region, Brand, Unit name, Recovery type, Unit size and Type/Material of each row of ``frame``."""
+    keys = pd.DataFrame({field: frame[col].astype(object).to_numpy()
+                         for field, col in zip(CASCADE_FIELDS[UNIT_LEVELS], schema.cascade_levels[UNIT_LEVELS])})
+    variant = np.full(len(frame), None, dtype=object)
+    recovery = keys["recovery"].to_numpy()
+    for column, mask in ((schema.type, recovery == RRG), (schema.material, np.isin(recovery, PLATE_RECOVERIES))):
+        if column is not None and column in frame.columns:
+            values = frame[column].astype(object).to_numpy()
+            variant[mask] = values[mask]
+    keys["variant"] = variant
+    return keys
+
+
+class EditionDiff:
+    """Changed cells and added/removed units between two editions.
+
+    ``changes`` has one row per changed cell (the unit's fields, the
+    parameter, and its old and new values), ``added``/``removed`` one row
+    per unit found in only the new/old edition; ``matched`` counts the
+    units both have.
+    """
+
+    __slots__ = ("old", "new", "changes", "added", "removed", "matched")
+
+    def __init__(self, old, new, changes, added, removed, matched):
+        self.old = old
+        self.new = new
+        self.changes = changes
+        self.added = added
+        self.removed = removed
+        self.matched = matched
+
+    @property
+    def changed_units(self):
+        return len(self.changes.drop_duplicates(list(UNIT_FIELDS))) if len(self.changes) else 0
+
+    def report_rows(self):
+        """Rows of the changed-parameters report: changes, then added and removed units."""
+        old, new = (f"{year} {quarter}" for year, quarter in (self.old, self.new))
+        rows = [list(UNIT_FIELDS) + ["parameter", old, new]]
+        for record in self.changes.itertuples(index=False, name=None):
+            rows.append(list(record))
+        for label, units in (("(added)", self.added), ("(removed)", self.removed)):
+            for record in units.itertuples(index=False, name=None):
+                rows.append(list(record) + [label, "", ""])
+        return rows
+
+    def csv(self):
+        """The changed-parameters report as CSV text."""
+        return pd.DataFrame(self.report_rows()).to_csv(index=False, header=False)
+
+
+def edition_diff(df, schema, old, new, region=None, brand=None, columns=None):
+    """``EditionDiff`` of the rows of edition ``old`` and edition ``new``, each a ``(year, quarter)``.
+
+    ``region`` and ``brand`` narrow both editions (None: all); ``columns``
+    defaults to ``diff_columns``.  Where an edition lists a unit more than
+    once, its first row is used, as the sidebar shows.
+    """
+    scope = _mask(df, schema.region, region) & _mask(df, schema.brand, brand)
+    sides = []
+    for year, quarter in (old, new):
+        sides.append(scope & _mask(df, schema.year, year) & _mask(df, schema.quarter, quarter))
+    positions = np.flatnonzero(sides[0] | sides[1])
+    frame = df.iloc[positions]
+    in_old, in_new = sides[0][positions], sides[1][positions]
+
+    # Same unit across the editions, whatever their Year and Quarter; a unit listed in several
+    # regions is one unit per region, so that a diff across regions pairs each with its own
+    unit = selection_groups(frame, schema, schema.cascade_levels[UNIT_LEVELS])
+    firsts = []
+    for side in (in_old, in_new):
+        rows = np.flatnonzero(side & (unit >= 0))
+        ids, first = np.unique(unit[rows], return_index=True)
+        firsts.append(pd.Series(rows[first], index=ids))
+    pairs = pd.concat(firsts, axis=1, keys=["old", "new"])
+    both = pairs.dropna()
+    old_rows = both["old"].to_numpy(dtype=np.intp)
+    new_rows = both["new"].to_numpy(dtype=np.intp)
+
+    keys = _unit_fields(frame, schema)
+    if columns is None:
+        columns = diff_columns(schema, frame.columns)
+    records = []
+    for col in columns:
+        values, missing = _comparable(frame[col])
+        hits = np.flatnonzero((values[old_rows] != values[new_rows]) & ~(missing[old_rows] & missing[new_rows]))
+        if not len(hits):
+            continue
+        shown = frame[col].to_numpy(dtype=object)
+        part = keys.iloc[new_rows[hits]].reset_index(drop=True)
+        part["parameter"] = col
+        part["old"] = shown[old_rows[hits]]
+        part["new"] = shown[new_rows[hits]]
+        part["_order"] = new_rows[hits]
+        records.append(part)
+    if records:
+        changes = pd.concat(records, ignore_index=True)
+        # Grouped by unit in the new edition's catalogue order, parameters in column order
+        changes = changes.sort_values("_order", kind="stable").drop(columns="_order").reset_index(drop=True)
+    else:
+        changes = pd.DataFrame(columns=list(UNIT_FIELDS) + ["parameter", "old", "new"])
+
+    added = keys.iloc[np.sort(pairs.loc[pairs["old"].isna(), "new"].to_numpy(dtype=np.intp))]
+    removed = keys.iloc[np.sort(pairs.loc[pairs["new"].isna(), "old"].to_numpy(dtype=np.intp))]
+    return EditionDiff(tuple(old), tuple(new), changes, added.reset_index(drop=True),
+                       removed.reset_index(drop=True), len(both))
+
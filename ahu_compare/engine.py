@@ -0,0 +1,263 @@
+"""Comparison engine usable outside Streamlit.
+
+``Dataset`` bundles a loaded catalogue with everything derived from it (the
+column schema, the cascade index, the size table), building the derived
+structures on first use.  ``Dataset.compare`` turns a sequence of
+``Selection`` objects into a ``ComparisonResult``: the matched rows, the
+parameters x units matrix, the page layout and the CSV export.  Nothing
+here imports Streamlit, Plotly or PIL, so scripts, batch jobs and
+benchmarks can run the same code path as the apps.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cascade import CascadeIndex
+from .comparison import ComparisonMatrix, RowReader, build_matrix, comparison_csv, display_items
+from .diff import edition_diff
+from .loader import DEFAULT_SHEET, DEFAULT_WORKBOOK, catalogue_version, load_catalogue
+from .schema import resolve_schema
+from .selection import CASCADE_FIELDS, resolve_node, selection_from_values
+from .shared import load_shared_catalogue, shared_enabled
+from .similar import SimilarityIndex
+from .sizing import AirflowIndex
+from .sizes import SizeAreaTable
+from .specs import SpecTable
+
+
+@dataclass(frozen=True, eq=False)
+class ComparisonResult:
+    """Everything the comparison page and its exports show for one set of selections."""
+
+    selections: tuple
+    # df.iloc position of each unit's row, None where the selection matched nothing
+    row_positions: tuple
+    matrix: ComparisonMatrix
+    # Ordered page layout, see comparison.display_items
+    items: tuple
+    version: str | None = None
+
+    @property
+    def num_units(self):
+        return len(self.selections)
+
+    @property
+    def found(self):
+        """Whether each unit's selection matched a catalogue row."""
+        return tuple(pos is not None for pos in self.row_positions)
+
+    def csv(self):
+        """The "Download Comparison as CSV" sheet."""
+        return comparison_csv(self.matrix)
+
+
+@dataclass(frozen=True)
+class SimilarUnit:
+    """A unit found by ``Dataset.similar``: its selection, row and distance from the reference."""
+
+    selection: object
+    position: int
+    distance: float
+
+
+@dataclass(frozen=True)
+class SizedUnit:
+    """A unit size found by ``Dataset.size_for_airflow``, with its filter air speed and sensible efficiency."""
+
+    selection: object
+    position: int
+    # Supply filter air speed at the required airflow [m/s], NaN where unknown
+    air_speed: float
+    # Sensible efficiency of the heat recovery [%], NaN where unknown
+    efficiency: float
+
+
+class Dataset:
+    """A loaded catalogue and the lookup structures derived from it."""
+
+    def __init__(self, frame, version=None, path=None, sheet_name=DEFAULT_SHEET):
+        self.frame = frame
+        self.version = version
+        self.path = path
+        self.sheet_name = sheet_name
+        self.schema = resolve_schema(frame.columns)
+        self._index = None
+        self._size_areas = None
+        self._rows = None
+        self._specs = None
+        self._similarity = None
+        self._airflows = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, shared=None):
+        """Load the catalogue at ``path``.
+
+        With ``shared`` (default: the ``AHU_SHARED`` environment variable) the
+        frame is attached to the host-wide copy; see ``ahu_compare.shared``.
+        """
+        version = catalogue_version(path)
+        if shared is None:
+            shared = shared_enabled()
+        if shared:
+            frame = load_shared_catalogue(path, sheet_name, version)
+        else:
+            frame = load_catalogue(path, sheet_name)
+        return cls(frame, version, path, sheet_name)
+
+    @property
+    def index(self):
+        """``CascadeIndex`` over the sidebar levels, with Type/Material branches."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = CascadeIndex(self.frame, self.schema.cascade_levels,
+                                               branches=[self.schema.type, self.schema.material])
+        return self._index
+
+    @property
+    def size_areas(self):
+        """``SizeAreaTable`` behind the unit-area chart."""
+        if self._size_areas is None:
+            with self._lock:
+                if self._size_areas is None:
+                    self._size_areas = SizeAreaTable(self.frame, self.schema)
+        return self._size_areas
+
+    @property
+    def rows(self):
+        """``RowReader`` of the frame, for fast row gathers: ``rows[positions]`` is an object array."""
+        if self._rows is None:
+            with self._lock:
+                if self._rows is None:
+                    self._rows = RowReader(self.frame)
+        return self._rows
+
+    @property
+    def specs(self):
+        """``SpecTable`` of the spec columns as float arrays, text columns parsed once."""
+        if self._specs is None:
+            with self._lock:
+                if self._specs is None:
+                    self._specs = SpecTable(self.frame, self.schema)
+        return self._specs
+
+    @property
+    def similarity(self):
+        """``SimilarityIndex`` over the numeric specs, behind ``similar``."""
+        if self._similarity is None:
+            specs = self.specs  # outside the lock, which is not reentrant
+            with self._lock:
+                if self._similarity is None:
+                    self._similarity = SimilarityIndex(self.frame, self.schema, specs=specs)
+        return self._similarity
+
+    @property
+    def airflows(self):
+        """``AirflowIndex`` of the airflow ranges, behind ``size_for_airflow``."""
+        if self._airflows is None:
+            specs = self.specs  # outside the lock, which is not reentrant
+            with self._lock:
+                if self._airflows is None:
+                    self._airflows = AirflowIndex(self.frame, self.schema, specs)
+        return self._airflows
+
+    def warm(self):
+        """Build the derived structures now instead of on first use; returns the dataset.
+
+        The ``airflows`` index is left to the first sizing query: only the
+        optional sizing panel uses it.
+        """
+        for name in ("index", "size_areas", "rows", "specs", "similarity"):
+            getattr(self, name)
+        return self
+
+    def selection(self, values):
+        """``Selection`` from field name -> value pairs as read from a file; see ``selection_from_values``."""
+        return selection_from_values(self.index, self.schema, values)
+
+    def node(self, selection):
+        """Cascade node of ``selection``; its ``rows`` are every matching ``df.iloc`` position."""
+        return resolve_node(self.index, self.schema, selection)
+
+    def row_position(self, selection):
+        """Position of the row shown for ``selection``, or None when nothing matches."""
+        node = self.node(selection)
+        return None if node.empty else int(node.rows[0])
+
+    def selection_at(self, position):
+        """``Selection`` of the unit in row ``position`` of the frame."""
+        row = self.rows[position]
+        fields = zip(CASCADE_FIELDS + ("type", "material"),
+                     self.schema.cascade_levels + [self.schema.type, self.schema.material])
+        values = {}
+        for field, col in fields:
+            if col is not None:
+                value = row[self.frame.columns.get_loc(col)]
+                # NumPy scalars (e.g. an int16 year) as the Python values of the cascade options
+                values[field] = value.item() if isinstance(value, np.generic) else value
+        return self.selection(values)
+
+    def similar(self, selection, k=5, other_brands=True, same_region=True):
+        """Up to ``k`` ``SimilarUnit`` nearest to ``selection`` by their numeric specs, nearest first.
+
+        See ``SimilarityIndex.nearest`` for ``other_brands`` and ``same_region``.
+        """
+        position = self.row_position(selection)
+        if position is None:
+            return []
+        return [SimilarUnit(self.selection_at(n.position), n.position, n.distance)
+                for n in self.similarity.nearest(position, k, other_brands, same_region)]
+
+    def size_for_airflow(self, airflow, rank_by="air_speed", limit=None, **filters):
+        """``SizedUnit`` of every unit size whose airflow range covers ``airflow``, best first.
+
+        See ``AirflowIndex.search`` for ``rank_by`` and the ``filters``
+        (``recovery``, ``region``, ``quarter``, ``year``).
+        """
+        return [SizedUnit(self.selection_at(m.position), m.position, m.air_speed, m.efficiency)
+                for m in self.airflows.search(airflow, rank_by, limit, **filters)]
+
+    def editions(self):
+        """``(year, quarter)`` of every edition in the catalogue, newest first."""
+        root = self.index.root
+        return [(year, quarter) for year in reversed(root.options) for quarter in reversed(root.child(year).options)]
+
+    def diff(self, old, new, region=None, brand=None):
+        """``EditionDiff`` between editions ``old`` and ``new`` (``(year, quarter)`` each); see ``edition_diff``."""
+        return edition_diff(self.frame, self.schema, old, new, region, brand)
+
+    def unit_rows(self, selection):
+        """Catalogue rows matching ``selection``."""
+        return self.frame.iloc[self.node(selection).rows]
+
+    def compare(self, selections):
+        """Build the ``ComparisonResult`` for a sequence of ``Selection`` objects."""
+        selections = tuple(selections)
+        row_positions = tuple(self.row_position(s) for s in selections)
+        matrix = build_matrix(self.frame, self.schema, row_positions, selections, self.rows)
+        return ComparisonResult(selections, row_positions, matrix,
+                                tuple(display_items(matrix, self.schema)), self.version)
+
+
+_default_dataset = None
+_default_lock = threading.Lock()
+
+
+def default_dataset(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET):
+    """Process-wide ``Dataset`` for ``path``, reloaded when the workbook changes."""
+    global _default_dataset
+    version = catalogue_version(path)
+    with _default_lock:
+        current = _default_dataset
+        if current is None or (current.path, current.sheet_name, current.version) != (path, sheet_name, version):
+            current = _default_dataset = Dataset.load(path, sheet_name)
+    return current
+
+
+def compare(selections, dataset=None):
+    """Compare ``selections`` against ``dataset`` (the default workbook when omitted)."""
+    if dataset is None:
+        dataset = default_dataset()
+    return dataset.compare(selections)
@@ -0,0 +1,71 @@
+"""Outline and duct connection geometry of the compared units, as NumPy arrays.
+
+The cross-section charts draw points x1/y1 .. x15/y15 of each unit's row:
+points 1-5 outline the supply filter section, 6-10 the supply fan section and
+11-15 a rectangular duct connection.  A round duct connection has no points,
+only a diameter.  All of it is read for the selected rows in one block and the
+shapes are worked out with array operations, one row per unit.
+"""
+import numpy as np
+
+CIRCLE_POINTS = 100
+
+
+def column_block(df, columns, row_positions):
+    """Values of ``columns`` for the rows at ``row_positions``, as a (units, columns) float array.
+
+    Units whose position is None and columns that are None (not in the
+    catalogue) are NaN, as are cells that are not numbers.
+    """
+    block = np.full((len(row_positions), len(columns)), np.nan)
+    rows = [i for i, pos in enumerate(row_positions) if pos is not None]
+    cols = [j for j, col in enumerate(columns) if col is not None]
+    if rows and cols:
+        values = df.iloc[[row_positions[i] for i in rows], [df.columns.get_loc(columns[j]) for j in cols]]
+        try:
+            values = values.to_numpy(dtype=float, na_value=np.nan)
+        except (TypeError, ValueError):
+            values = values.apply(lambda s: s.map(_as_float)).to_numpy(dtype=float)
+        block[np.ix_(rows, cols)] = values
+    return block
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def coordinate_block(df, schema, row_positions):
+    """x and y of points 1..15 for each unit, as two (units, 15) float arrays.
+
+    A point whose x or y column is missing from the catalogue is NaN on both
+    axes.
+    """
+    pairs = [(x, y) if x and y else (None, None) for x, y in schema.coords]
+    block = column_block(df, [col for pair in pairs for col in pair], row_positions)
+    return block[:, 0::2], block[:, 1::2]
+
+
+def complete(xs, ys):
+    """Units whose every point is known."""
+    return np.isfinite(xs).all(axis=1) & np.isfinite(ys).all(axis=1)
+
+
+def rectangular(xs, ys):
+    """Units with at least one known, non-zero coordinate among the given points."""
+    known = np.concatenate([xs, ys], axis=1)
+    return (np.isfinite(known) & (known != 0)).any(axis=1)
+
+
+def round_duct(diameters):
+    """Units with a known, positive duct diameter."""
+    return np.isfinite(diameters) & (diameters > 0)
+
+
+def circles(diameters, points=CIRCLE_POINTS):
+    """Circles of the given diameters touching both axes, as two (units, points) arrays."""
+    radius = np.asarray(diameters, dtype=float)[:, None] / 2.0
+    theta = np.linspace(0, 2 * np.pi, points)
+    return radius + radius * np.cos(theta), radius + radius * np.sin(theta)
@@ -0,0 +1,179 @@
+"""Resized, cached brand logos and unit photos.
+
+Every rerun used to open the full-size PNG for each unit from ``images/`` and
+resample it to the common row height.  ``ImageService`` keeps the resized
+thumbnails encoded and ready to serve: in memory (LRU) and on disk under the
+snapshot cache directory, keyed by the source file's mtime so a replaced
+image is picked up.  Writing a thumbnail removes the ones of the image's
+earlier versions at that height, and ``prune`` removes those of images that
+were replaced or deleted since, so the disk cache holds only current images.
+Misses are decoded and resampled on a thread pool, one image per unit; the
+pool is started on the first batch of misses and kept until ``close``.
+
+Thumbnails are stored as PNG by default because ``st.image`` passes PNG/JPEG
+bytes through untouched but re-encodes any other format on every call.
+"""
+import glob
+import hashlib
+import io
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .cache import LRUCache
+from .loader import DEFAULT_WORKBOOK, snapshot_dir
+
+DEFAULT_IMAGE_DIR = "images"
+
+Thumbnail = namedtuple("Thumbnail", ["data", "width", "height"])
+
+
+class ImageService:
+    def __init__(self, image_dir=DEFAULT_IMAGE_DIR, cache_dir=None, maxsize=256, workers=8, format="PNG"):
+        self.image_dir = image_dir
+        if cache_dir is None:
+            cache_dir = os.path.join(snapshot_dir(DEFAULT_WORKBOOK), "images")
+        self.cache_dir = cache_dir
+        self.format = format.upper()
+        self.workers = workers
+        self._sizes = LRUCache(maxsize)
+        self._thumbnails = LRUCache(maxsize)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.image_dir, name)
+
+    def _source_key(self, name):
+        stat = os.stat(self.path(name))
+        return name, stat.st_mtime_ns, stat.st_size
+
+    def native_size(self, name):
+        """(width, height) of the source image; only the file header is read.
+
+        Raises ``FileNotFoundError`` for a missing file and PIL's errors for an
+        unreadable one.
+        """
+        key = self._source_key(name)
+
+        def read_size():
+            with Image.open(self.path(name)) as img:
+                return img.size
+
+        return self._sizes.get_or_create(key, read_size)
+
+    @staticmethod
+    def scaled_width(size, height):
+        width, native_height = size
+        return int(width * (height / native_height))
+
+    @staticmethod
+    def _digest(name):
+        return hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+
+    def _disk_path(self, key, height):
+        name, mtime_ns, size = key
+        return os.path.join(self.cache_dir, f"{self._digest(name)}.{height}.{mtime_ns:x}-{size:x}.{self.format.lower()}")
+
+    def thumbnail(self, name, height):
+        """The image scaled to ``height`` pixels (aspect ratio kept), as an encoded ``Thumbnail``."""
+        key = self._source_key(name)
+        return self._thumbnails.get_or_create((key, height, self.format), lambda: self._load_or_render(key, height))
+
+    def _load_or_render(self, key, height):
+        disk_path = self._disk_path(key, height)
+        try:
+            with open(disk_path, "rb") as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as img:
+                return Thumbnail(data, img.width, img.height)
+        except OSError:
+            pass
+
+        with Image.open(self.path(key[0])) as img:
+            width = self.scaled_width(img.size, height)
+            resized = img.resize((width, height))
+        buf = io.BytesIO()
+        resized.save(buf, format=self.format)
+        data = buf.getvalue()
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            pass
+        else:
+            self._prune_versions(key[0], height, disk_path)
+        return Thumbnail(data, width, height)
+
+    def _prune_versions(self, name, height, current):
+        pattern = os.path.join(glob.escape(self.cache_dir), f"{self._digest(name)}.{height}.*.{self.format.lower()}")
+        for stale in glob.glob(pattern):
+            if stale != current:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def prune(self):
+        """Remove the disk thumbnails of images that were replaced or deleted; returns how many."""
+        current = {}
+        names = [os.path.relpath(os.path.join(root, f), self.image_dir)
+                 for root, _, files in os.walk(self.image_dir) for f in files]
+        if not names:
+            # A missing or unreadable image directory says nothing about the thumbnails
+            return 0
+        for name in names:
+            try:
+                _, mtime_ns, size = self._source_key(name)
+            except OSError:
+                continue
+            current[self._digest(name)] = f"{mtime_ns:x}-{size:x}"
+        removed = 0
+        for path in glob.glob(os.path.join(glob.escape(self.cache_dir), f"*.{self.format.lower()}")):
+            # "<digest>.<height>.<mtime>-<size>.<format>"
+            parts = os.path.basename(path).split(".")
+            if len(parts) == 4 and current.get(parts[0]) == parts[2]:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def thumbnails(self, requests):
+        """Resolve ``(name, height)`` pairs in parallel.
+
+        Returns one entry per request: a ``Thumbnail``, or the exception raised
+        while loading it.
+        """
+        def load(request):
+            try:
+                return self.thumbnail(*request)
+            except Exception as e:
+                return e
+
+        if len(requests) <= 1:
+            return [load(r) for r in requests]
+        return list(self._executor().map(load, requests))
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnails")
+        return self._pool
+
+    def close(self):
+        """Stop the thread pool; a later ``thumbnails`` call starts a new one."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,212 @@
+"""Loading the AHU catalogue with a columnar snapshot cache.
+
+Parsing the "data" sheet with openpyxl dominates cold-start time, so the
+first load converts the workbook into an uncompressed Arrow IPC (Feather)
+snapshot stored next to it.  Later loads, including those from other worker
+processes, memory-map that snapshot instead of re-parsing the XLSX.  Numeric
+columns convert to pandas without copying (``split_blocks``), so they stay
+read-only views of the mapped file, shared through the page cache; text
+columns are still decoded into each process's heap.  The snapshot file name
+carries the workbook's mtime and size, so an edited workbook gets a new
+snapshot on the next load and stale ones are removed.
+
+Loaded frames are compacted (``compact_frame``): repetitive text columns
+(brands, regions, unit names, recovery types, image file names...) become
+categoricals, so every worker holds each distinct string once and the
+cascade groups by integer codes, and numeric columns are narrowed where no
+value, and no value's text, changes.
+"""
+import glob
+import logging
+import os
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow is optional
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKBOOK = "Data_2025_2.xlsx"
+DEFAULT_SHEET = "data"
+
+# Overrides the snapshot directory (defaults to ".ahu_cache" beside the workbook)
+CACHE_DIR_ENV = "AHU_CACHE_DIR"
+
+# Catalogues already in the snapshot format are read as they are
+COLUMNAR_SUFFIXES = (".feather", ".arrow")
+
+# Bumped whenever loaded frames or the snapshot layout change (e.g. dtypes,
+# compression), so older snapshots are rebuilt
+SNAPSHOT_FORMAT = 3
+
+# "<workbook stem>.<sheet>.<version>.v<format>.feather"; stem and sheet may hold dots
+_SNAPSHOT_NAME = re.compile(r"(?P<prefix>.+)\.[0-9a-f]+-[0-9a-f]+\.v\d+\.feather")
+
+# Text columns with at most this many distinct values per row become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+
+def catalogue_version(path=DEFAULT_WORKBOOK):
+    """Return a short token that changes whenever the workbook changes."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def snapshot_dir(path=DEFAULT_WORKBOOK):
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir:
+        return cache_dir
+    return os.path.join(os.path.dirname(os.path.abspath(path)), ".ahu_cache")
+
+
+def snapshot_path(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, version=None):
+    if version is None:
+        version = catalogue_version(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(snapshot_dir(path), f"{stem}.{sheet_name}.{version}.v{SNAPSHOT_FORMAT}.feather")
+
+
+def _normalise_frame(df):
+    # Arrow cannot store object columns that mix numbers and text (e.g. "Type"
+    # holds both "NH.RRG" and 0).  Keep them as text so snapshot and workbook
+    # loads return identical frames; str() of the cell is what the app shows.
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object:
+            continue
+        kinds = series.dropna().map(type).unique()
+        if len(kinds) > 1:
+            df[col] = series.where(series.isna(), series.astype(str)).infer_objects()
+    return df
+
+
+def _fits_float32(values):
+    # Exact in float32, and printed the same: float32 shortens some exact
+    # values ("0.3") and switches to exponents earlier ("1e+07")
+    finite = values[np.isfinite(values)]
+    narrow = finite.astype(np.float32)
+    if not np.array_equal(narrow, finite):
+        return False
+    return all(str(wide) == str(np.float32(wide)) for wide in np.unique(finite))
+
+
+def compact_frame(df):
+    """Shrink ``df`` in place without changing any value or how it prints; returns it.
+
+    Text columns whose distinct values number at most ``CATEGORY_MAX_RATIO``
+    of their rows become categoricals, integer columns take the smallest
+    integer dtype that holds them, and float columns become float32 when
+    every value survives the round trip and prints the same.
+    """
+    for col in df.columns:
+        series = df[col]
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if dtype.kind in "iu":
+            df[col] = pd.to_numeric(series, downcast="integer" if dtype.kind == "i" else "unsigned")
+        elif dtype.kind == "f":
+            if dtype != np.float32 and _fits_float32(series.to_numpy()):
+                df[col] = series.astype(np.float32)
+        elif pd.api.types.infer_dtype(series, skipna=True) == "string":
+            if series.nunique() <= CATEGORY_MAX_RATIO * series.count():
+                df[col] = series.astype("category")
+    return df
+
+
+def read_workbook(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET):
+    """Parse the workbook directly, bypassing the snapshot cache."""
+    df = pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl")
+    return compact_frame(_normalise_frame(df))
+
+
+def write_workbook(df, path, sheet_name=DEFAULT_SHEET):
+    """Write ``df`` as a one-sheet workbook, streaming rows (openpyxl write-only mode)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(col) for col in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if pd.isna(value) else value for value in row])
+    wb.save(path)
+
+
+def is_columnar(path):
+    return path.lower().endswith(COLUMNAR_SUFFIXES)
+
+
+def read_snapshot(snapshot):
+    """Memory-map ``snapshot``; numeric columns are read-only views of the file when it is uncompressed."""
+    return feather.read_table(snapshot, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def write_snapshot(df, snapshot):
+    """Write ``df`` to ``snapshot`` atomically so concurrent readers never see a partial file."""
+    directory = os.path.dirname(snapshot)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)
+    try:
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, snapshot)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _snapshot_prefix(name):
+    """``"<workbook stem>.<sheet>"`` of a snapshot file name, or None for other files."""
+    match = _SNAPSHOT_NAME.fullmatch(name)
+    return match.group("prefix") if match else None
+
+
+def _prune_snapshots(snapshot):
+    # Only snapshots of the same workbook and sheet, whichever version or format
+    prefix = _snapshot_prefix(os.path.basename(snapshot))
+    if prefix is None:
+        return
+    pattern = os.path.join(os.path.dirname(snapshot), f"{glob.escape(prefix)}.*.feather")
+    for stale in glob.glob(pattern):
+        if stale != snapshot and _snapshot_prefix(os.path.basename(stale)) == prefix:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_catalogue(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET):
+    """Load the catalogue sheet, going through the snapshot cache when pyarrow is available.
+
+    ``path`` may also be a Feather/Arrow file (e.g. a generated catalogue),
+    which is memory-mapped directly and compacted; ``sheet_name`` is then ignored.
+    """
+    if is_columnar(path):
+        if feather is None:
+            raise ImportError(f"pyarrow is required to read {path}")
+        return compact_frame(read_snapshot(path))
+    if feather is None:
+        return read_workbook(path, sheet_name)
+
+    snapshot = snapshot_path(path, sheet_name)
+    if os.path.exists(snapshot):
+        try:
+            return read_snapshot(snapshot)
+        except Exception as e:
+            logger.warning("Ignoring unreadable catalogue snapshot %s: %s", snapshot, e)
+
+    df = read_workbook(path, sheet_name)
+    try:
+        write_snapshot(df, snapshot)
+        _prune_snapshots(snapshot)
+    except Exception as e:
+        logger.warning("Could not write catalogue snapshot %s: %s", snapshot, e)
+    return df
@@ -0,0 +1,262 @@
+"""The comparison charts drawn with Pillow, for reports made without a browser.
+
+plotly's static export (``charts.figure_png``) needs kaleido, which drives a
+headless browser that report workers do not have.  ``figure_image`` draws
+the figures of ``ahu_compare.charts`` from their JSON instead: scatter traces
+as lines, markers and text labels, bar traces grouped per category, on the
+look of plotly's default template (blue-grey plot area, white grid, legend on
+the right), with equal axis scales where the layout anchors y to x as the
+cross-section charts do.  Other trace types and layout settings are not
+drawn.
+
+Images are drawn at ``SUPERSAMPLE`` times their size and scaled down, which
+smooths the lines and text that Pillow draws without antialiasing.
+"""
+import base64
+import functools
+import math
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+PLOT_BACKGROUND = "#E5ECF6"
+GRID_COLOR = "#FFFFFF"
+TEXT_COLOR = "#2A3F5F"
+SUPERSAMPLE = 2
+
+# Share of each category taken by its bars (plotly's default bargap of 0.2)
+BAR_GROUP_WIDTH = 0.8
+
+
+@functools.lru_cache(maxsize=32)
+def font(size, bold=False):
+    """DejaVu Sans at ``size`` pixels, or Pillow's default font where it is not installed."""
+    try:
+        return ImageFont.truetype("DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def text_size(text, text_font):
+    left, top, right, bottom = text_font.getbbox(text)
+    return right - left, bottom - top
+
+
+def _title(value):
+    """Text of a plotly title, given as a string or as ``{"text": ...}``."""
+    if isinstance(value, dict):
+        value = value.get("text")
+    return "" if value is None else str(value)
+
+
+def _values(trace, axis):
+    values = trace.get(axis)
+    if values is None:
+        return []
+    if isinstance(values, dict) and "bdata" in values:
+        # plotly's typed array encoding of NumPy arrays
+        values = np.frombuffer(base64.b64decode(values["bdata"]), dtype=values["dtype"])
+    return np.asarray(values, dtype=object).ravel().tolist()
+
+
+def _ticks(low, high, count=6):
+    """Round tick values between ``low`` and ``high``, about ``count`` of them."""
+    raw = (high - low) / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw)
+    first = math.ceil(low / step)
+    return [round(n * step, 10) for n in range(first, math.floor(high / step) + 1)]
+
+
+class _Axis:
+    """A linear or category axis mapped onto ``[start, end]`` pixels."""
+
+    def __init__(self, values, include_zero=False):
+        self.categories = []
+        if any(isinstance(v, str) for v in values):
+            for value in values:
+                if value not in self.categories:
+                    self.categories.append(value)
+            self.low, self.high = -0.5, len(self.categories) - 0.5
+            return
+        numbers = np.array([v for v in values if v is not None], dtype=float)
+        numbers = numbers[np.isfinite(numbers)]
+        if include_zero:
+            numbers = np.append(numbers, 0.0)
+        low, high = (numbers.min(), numbers.max()) if len(numbers) else (0.0, 1.0)
+        pad = (high - low) * 0.05 if high > low else 1.0
+        self.low, self.high = low - pad, high + (0 if include_zero and high == 0 else pad)
+        if include_zero and low >= 0:
+            self.low = 0.0
+
+    @property
+    def category(self):
+        return bool(self.categories)
+
+    def position(self, value):
+        return self.categories.index(value) if self.category else float(value)
+
+    def expand(self, span):
+        """Widen the range to ``span`` about its centre (equal axis scales)."""
+        centre = (self.low + self.high) / 2
+        self.low, self.high = centre - span / 2, centre + span / 2
+
+    def ticks(self):
+        """``(value, label)`` of each tick."""
+        if self.category:
+            return [(n, str(c)) for n, c in enumerate(self.categories)]
+        return [(t, f"{t:g}") for t in _ticks(self.low, self.high)]
+
+
+def _rotated_text(text, text_font, color):
+    width, height = text_size(text, text_font)
+    label = Image.new("RGBA", (width + 4, height + 8), (255, 255, 255, 0))
+    ImageDraw.Draw(label).text((2, 0), text, font=text_font, fill=color)
+    return label.rotate(90, expand=True)
+
+
+def _segments(xs, ys):
+    """Runs of consecutive finite points."""
+    run = []
+    for x, y in zip(xs, ys):
+        if x is None or y is None or (isinstance(x, float) and math.isnan(x)) or \
+                (isinstance(y, float) and math.isnan(y)):
+            if run:
+                yield run
+            run = []
+        else:
+            run.append((x, y))
+    if run:
+        yield run
+
+
+def figure_image(figure, width=1000, height=500, base_size=13):
+    """An RGB ``PIL.Image`` of ``figure`` (a plotly ``Figure`` or its JSON), ``width`` x ``height`` pixels."""
+    if not isinstance(figure, dict):
+        figure = figure.to_plotly_json()
+    traces = figure.get("data") or []
+    layout = figure.get("layout") or {}
+    s = SUPERSAMPLE
+    image = Image.new("RGB", (width * s, height * s), "white")
+    draw = ImageDraw.Draw(image)
+    body, small, heading = font(base_size * s), font((base_size - 1) * s), font((base_size + 4) * s)
+
+    bars = [t for t in traces if t.get("type") == "bar"]
+    x_axis = _Axis([v for t in traces for v in _values(t, "x")])
+    y_axis = _Axis([v for t in traces for v in _values(t, "y")], include_zero=bool(bars))
+
+    # Margins: title on top, legend on the right, tick labels and axis titles left and below
+    title = _title(layout.get("title"))
+    top = (text_size(title, heading)[1] + 30 * s) if title else 20 * s
+    legend_title = _title(layout.get("legend", {}).get("title"))
+    entries = [t for t in traces if t.get("showlegend", True) and t.get("name")]
+    legend_width = max([text_size(str(t["name"]), small)[0] + 40 * s for t in entries]
+                       + [text_size(legend_title, body)[0] + 10 * s], default=0)
+    x_title = _title(layout.get("xaxis", {}).get("title"))
+    y_title = _title(layout.get("yaxis", {}).get("title"))
+    y_labels = [label for _, label in y_axis.ticks()]
+    left = max([text_size(label, small)[0] for label in y_labels], default=0) + 16 * s
+    left += (text_size(y_title, body)[1] + 16 * s) if y_title else 0
+    bottom = text_size("0", small)[1] + 20 * s + ((text_size(x_title, body)[1] + 12 * s) if x_title else 0)
+    right = legend_width + 20 * s if entries else 20 * s
+    # A narrow image with a wide legend keeps a plot area, drawn under the legend
+    plot = (left, top, max(left + s, width * s - right), max(top + s, height * s - bottom))
+    plot_width, plot_height = plot[2] - plot[0], plot[3] - plot[1]
+
+    if layout.get("yaxis", {}).get("scaleanchor") == "x" and not (x_axis.category or y_axis.category):
+        scale = min(plot_width / (x_axis.high - x_axis.low), plot_height / (y_axis.high - y_axis.low))
+        x_axis.expand(plot_width / scale)
+        y_axis.expand(plot_height / scale)
+
+    # Pixel of an axis position (a number, or a category's index), and of a data point
+    def to_x(position):
+        return plot[0] + (position - x_axis.low) / (x_axis.high - x_axis.low) * plot_width
+
+    def to_y(position):
+        return plot[3] - (position - y_axis.low) / (y_axis.high - y_axis.low) * plot_height
+
+    def px(x, y):
+        return to_x(x_axis.position(x)), to_y(y_axis.position(y))
+
+    draw.rectangle(plot, fill=PLOT_BACKGROUND)
+    for value, label in x_axis.ticks():
+        x = to_x(value)
+        if plot[0] <= x <= plot[2]:
+            draw.line([(x, plot[1]), (x, plot[3])], fill=GRID_COLOR, width=s)
+            w, _ = text_size(label, small)
+            draw.text((x - w / 2, plot[3] + 6 * s), label, font=small, fill=TEXT_COLOR)
+    y_ticks = y_axis.ticks()
+    if y_axis.category:
+        # Every n-th category only, where their labels would overlap
+        spacing = plot_height / max(len(y_ticks), 1)
+        y_ticks = y_ticks[::max(1, math.ceil((text_size("Ag", small)[1] + 4 * s) / spacing))]
+    for value, label in y_ticks:
+        y = to_y(value)
+        if plot[1] <= y <= plot[3]:
+            draw.line([(plot[0], y), (plot[2], y)], fill=GRID_COLOR, width=s)
+            w, h = text_size(label, small)
+            draw.text((plot[0] - w - 8 * s, y - h / 2 - 2 * s), label, font=small, fill=TEXT_COLOR)
+
+    # Bars first, then lines, markers and labels over them
+    for n, trace in enumerate(bars):
+        color = trace.get("marker", {}).get("color", TEXT_COLOR)
+        slot = BAR_GROUP_WIDTH / len(bars)
+        for x, y in zip(_values(trace, "x"), _values(trace, "y")):
+            if y is None or not np.isfinite(float(y)):
+                continue
+            centre = x_axis.position(x) - BAR_GROUP_WIDTH / 2 + slot * (n + 0.5)
+            y0, y1 = sorted((to_y(0.0), to_y(float(y))))
+            draw.rectangle((to_x(centre - slot / 2), y0, to_x(centre + slot / 2), y1), fill=color)
+
+    for trace in traces:
+        if trace.get("type", "scatter") != "scatter":
+            continue
+        mode = trace.get("mode") or "lines+markers"
+        color = trace.get("line", {}).get("color") or trace.get("marker", {}).get("color") or TEXT_COLOR
+        xs, ys = _values(trace, "x"), _values(trace, "y")
+        for run in _segments(xs, ys):
+            points = [px(x, y) for x, y in run]
+            if "lines" in mode and len(points) > 1:
+                draw.line(points, fill=color, width=2 * s, joint="curve")
+            if "markers" in mode:
+                for x, y in points:
+                    draw.ellipse((x - 4 * s, y - 4 * s, x + 4 * s, y + 4 * s), fill=color)
+        if "text" in mode:
+            labels = _values(trace, "text")
+            for (x, y), label in zip(zip(xs, ys), labels):
+                if x is None or y is None or label is None:
+                    continue
+                cx, cy = px(x, y)
+                w, h = text_size(str(label), small)
+                draw.text((cx - w / 2, cy - h - 10 * s), str(label), font=small, fill=TEXT_COLOR)
+
+    if title:
+        draw.text((left, 12 * s), title, font=heading, fill=TEXT_COLOR)
+    if x_title:
+        w, h = text_size(x_title, body)
+        draw.text(((plot[0] + plot[2]) / 2 - w / 2, height * s - h - 12 * s), x_title, font=body, fill=TEXT_COLOR)
+    if y_title:
+        label = _rotated_text(y_title, body, TEXT_COLOR)
+        image.paste(label, (6 * s, int((plot[1] + plot[3]) / 2 - label.height / 2)), label)
+
+    if entries:
+        x, y = plot[2] + 20 * s, plot[1]
+        if legend_title:
+            draw.text((x, y), legend_title, font=body, fill=TEXT_COLOR)
+            y += text_size(legend_title, body)[1] + 12 * s
+        for trace in entries:
+            color = trace.get("marker", {}).get("color") or trace.get("line", {}).get("color") or TEXT_COLOR
+            _, h = text_size(str(trace["name"]), small)
+            middle = y + h / 2 + 2 * s
+            if trace.get("type") == "bar":
+                draw.rectangle((x, middle - 6 * s, x + 24 * s, middle + 6 * s), fill=color)
+            else:
+                mode = trace.get("mode") or "lines+markers"
+                if "lines" in mode:
+                    draw.line([(x, middle), (x + 24 * s, middle)], fill=color, width=2 * s)
+                if "markers" in mode:
+                    draw.ellipse((x + 8 * s, middle - 4 * s, x + 16 * s, middle + 4 * s), fill=color)
+            draw.text((x + 32 * s, y), str(trace["name"]), font=small, fill=TEXT_COLOR)
+            y += h + 12 * s
+
+    return image.resize((width, height), Image.LANCZOS) if s > 1 else image
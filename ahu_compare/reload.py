@@ -0,0 +1,95 @@
+"""A dataset that follows the workbook without making users wait.
+
+Keying ``st.cache_resource`` by ``catalogue_version()`` reloaded an edited
+workbook on the first rerun after the change, so whoever came next waited for
+the whole parse.  ``DatasetHandle`` loads the catalogue once, then a daemon
+thread polls the workbook's version.  When the version changes and holds for
+one more poll (so a file that is still being copied is not parsed), the new
+catalogue is loaded and its derived structures are built in that thread, and
+only then swapped in with a single reference assignment.
+
+Reruns read ``handle.dataset`` once and use that object throughout, so a swap
+never mixes two versions within one rerun; caches keyed by
+``Dataset.version`` (figures, per-unit state) rebuild on the next rerun.  A
+workbook that fails to load is logged and skipped until it changes again,
+and the previous dataset stays in service meanwhile.
+"""
+import logging
+import threading
+
+from .engine import Dataset
+from .loader import DEFAULT_SHEET, DEFAULT_WORKBOOK, catalogue_version
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetHandle:
+    """The current ``Dataset`` of a workbook, replaced in the background when the workbook changes."""
+
+    def __init__(self, path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, interval=2.0, watch=True):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.interval = interval
+        self.reloads = 0
+        self._failed = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.dataset = self._load()
+        if watch:
+            self.start()
+
+    def _load(self):
+        dataset = Dataset.load(self.path, self.sheet_name)
+        dataset.warm()
+        return dataset
+
+    @property
+    def version(self):
+        return self.dataset.version
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="ahu-catalogue-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            try:
+                version = catalogue_version(self.path)
+            except OSError:
+                # Being replaced; look again on the next poll
+                continue
+            if version in (self.dataset.version, self._failed):
+                pending = None
+            elif version != pending:
+                pending = version
+            else:
+                pending = None
+                self.reload()
+
+    def reload(self):
+        """Load the workbook in the calling thread and swap it in; returns the new dataset, or None on failure."""
+        with self._reload_lock:
+            try:
+                dataset = self._load()
+            except Exception as e:
+                try:
+                    self._failed = catalogue_version(self.path)
+                except OSError:
+                    self._failed = None
+                logger.warning("Keeping catalogue version %s; reloading %s failed: %s",
+                               self.dataset.version, self.path, e)
+                return None
+            self._failed = None
+            self.dataset = dataset
+            self.reloads += 1
+            logger.info("Reloaded %s (version %s)", self.path, dataset.version)
+            return dataset
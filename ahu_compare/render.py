@@ -0,0 +1,87 @@
+"""HTML rendering of the comparison table.
+
+Emitting one ``st.columns`` row and ``num_units + 1`` markdown widgets per
+parameter produced well over a thousand elements for a 10-unit comparison.
+Instead, consecutive header/row items of the page layout are grouped and each
+group is rendered as a single HTML table, so a page is a handful of markdown
+blocks with the charts slotted in between.
+"""
+from html import escape
+
+# Plotly's default qualitative palette, so table text matches the chart traces
+UNIT_COLORS = (
+    "#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A",
+    "#19D3F3", "#FF6692", "#B6E880", "#FF97FF", "#FECB52",
+)
+
+PARAMETER_WIDTH = 3
+UNIT_WIDTH = 2
+
+_TABLE_CLASS = "ahu-comparison"
+
+
+def unit_color(i, colors=UNIT_COLORS):
+    return colors[i % len(colors)]
+
+
+def group_table_items(items):
+    """Merge runs of header/row items into ``{"type": "table", "items": [...], "heading": bool}``.
+
+    Chart items are passed through.  The first table carries the column
+    headings (``heading``), as the page starts with them even before any row.
+    """
+    grouped = [{"type": "table", "items": [], "heading": True}]
+    for item in items:
+        if item["type"] == "chart":
+            grouped.append(item)
+        elif grouped[-1]["type"] == "table":
+            grouped[-1]["items"].append(item)
+        else:
+            grouped.append({"type": "table", "items": [item], "heading": False})
+    return [item for item in grouped if item["type"] == "chart" or item["items"] or item["heading"]]
+
+
+def table_css(num_units, colors=UNIT_COLORS):
+    """Style block shared by every comparison table on the page."""
+    rules = [
+        f".{_TABLE_CLASS} {{width: 100%; table-layout: fixed; border-collapse: collapse; border: none;}}",
+        f".{_TABLE_CLASS} th, .{_TABLE_CLASS} td {{border: none; padding: 0.25em 0.5em; font-family: sans-serif; font-size: 16px; text-align: center;}}",
+        f".{_TABLE_CLASS} th:first-child, .{_TABLE_CLASS} td:first-child {{text-align: left;}}",
+        f".{_TABLE_CLASS} h4 {{text-align: center; font-size: 1.2em; margin: 1em 0;}}",
+    ]
+    rules += [f".{_TABLE_CLASS} td.u{i} {{color: {unit_color(i, colors)};}}" for i in range(num_units)]
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+def _heading_row(headings):
+    cells = ["<th>Parameter</th>"] + [f"<th>{escape(str(h))}</th>" for h in headings]
+    return "<tr>" + "".join(cells) + "</tr>"
+
+
+def render_table_html(table, matrix, colors=UNIT_COLORS):
+    """Render one grouped ``table`` item against ``matrix`` as an HTML string.
+
+    The table that carries the column headings (the first on the page) also
+    carries the ``table_css`` style block used by all of them.
+    """
+    n = matrix.num_units
+    total = PARAMETER_WIDTH + UNIT_WIDTH * n
+    cols = [f'<col style="width: {100 * PARAMETER_WIDTH / total:.2f}%;">']
+    cols += [f'<col style="width: {100 * UNIT_WIDTH / total:.2f}%;">'] * n
+
+    lines = []
+    if table["heading"]:
+        lines.append(table_css(n, colors))
+    lines += [f'<table class="{_TABLE_CLASS}">', "<colgroup>" + "".join(cols) + "</colgroup>"]
+    if table["heading"]:
+        lines.append(_heading_row(matrix.headings))
+    for item in table["items"]:
+        if item["type"] == "header":
+            lines.append(f'<tr><td colspan="{n + 1}"><h4>{escape(item["title"])}</h4></td></tr>')
+            lines.append(_heading_row(matrix.headings))
+        else:
+            cells = [f'<td>{escape(str(item["col"]))}</td>']
+            cells += [f'<td class="u{i}">{escape(str(val))}</td>' for i, val in enumerate(matrix.row(item["col"]))]
+            lines.append("<tr>" + "".join(cells) + "</tr>")
+    lines.append("</table>")
+    return "\n".join(lines)
@@ -0,0 +1,358 @@
+"""Printable comparison reports as PDF, without a browser.
+
+Customers asked for printable comparisons and engineers screenshotted the
+page.  ``ReportRenderer`` lays out the page's content on A4 sheets: the brand
+logos and unit photos, then the items of ``display_items`` in order, runs of
+section headers and parameter rows as tables and the charts in between.  The
+units' headings open the table and are repeated at the top of each sheet it
+continues on, rather than under every section title as on the page.
+
+PDF output needs no dependency beyond Pillow: pages are drawn with Pillow at
+``REPORT_DPI`` and saved as one PDF, and charts are drawn by
+``raster.figure_image`` from the same per-unit traces the page uses.  The
+text is part of the page images, so it cannot be selected in the PDF.
+
+Reports of a batch often share units, so a renderer keeps what it drew:
+logos and photos come resized from an ``ImageService`` (memory and disk) and
+are kept decoded, each unit's chart traces are kept by catalogue version,
+chart name, slot and selection (a ``TraceCache``), and chart images by the
+selections of the whole chart, in memory and on disk beside the image
+thumbnails, so worker processes share them.  Chart images on disk are named
+by catalogue version: the first chart a renderer draws for a version, and
+every quarter of ``max_chart_files`` images it writes after it, removes those
+of other versions and keeps at most ``max_chart_files`` (the most recently
+written).  Batches are rendered on a process pool by the CLI
+(``python -m ahu_compare export -f pdf``), which sends reports sharing units
+to the same worker.
+"""
+import glob
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageDraw
+
+from .cache import LRUCache
+from .charts import TraceCache
+from .images import DEFAULT_IMAGE_DIR, ImageService
+from .loader import DEFAULT_WORKBOOK, snapshot_dir
+from .raster import TEXT_COLOR, figure_image, font, text_size
+from .render import PARAMETER_WIDTH, UNIT_COLORS, UNIT_WIDTH, group_table_items, unit_color
+
+PDF_MIME = "application/pdf"
+REPORT_DPI = 150
+# A4 at REPORT_DPI; comparisons of more than PORTRAIT_UNITS units are printed landscape
+PAGE_SIZE = (1240, 1754)
+PORTRAIT_UNITS = 4
+MARGIN = 70
+
+LOGO_HEIGHT = 60
+PHOTO_HEIGHT = 180
+CHART_ASPECT = 0.5
+TEXT_SIZE = 18
+CHART_TEXT_SIZE = 15
+SECTION_FILL = "#E8E8E8"
+RULE_COLOR = "#DDDDDD"
+CELL_PADDING = 8
+# Chart images kept on disk by default; see ``ReportRenderer.prune_charts``
+CHART_FILES = 2048
+
+
+def _wrap(text, text_font, width):
+    """``text`` broken into lines no wider than ``width`` pixels (long words are split)."""
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if text_size(candidate, text_font)[0] <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            # A word wider than the cell is cut where it no longer fits
+            while text_size(word, text_font)[0] > width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and text_size(word[:cut], text_font)[0] > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+class _Pages:
+    """Pages drawn top to bottom; ``reserve`` moves to a new page when the next block does not fit."""
+
+    def __init__(self, size):
+        self.size = size
+        self.pages = []
+        self.repeat = None
+        self._new_page()
+
+    def _new_page(self):
+        self.page = Image.new("RGB", self.size, "white")
+        self.draw = ImageDraw.Draw(self.page)
+        self.pages.append(self.page)
+        self.y = MARGIN
+        if self.repeat is not None:
+            self.repeat()
+
+    @property
+    def bottom(self):
+        return self.size[1] - MARGIN
+
+    def reserve(self, height):
+        if self.y + height > self.bottom and self.y > MARGIN:
+            self._new_page()
+        return self.y
+
+
+class ReportRenderer:
+    """Draws ``ComparisonResult`` reports, keeping images and charts for the next ones."""
+
+    def __init__(self, image_dir=DEFAULT_IMAGE_DIR, cache_dir=None, colors=UNIT_COLORS, maxsize=256,
+                 max_chart_files=CHART_FILES):
+        if cache_dir is None:
+            cache_dir = snapshot_dir(DEFAULT_WORKBOOK)
+        self.images = ImageService(image_dir, os.path.join(cache_dir, "images"), maxsize=maxsize)
+        self.chart_dir = os.path.join(cache_dir, "charts")
+        self.max_chart_files = max_chart_files
+        self._chart_version = None
+        self._chart_writes = 0
+        self.colors = tuple(colors)
+        self._decoded = LRUCache(maxsize)
+        self.traces = TraceCache(maxsize * 4)
+        self._charts = LRUCache(maxsize)
+        # Parameter names and values recur from report to report: their wrapped lines and rendered text
+        self._wrapped = LRUCache(maxsize * 32)
+        self._stamps = LRUCache(maxsize * 32)
+
+    # --- images ---
+
+    def _image(self, name, height, width):
+        """Image ``name`` at ``height`` pixels, shrunk to fit ``width``; None where it cannot be loaded."""
+        try:
+            thumbnail = self.images.thumbnail(name, height)
+        except Exception:
+            return None
+
+        def decode():
+            with Image.open(io.BytesIO(thumbnail.data)) as img:
+                img = img.convert("RGBA")
+                if img.width > width:
+                    img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+                return img
+
+        # Thumbnails are served as the same bytes object until their source changes
+        return self._decoded.get_or_create((thumbnail.data, width), decode)
+
+    def _image_names(self, dataset, result, column):
+        names = []
+        for position in result.row_positions:
+            value = None
+            if position is not None and column and column in dataset.frame.columns:
+                value = dataset.frame.iat[position, dataset.frame.columns.get_loc(column)]
+            names.append(None if value is None or value != value or not str(value).strip() else str(value))
+        return names
+
+    # --- charts ---
+
+    def _chart_path(self, key):
+        # "<catalogue version>.<digest>.png"; key[0] is the version
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.chart_dir, f"{key[0]}.{digest}.png")
+
+    def prune_charts(self, version):
+        """Remove the disk chart images of other catalogue versions than ``version``, then the oldest
+        beyond ``max_chart_files``; returns how many were removed."""
+        kept, removed = [], 0
+        for path in glob.glob(os.path.join(glob.escape(self.chart_dir), "*.png")):
+            try:
+                if os.path.basename(path).startswith(f"{version}."):
+                    kept.append((os.stat(path).st_mtime_ns, path))
+                    continue
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        kept.sort(reverse=True)
+        for _, path in kept[self.max_chart_files:]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def chart(self, dataset, result, name, width):
+        """Image of chart ``name`` of ``result``, ``width`` pixels wide; None when it has nothing to plot."""
+        if dataset.version != self._chart_version:
+            self._chart_version = dataset.version
+            self.prune_charts(dataset.version)
+        key = (dataset.version, name, result.selections, self.colors, width, CHART_TEXT_SIZE)
+        return self._charts.get_or_create(key, lambda: self._load_or_draw(dataset, result, name, width, key))
+
+    def _load_or_draw(self, dataset, result, name, width, key):
+        path = self._chart_path(key)
+        try:
+            with Image.open(path) as img:
+                return img.convert("RGB")
+        except OSError:
+            pass
+        fig = self.traces.figure(dataset, name, result.selections, self.colors, result.row_positions)
+        if fig is None:
+            return None
+        img = figure_image(fig, width, round(width * CHART_ASPECT), CHART_TEXT_SIZE)
+        try:
+            os.makedirs(self.chart_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            img.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+        except OSError:
+            return img
+        self._chart_writes += 1
+        if self._chart_writes % max(1, self.max_chart_files // 4) == 0:
+            self.prune_charts(dataset.version)
+        return img
+
+    # --- text ---
+
+    def _lines(self, text, text_font, width):
+        """``(line, width)`` of each line of ``text`` wrapped to ``width`` pixels."""
+        return self._wrapped.get_or_create((text, text_font, width), lambda: [
+            (line, text_size(line, text_font)[0]) for line in _wrap(text, text_font, width)])
+
+    def _text(self, page, xy, line, text_font, color):
+        """Draw one line of text at ``xy`` as ``ImageDraw.text`` does, from a mask rendered once."""
+        def render():
+            _, _, right, bottom = text_font.getbbox(line)
+            mask = Image.new("L", (max(right, 1), max(bottom, 1)), 0)
+            ImageDraw.Draw(mask).text((0, 0), line, font=text_font, fill=255)
+            return mask
+
+        page.paste(color, (int(xy[0]), int(xy[1])), self._stamps.get_or_create((line, text_font), render))
+
+    # --- layout ---
+
+    def pages(self, dataset, result, title="Technical Data Comparison"):
+        """The report of ``result`` as a list of RGB page images."""
+        n = result.num_units
+        size = PAGE_SIZE if n <= PORTRAIT_UNITS else PAGE_SIZE[::-1]
+        pages = _Pages(size)
+        content = size[0] - 2 * MARGIN
+        total = PARAMETER_WIDTH + UNIT_WIDTH * n
+        first = round(content * PARAMETER_WIDTH / total)
+        unit_width = (content - first) // n
+        columns = [MARGIN] + [MARGIN + first + i * unit_width for i in range(n + 1)]
+
+        body, bold = font(TEXT_SIZE), font(TEXT_SIZE, bold=True)
+        section_font, title_font = font(TEXT_SIZE + 4, bold=True), font(TEXT_SIZE + 14, bold=True)
+        line_height = text_size("Ag", body)[1] + 6
+
+        def cell_lines(text, text_font, width):
+            return self._lines(text, text_font, width - 2 * CELL_PADDING)
+
+        def row(cells, fonts, fills=None, colors=None):
+            wrapped = [cell_lines(cell, fonts[j], columns[j + 1] - columns[j]) for j, cell in enumerate(cells)]
+            height = max(len(lines) for lines in wrapped) * line_height + 2 * CELL_PADDING
+            y = pages.reserve(height)
+            for j, lines in enumerate(wrapped):
+                x0, x1 = columns[j], columns[j + 1]
+                if fills and fills[j]:
+                    pages.draw.rectangle((x0, y, x1 - 2, y + height - 2), fill=fills[j])
+                for k, (line, w) in enumerate(lines):
+                    x = x0 + CELL_PADDING if j == 0 else (x0 + x1 - w) / 2
+                    self._text(pages.page, (x, y + CELL_PADDING + k * line_height), line, fonts[j],
+                               colors[j] if colors else TEXT_COLOR)
+            pages.draw.line((MARGIN, y + height - 1, columns[-1], y + height - 1), fill=RULE_COLOR)
+            pages.y = y + height
+
+        unit_colors = [unit_color(i, self.colors) for i in range(n)]
+
+        def heading_row():
+            row(["Parameter"] + list(result.matrix.headings), [bold] * (n + 1),
+                fills=[None] + unit_colors, colors=[TEXT_COLOR] + ["white"] * n)
+
+        def section(text):
+            height = text_size(text, section_font)[1] + 2 * CELL_PADDING + 8
+            # Kept with the first row below it
+            y = pages.reserve(height + 2 * line_height + 2 * CELL_PADDING)
+            pages.draw.rectangle((MARGIN, y, columns[-1], y + height), fill=SECTION_FILL)
+            w = text_size(text, section_font)[0]
+            self._text(pages.page, ((MARGIN + columns[-1] - w) / 2, y + CELL_PADDING), text, section_font, TEXT_COLOR)
+            pages.y = y + height + 4
+
+        def images(label, column, height, caption):
+            names = self._image_names(dataset, result, column)
+            loaded = [self._image(name, height, unit_width - 2 * CELL_PADDING) if name else None for name in names]
+            tallest = max([img.height for img in loaded if img is not None] or [line_height])
+            y = pages.reserve(tallest + 2 * line_height + 2 * CELL_PADDING)
+            self._text(pages.page, (MARGIN + CELL_PADDING, y + CELL_PADDING), label, bold, TEXT_COLOR)
+            for i, img in enumerate(loaded):
+                x0, x1 = columns[i + 1], columns[i + 2]
+                if img is None:
+                    text = "No logo available." if column == dataset.schema.logo else "No unit photo available."
+                    lines = cell_lines(text, body, x1 - x0)
+                else:
+                    pages.page.paste(img, (int((x0 + x1 - img.width) / 2), y + CELL_PADDING), img)
+                    lines = cell_lines(caption(result.selections[i]), body, x1 - x0)
+                top = y + CELL_PADDING + (tallest + 6 if img is not None else 0)
+                for k, (line, w) in enumerate(lines[:2]):
+                    self._text(pages.page, ((x0 + x1 - w) / 2, top + k * line_height), line, body, TEXT_COLOR)
+            pages.y = y + tallest + 2 * line_height + 2 * CELL_PADDING
+
+        pages.draw.text((MARGIN, pages.y), title, font=title_font, fill=TEXT_COLOR)
+        pages.y += text_size(title, title_font)[1] + 30
+        if any(result.found):
+            images("Brand logo", dataset.schema.logo, LOGO_HEIGHT, lambda s: f"Logo for {s.brand}")
+            images("Unit photo", dataset.schema.unit_photo, PHOTO_HEIGHT, lambda s: f"{s.unit} Photo")
+            pages.y += 20
+
+        for item in group_table_items(result.items):
+            if item["type"] == "chart":
+                pages.repeat = None
+                img = self.chart(dataset, result, item["name"], content)
+                if img is not None:
+                    y = pages.reserve(img.height + 20)
+                    pages.page.paste(img, (MARGIN, y + 10))
+                    pages.y = y + img.height + 20
+                continue
+
+            if item["heading"]:
+                section("General data")
+            headed = False
+            for entry in item["items"]:
+                if entry["type"] == "header":
+                    section(entry["title"])
+                    continue
+                if not headed:
+                    # Once after each chart; later sheets get it from pages.repeat
+                    pages.repeat = None
+                    heading_row()
+                    pages.repeat, headed = heading_row, True
+                values = result.matrix.row(entry["col"])
+                row([entry["col"]] + [str(v) for v in values], [body] * (n + 1),
+                    colors=[TEXT_COLOR] + unit_colors)
+        pages.repeat = None
+
+        small = font(TEXT_SIZE - 4)
+        footer = f"{title} - catalogue {result.version}" if result.version else title
+        for number, page in enumerate(pages.pages, 1):
+            text = f"{footer} - page {number} of {len(pages.pages)}"
+            ImageDraw.Draw(page).text((MARGIN, size[1] - MARGIN + 20), text, font=small, fill="#888888")
+        return pages.pages
+
+    def write(self, dataset, result, target, title="Technical Data Comparison"):
+        """Write the report of ``result`` as a PDF to ``target`` (a path or a binary file)."""
+        pages = self.pages(dataset, result, title)
+        pages[0].save(target, format="PDF", save_all=True, append_images=pages[1:], resolution=REPORT_DPI,
+                      quality=90, title=title, subject=", ".join(result.matrix.headings))
+
+    def pdf(self, dataset, result, title="Technical Data Comparison"):
+        """The report of ``result`` as PDF bytes."""
+        buf = io.BytesIO()
+        self.write(dataset, result, buf, title)
+        return buf.getvalue()
+
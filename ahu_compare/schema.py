@@ -0,0 +1,193 @@
+"""Resolution of logical catalogue fields to physical column names.
+
+The workbook's headers have drifted between revisions ("Unit name" vs "Unit
+Name", one or two spaces in "Base frame/Feets height  [mm]", ...), so every
+field is looked up through a list of aliases.  ``resolve_schema`` does that
+once per distinct header row and returns an immutable ``Schema``; fields that
+match none of their aliases are ``None`` and are logged once at load time.
+"""
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Logical field -> accepted column names, in order of preference
+FIELD_ALIASES = {
+    "year": ("Year",),
+    "quarter": ("Quarter",),
+    "region": ("Region",),
+    "brand": ("Brand name", "Brand"),
+    "logo": ("Brand logo", "Brand Logo"),
+    "unit_photo": ("Unit photo", "Unit Photo", "Unit Photo Name"),
+    "unit_name": ("Unit name", "Unit Name"),
+    "recovery": ("Recovery type", "Recovery Type", "Recovery_type"),
+    "size": ("Unit size", "Unit Size"),
+    "type": ("Type",),
+    "material": ("Material",),
+    "unit_size_quantity": ("Unit size quantity", "Unit Size quantity"),
+    "execution": ("Execution",),
+    "eurovent_certificate": ("Eurovent Certificate",),
+    "eurovent_model_box": ("Eurovent Model Box",),
+    "supply": ("Supply",),
+    "insulation_material": ("Insulation material",),
+    "metal_sheet_thickness_external": ("Metal sheet thickness (External) [mm]", "Metal sheet thickness (External)"),
+    "minimum_airflow": ("Minimum airflow [CMH]",),
+    "maximum_airflow": ("Maximum airflow (CCOL) [CMH]", "Maximum airflow [CMH]"),
+    "optimal_airflow": ("Optimal airflow (ErP2018) [CMH]", "Optimal airflow [CMH]"),
+    "air_speed_filter": ("Air speed on Filter at opt airflow (ErP) [m/s]", "Air speed on Filter at opt airflow (ErP)"),
+    "internal_width_supply_filter": ("Internal Width (Supply Filter) [mm]",),
+    "internal_height_supply_filter": ("Internal Height (Supply Filter) [mm]", "Internal Height (Supply Filter)", "Internal Height Supply Filter"),
+    "unit_area_supply_filter": ("Unit cross section area (Supply Filter) [m2]",),
+    "unit_area_supply_fan": ("Unit cross section area (Supply Fan) [m2]", "Unit cross section area (Supply Fan)", "Unit cross section area Supply Fan"),
+    "duct_connection_width": ("Duct connection Width [mm]", "Duct connection Width"),
+    "duct_connection_height": ("Duct connection Height [mm]", "Duct connection Height", "Duct Connection Height"),
+    "duct_connection_diameter": ("Duct connection Diameter [mm]", "Duct connection Diameter", "Duct Connection Diameter"),
+    "wheel_diameter": ("Wheel diameter [mm]",),
+    "distance_between_lamels": ("Distance between lamels [mm]",),
+    "sens_efficiency_nominal_rrg": ("Sens. efficiency at nominal balanced airflows_RRG [%]", "Sens. efficiency at nominal balanced airflows [%]"),
+    "sens_efficiency_opt_rrg": ("Sens. efficiency at opt balanced airflows (ErP)_RRG [%]", "Sens. efficiency at opt balanced airflows (ErP) [%]"),
+    "sens_efficiency_nominal_pcr_hex": ("Sens. efficiency at nominal balanced airflows_PCR/HEX [%]", "Sens. efficiency at nominal balanced airflows [%].1"),
+    "sens_efficiency_opt_pcr_hex": ("Sens. efficiency at opt balanced airflows (ErP)_PCR/HEX [%]", "Sens. efficiency at opt balanced airflows (ErP) [%].1"),
+    "motor_type": ("Motor type",),
+    "impeller_size": ("Impeller size (available optins)", "Impeller size"),
+    "impeller_efficiency": ("Impeller efficiency at optimal airflow [%]", "Impeller efficiency at nominal airflow [%]"),
+    "heating_elements_type": ("Heating elements type", "Heating Elements Type", "Heating_elements_type"),
+    "capacity_range1": ("Capacity range1 [kW]", "Capacity range1", "Capacity Range1"),
+    "capacity_range2": ("Capacity range2 [kW]", "Capacity range2", "Capacity Range2"),
+    "capacity_range3": ("Capacity range3 [kW]", "Capacity range3", "Capacity Range3"),
+    "capacity_note": ("Capacity Note",),
+    "water_heater_min_rows": ("Water heater_min rows",),
+    "water_cooler_min_rows": ("Water cooler_min rows",),
+    "dxh_min_rows": ("DXH_min rows",),
+    "filter_type_supply": ("Filter type_Supply",),
+    "filter_type_exhaust": ("Filter type_Exhaust",),
+    "final_pd_supply": ("Final PD_Supply", "Final PD_typ1"),
+    "final_pd_exhaust": ("Final PD_Exhaust", "Final PD_typ2"),
+    "silencer_casing": ("Silencer casing",),
+    "base_frame_height": ("Base frame/Feets height [mm]", "Base frame/Feets height  [mm]"),
+    "cabling": ("Cabling",),
+}
+
+# Columns that open a new section of the comparison table, with the section title
+HEADER_TRIGGERS = (
+    ("eurovent_certificate", "Certification data"),
+    ("supply", "Available configurations"),
+    ("insulation_material", "Casing"),
+    ("base_frame_height", "Construction details"),
+    ("minimum_airflow", "Airflows"),
+    ("internal_width_supply_filter", "Overall dimensions"),
+    ("type", "Rotary wheel"),
+    ("sens_efficiency_nominal_pcr_hex", "PCR/HEX recovery exchanger"),
+    ("motor_type", "Fan section data"),
+    ("heating_elements_type", "Electrical heater"),
+    ("water_heater_min_rows", "Water heater"),
+    ("water_cooler_min_rows", "Water cooler"),
+    ("dxh_min_rows", "DX/DXH cooler"),
+    ("filter_type_supply", "Supply Filter"),
+    ("filter_type_exhaust", "Exhaust Filter"),
+    ("silencer_casing", "Silencer data"),
+)
+
+COORDINATE_POINTS = 15
+
+
+@dataclass(frozen=True, slots=True)
+class Schema:
+    year: str | None
+    quarter: str | None
+    region: str | None
+    brand: str | None
+    logo: str | None
+    unit_photo: str | None
+    unit_name: str | None
+    recovery: str | None
+    size: str | None
+    type: str | None
+    material: str | None
+    unit_size_quantity: str | None
+    execution: str | None
+    eurovent_certificate: str | None
+    eurovent_model_box: str | None
+    supply: str | None
+    insulation_material: str | None
+    metal_sheet_thickness_external: str | None
+    minimum_airflow: str | None
+    maximum_airflow: str | None
+    optimal_airflow: str | None
+    air_speed_filter: str | None
+    internal_width_supply_filter: str | None
+    internal_height_supply_filter: str | None
+    unit_area_supply_filter: str | None
+    unit_area_supply_fan: str | None
+    duct_connection_width: str | None
+    duct_connection_height: str | None
+    duct_connection_diameter: str | None
+    wheel_diameter: str | None
+    distance_between_lamels: str | None
+    sens_efficiency_nominal_rrg: str | None
+    sens_efficiency_opt_rrg: str | None
+    sens_efficiency_nominal_pcr_hex: str | None
+    sens_efficiency_opt_pcr_hex: str | None
+    motor_type: str | None
+    impeller_size: str | None
+    impeller_efficiency: str | None
+    heating_elements_type: str | None
+    capacity_range1: str | None
+    capacity_range2: str | None
+    capacity_range3: str | None
+    capacity_note: str | None
+    water_heater_min_rows: str | None
+    water_cooler_min_rows: str | None
+    dxh_min_rows: str | None
+    filter_type_supply: str | None
+    filter_type_exhaust: str | None
+    final_pd_supply: str | None
+    final_pd_exhaust: str | None
+    silencer_casing: str | None
+    base_frame_height: str | None
+    cabling: str | None
+    # (x, y) column pairs for chart points 1..15; either side may be None
+    coords: tuple[tuple[str | None, str | None], ...]
+    # (column, section title) of the columns that open a table section; pairs
+    # rather than a dict so that schemas hash and can key caches
+    header_triggers: tuple[tuple[str, str], ...]
+    # Logical fields that matched no column
+    missing: tuple[str, ...]
+
+    def coord_pairs(self, first, last):
+        """(x, y) column pairs for points ``first``..``last`` inclusive (1-based)."""
+        return list(self.coords[first - 1:last])
+
+    @property
+    def cascade_levels(self):
+        """Columns of the sidebar cascade, outermost first."""
+        return [self.year, self.quarter, self.region, self.brand, self.unit_name, self.recovery, self.size]
+
+
+def _first_present(columns, aliases):
+    for name in aliases:
+        if name in columns:
+            return name
+    return None
+
+
+@lru_cache(maxsize=8)
+def _resolve(columns):
+    present = frozenset(columns)
+    fields = {field: _first_present(present, aliases) for field, aliases in FIELD_ALIASES.items()}
+    coords = tuple(
+        (_first_present(present, (f"x{i}", f"X{i}")), _first_present(present, (f"y{i}", f"Y{i}")))
+        for i in range(1, COORDINATE_POINTS + 1)
+    )
+    header_triggers = tuple((fields[field], title) for field, title in HEADER_TRIGGERS if fields[field] is not None)
+    missing = tuple(field for field, col in fields.items() if col is None)
+    missing += tuple(f"{axis}{i}" for i, pair in enumerate(coords, 1) for axis, col in zip("xy", pair) if col is None)
+    if missing:
+        logger.warning("Catalogue is missing columns for: %s", ", ".join(missing))
+    return Schema(coords=coords, header_triggers=header_triggers, missing=missing, **fields)
+
+
+def resolve_schema(columns):
+    """Return the ``Schema`` for a header row (e.g. ``df.columns``); cached per header row."""
+    return _resolve(tuple(columns))
@@ -0,0 +1,134 @@
+"""A user's choice for one comparison slot."""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cascade import EMPTY_NODE, row_groups
+
+RRG = "RRG"
+PLATE_RECOVERIES = ("HEX", "PCR")
+
+# Selection fields that follow the cascade levels, outermost first
+CASCADE_FIELDS = ("year", "quarter", "region", "brand", "unit", "recovery", "size")
+
+
+@dataclass(frozen=True)
+class Selection:
+    """The values picked in one unit's sidebar expander.
+
+    ``type`` only applies to rotary wheels (RRG) and ``material`` only to
+    plate exchangers (HEX/PCR); the other stays ``None``.  Selections are
+    hashable so that tuples of them can key caches.
+    """
+
+    year: object
+    quarter: object
+    region: object
+    brand: object
+    unit: object
+    recovery: object
+    size: object
+    type: object = None
+    material: object = None
+
+    @property
+    def path(self):
+        """Values of the cascade levels, outermost first."""
+        return (self.year, self.quarter, self.region, self.brand, self.unit, self.recovery, self.size)
+
+    @property
+    def heading(self):
+        """Column heading used by the comparison table and exports."""
+        return f"{self.brand} - {self.unit} - {self.size}"
+
+
+def branch_column(schema, recovery):
+    """Column of the conditional last dropdown for ``recovery``, or None."""
+    if recovery == RRG:
+        return schema.type
+    if recovery in PLATE_RECOVERIES:
+        return schema.material
+    return None
+
+
+def branch_groups(df, schema):
+    """Type (rotary wheels) or Material (plate exchangers) each row is selected by, as a group number.
+
+    0 where neither applies, -1 where the one that applies is missing, so the
+    row cannot be selected.
+    """
+    groups = np.zeros(len(df), dtype=np.int64)
+    recovery = df[schema.recovery].astype(object)
+    for column, mask in ((schema.type, recovery == RRG), (schema.material, recovery.isin(PLATE_RECOVERIES))):
+        if column is None or column not in df.columns:
+            continue
+        mask = mask.to_numpy(dtype=bool)
+        values = row_groups(df, [column])[mask]
+        groups[mask] = np.where(values >= 0, values + 1, -1)
+    return groups
+
+
+def selection_groups(df, schema, levels=None):
+    """Group number of each row by ``levels`` (default: every cascade level) and its Type/Material.
+
+    Rows in one group are reached by the same ``Selection`` (or, with fewer
+    levels, the same unit within the levels left out); -1 marks rows that no
+    selection reaches, because a cascade level or the applicable
+    Type/Material is missing.
+    """
+    cascade = schema.cascade_levels
+    groups = np.full(len(df), -1, dtype=np.int64)
+    if None in cascade:
+        return groups
+    line = row_groups(df, cascade if levels is None else levels)
+    branch = branch_groups(df, schema)
+    valid = (row_groups(df, cascade) >= 0) & (line >= 0) & (branch >= 0)
+    if valid.any():
+        groups[valid] = np.unique(np.column_stack([line[valid], branch[valid]]), axis=0,
+                                  return_inverse=True)[1].ravel()
+    return groups
+
+
+def resolve_node(index, schema, selection):
+    """Walk the cascade index to the node matching ``selection``."""
+    node = index.node(*selection.path)
+    column = branch_column(schema, selection.recovery)
+    if column and node is not EMPTY_NODE:
+        value = selection.type if selection.recovery == RRG else selection.material
+        node = node.branch(column).child(value)
+    return node
+
+
+def _match_option(node, raw):
+    if raw is None or (isinstance(raw, str) and not raw.strip()):
+        return None
+    if raw in node.children:
+        return raw
+    text = str(raw).strip()
+    for option in node.options:
+        if str(option) == text:
+            return option
+    return raw
+
+
+def selection_from_values(index, schema, values):
+    """Build a ``Selection`` from a mapping of field name -> value, e.g. a CSV row.
+
+    Values are matched against the options of their cascade level by their
+    text, so "2025" picks the integer year 2025.  A value matching nothing is
+    kept as given and the selection then finds no row.  Type and Material
+    are only read for the recovery types they apply to.
+    """
+    node = index.root
+    path = []
+    for field in CASCADE_FIELDS:
+        value = _match_option(node, values.get(field))
+        path.append(value)
+        node = node.child(value)
+
+    fields = dict(zip(CASCADE_FIELDS, path))
+    column = branch_column(schema, fields["recovery"])
+    if column:
+        field = "type" if fields["recovery"] == RRG else "material"
+        fields[field] = _match_option(node.branch(column), values.get(field))
+    return Selection(**fields)
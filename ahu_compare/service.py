@@ -0,0 +1,328 @@
+"""JSON over HTTP for tools that need the comparison data without the app.
+
+Quoting and reporting tools could only get what the comparison page shows by
+scraping it.  ``serve`` runs a standard-library ``ThreadingHTTPServer`` over a
+``DatasetHandle``, so the catalogue is loaded once, with its derived
+structures built, and follows the workbook as it is edited.  Endpoints
+(``GET``; ``/compare`` also takes ``POST`` with a JSON body):
+
+- ``/version``: catalogue version, path and row count;
+- ``/options?year=2025&quarter=Q2``: the options of each cascade level, down
+  to the first level not given (then Type or Material after a size);
+- ``/unit?year=...&size=...&type=...``: one unit's parameters by section;
+- ``/compare?units=[{...}, ...]``: several units side by side, the rows of
+  the exported comparison sheet grouped by section.
+
+Selection fields are those of the CLI's selection sets (``year``, ``quarter``,
+``region``, ``brand``, ``unit``, ``recovery``, ``size``, ``type``,
+``material``) and are matched by their text.
+
+Response bodies are kept in an ``LRUCache`` keyed by the catalogue version
+and the resolved selections, so repeated requests skip the comparison and
+the JSON encoding, and a reload simply stops hitting the old entries.  Each
+body carries a strong ETag (a hash of the body); a ``GET`` whose
+``If-None-Match`` matches gets ``304 Not Modified`` without a body.  Requests
+are served on one thread each with HTTP/1.1 keep-alive; the comparison code
+only reads the dataset, so they need no locking beyond the cache's.
+"""
+import hashlib
+import json
+import logging
+import math
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .comparison import comparison_sheet
+from .loader import DEFAULT_SHEET, DEFAULT_WORKBOOK
+from .reload import DatasetHandle
+from .selection import CASCADE_FIELDS, RRG, branch_column
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_CACHE_SIZE = 1024
+
+JSON_MIME = "application/json"
+SELECTION_FIELDS = CASCADE_FIELDS + ("type", "material")
+MAX_UNITS = 10
+# Largest accepted POST body
+MAX_BODY = 1024 * 1024
+
+
+class RequestError(Exception):
+    """A request the service answers with an error status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def json_value(value):
+    """``value`` as plain JSON data: NumPy scalars as Python numbers, missing values as None."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.floating):
+        if np.isnan(value):
+            return None
+        # float32 catalogue columns hold values whose text is the workbook's (see loader.compact_frame)
+        return float(str(value)) if value.dtype == np.float32 else float(value)
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return value
+
+
+def selection_json(selection):
+    return {field: json_value(getattr(selection, field)) for field in SELECTION_FIELDS}
+
+
+def _sections(matrix, row):
+    """Sections of the comparison sheet of ``matrix``: ``[{"title": ..., "rows": [row(parameter, values)]}]``."""
+    sections = []
+    for kind, cells in comparison_sheet(matrix):
+        if kind == "section":
+            sections.append({"title": cells[0], "rows": []})
+        elif kind == "row":
+            sections[-1]["rows"].append(row(cells[0], [json_value(value) for value in cells[1:]]))
+    return [section for section in sections if section["rows"]]
+
+
+def comparison_json(result):
+    """Units and sections of a ``ComparisonResult`` as JSON data."""
+    units = [{"selection": selection_json(selection), "heading": selection.heading, "found": position is not None,
+              "position": position}
+             for selection, position in zip(result.selections, result.row_positions)]
+    sections = _sections(result.matrix, lambda parameter, values: {"parameter": parameter, "values": values})
+    return {"version": result.version, "units": units, "sections": sections}
+
+
+def unit_json(result):
+    """The single unit of a ``ComparisonResult`` and its parameters by section, as JSON data."""
+    selection, position = result.selections[0], result.row_positions[0]
+    sections = _sections(result.matrix, lambda parameter, values: {"parameter": parameter, "value": values[0]})
+    return {"version": result.version, "selection": selection_json(selection), "heading": selection.heading,
+            "position": position, "sections": sections}
+
+
+def _level(field, node, value):
+    chosen = value is not None and value in node.children
+    return {"field": field, "options": [json_value(option) for option in node.options],
+            "value": json_value(value) if chosen else None}, chosen
+
+
+def options_json(dataset, selection):
+    """Options of each cascade level down to the first one ``selection`` leaves open or misses."""
+    node = dataset.index.root
+    levels = []
+    for field in CASCADE_FIELDS:
+        level, chosen = _level(field, node, getattr(selection, field))
+        levels.append(level)
+        if not chosen:
+            break
+        node = node.child(getattr(selection, field))
+    else:
+        column = branch_column(dataset.schema, selection.recovery)
+        if column:
+            field = "type" if selection.recovery == RRG else "material"
+            levels.append(_level(field, node.branch(column), getattr(selection, field))[0])
+    return {"version": dataset.version, "levels": levels}
+
+
+def _selection(dataset, values):
+    for field in SELECTION_FIELDS:
+        value = values.get(field)
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{field} must be a string or a number")
+    return dataset.selection(values)
+
+
+def _encode(data):
+    body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class ComparisonService:
+    """The endpoints over a ``DatasetHandle``, each response ``(body, etag)`` cached by version and selections."""
+
+    def __init__(self, handle, cache_size=DEFAULT_CACHE_SIZE):
+        self.handle = handle
+        self.cache = LRUCache(cache_size)
+
+    def _cached(self, key, build):
+        return self.cache.get_or_create(key, lambda: _encode(build()))
+
+    def version(self):
+        dataset = self.handle.dataset
+        return _encode({"version": dataset.version, "path": dataset.path, "rows": len(dataset.frame),
+                        "reloads": self.handle.reloads})
+
+    def options(self, values):
+        dataset = self.handle.dataset
+        selection = _selection(dataset, values)
+        return self._cached((dataset.version, "options", selection), lambda: options_json(dataset, selection))
+
+    def unit(self, values):
+        dataset = self.handle.dataset
+        selection = _selection(dataset, values)
+        if dataset.row_position(selection) is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, "no catalogue row matches the selection")
+        return self._cached((dataset.version, "unit", selection),
+                            lambda: unit_json(dataset.compare([selection])))
+
+    def compare(self, units):
+        if not isinstance(units, list) or not units or not all(isinstance(unit, dict) for unit in units):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "units must be a non-empty list of selection objects")
+        if len(units) > MAX_UNITS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"at most {MAX_UNITS} units can be compared")
+        dataset = self.handle.dataset
+        selections = tuple(_selection(dataset, unit) for unit in units)
+        return self._cached((dataset.version, "compare", selections),
+                            lambda: comparison_json(dataset.compare(selections)))
+
+
+def _units_of(data):
+    # A list of units, or {"units": [...]} as in the CLI's JSON selection sets
+    return data.get("units") if isinstance(data, dict) else data
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's ``ComparisonService``."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "ahu-compare"
+
+    def do_GET(self):
+        self._respond(self._get)
+
+    def do_HEAD(self):
+        self._respond(self._get, body=False)
+
+    def do_POST(self):
+        self._respond(self._post)
+
+    def _get(self, path, query):
+        service = self.server.service
+        if path == "/version":
+            return service.version()
+        if path == "/options":
+            return service.options(query)
+        if path == "/unit":
+            return service.unit(query)
+        if path == "/compare":
+            if "units" not in query:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "missing units parameter")
+            return service.compare(_units_of(self._json(query["units"])))
+        raise RequestError(HTTPStatus.NOT_FOUND, f"unknown endpoint {path}")
+
+    def _post(self, path, query):
+        header = (self.headers.get("Content-Length") or "0").strip()
+        if not (header.isascii() and header.isdigit()):
+            # The body's end is unknown, so the connection cannot carry another request
+            self.close_connection = True
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid Content-Length: {header!r}")
+        length = int(header)
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        # Read before routing, so that an error response leaves the connection usable
+        body = self.rfile.read(length)
+        if path != "/compare":
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED if path in ("/version", "/options", "/unit")
+                               else HTTPStatus.NOT_FOUND, f"POST is not supported on {path}")
+        return self.server.service.compare(_units_of(self._json(body)))
+
+    @staticmethod
+    def _json(text):
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}") from None
+
+    def _respond(self, route, body=True):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            payload, etag = route(url.path.rstrip("/") or "/", query)
+            status = HTTPStatus.OK
+        except RequestError as e:
+            payload, etag = _encode({"error": str(e)})
+            status, etag = e.status, None
+        except Exception:
+            logger.exception("Failed to serve %s", self.path)
+            payload, etag = _encode({"error": "internal error"})
+            status, etag = HTTPStatus.INTERNAL_SERVER_ERROR, None
+
+        if etag is not None and self.command != "POST" and _matches(etag, self.headers.get("If-None-Match")):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", f"{JSON_MIME}; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+
+def _matches(etag, header):
+    """Whether an ``If-None-Match`` header lists ``etag`` (weak comparison, as RFC 9110 has for GET)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+class ServiceServer(ThreadingHTTPServer):
+    """``ThreadingHTTPServer`` holding the ``ComparisonService`` its handlers use."""
+
+    daemon_threads = True
+    # Pending connections the listening socket queues under bursts of clients
+    request_queue_size = 128
+
+    def __init__(self, address, service):
+        self.service = service
+        super().__init__(address, ServiceHandler)
+
+
+def make_server(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                cache_size=DEFAULT_CACHE_SIZE, watch=True):
+    """``ServiceServer`` over the workbook at ``path``, loaded (and watched, with ``watch``) before it returns."""
+    handle = DatasetHandle(path, sheet_name, watch=watch)
+    return ServiceServer((host, port), ComparisonService(handle, cache_size))
+
+
+def serve(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, host=DEFAULT_HOST, port=DEFAULT_PORT,
+          cache_size=DEFAULT_CACHE_SIZE, watch=True):
+    """Serve the workbook at ``path`` until interrupted."""
+    server = make_server(path, sheet_name, host, port, cache_size, watch)
+    logger.warning("Serving %s (version %s) on http://%s:%d", path, server.service.handle.version,
+                   *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.handle.stop()
@@ -0,0 +1,135 @@
+"""One copy of the catalogue per host, shared by every app process.
+
+Several Streamlit processes behind a load balancer each used to hold their own
+parsed copy of the catalogue.  In shared mode (``AHU_SHARED=1``) the first
+process to load a catalogue version publishes it as an uncompressed Arrow IPC
+file in ``/dev/shm`` (``AHU_SHARED_DIR`` overrides the directory), holding an
+exclusive ``flock`` so only one process parses it while the others wait.
+Every process, the publisher included, then memory-maps that file read-only.
+Uncompressed Arrow columns convert to pandas without copying
+(``split_blocks``), so the catalogue's pages sit once in the host's shared
+memory and attaching to it takes milliseconds.
+
+Publishing a new version removes the older files; processes that still map
+one keep its pages until they load the new version.
+"""
+import glob
+import logging
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow is optional
+    feather = None
+
+from .loader import DEFAULT_SHEET, DEFAULT_WORKBOOK, SNAPSHOT_FORMAT, catalogue_version, load_catalogue
+
+logger = logging.getLogger(__name__)
+
+SHARED_ENV = "AHU_SHARED"
+SHARED_DIR_ENV = "AHU_SHARED_DIR"
+
+_TRUE = {"1", "true", "yes", "on"}
+
+# "<workbook stem>.<sheet>.<version>.v<format>.arrow", see ``shared_path``
+_SHARED_NAME = re.compile(r"(?P<stem>.+)\.[0-9a-f]+-[0-9a-f]+\.v\d+\.arrow")
+
+
+def shared_enabled():
+    return os.environ.get(SHARED_ENV, "").strip().lower() in _TRUE
+
+
+def shared_dir():
+    directory = os.environ.get(SHARED_DIR_ENV)
+    if directory:
+        return directory
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "ahu_compare")
+
+
+def _stem(path, sheet_name):
+    return f"{os.path.splitext(os.path.basename(path))[0]}.{sheet_name}"
+
+
+def shared_path(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, version=None):
+    if version is None:
+        version = catalogue_version(path)
+    return os.path.join(shared_dir(), f"{_stem(path, sheet_name)}.{version}.v{SNAPSHOT_FORMAT}.arrow")
+
+
+@contextmanager
+def _locked(lock_path, exclusive):
+    with open(lock_path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def attach(shared):
+    """Memory-map a published catalogue read-only; its columns are views of the shared pages."""
+    return feather.read_table(shared, memory_map=True).to_pandas(split_blocks=True)
+
+
+def publish(df, shared):
+    """Write ``df`` to ``shared`` uncompressed (so it can be mapped without copying), atomically."""
+    directory = os.path.dirname(shared)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)
+    try:
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, shared)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _shared_stem(name):
+    """``"<workbook stem>.<sheet>"`` of a published file name, or None for other files."""
+    match = _SHARED_NAME.fullmatch(name)
+    return match.group("stem") if match else None
+
+
+def _prune(shared, stem):
+    # Only copies of the same workbook and sheet, whichever version or format
+    pattern = os.path.join(os.path.dirname(shared), f"{glob.escape(stem)}.*.arrow")
+    for stale in glob.glob(pattern):
+        if stale != shared and _shared_stem(os.path.basename(stale)) == stem:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_shared_catalogue(path=DEFAULT_WORKBOOK, sheet_name=DEFAULT_SHEET, version=None):
+    """Attach to the host-wide copy of the catalogue, publishing it first if no process has."""
+    if feather is None:
+        raise ImportError("pyarrow is required for the shared catalogue")
+    shared = shared_path(path, sheet_name, version)
+    os.makedirs(os.path.dirname(shared), exist_ok=True)
+    stem = _stem(path, sheet_name)
+    lock_path = os.path.join(os.path.dirname(shared), f"{stem}.lock")
+
+    # Mapped under a shared lock, so a publisher cannot remove the file mid-attach
+    with _locked(lock_path, exclusive=False):
+        if os.path.exists(shared):
+            return attach(shared)
+    with _locked(lock_path, exclusive=True):
+        if not os.path.exists(shared):
+            logger.info("Publishing %s to %s", path, shared)
+            publish(load_catalogue(path, sheet_name), shared)
+            _prune(shared, stem)
+        return attach(shared)
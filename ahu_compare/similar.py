@@ -0,0 +1,178 @@
+"""Nearest competitors of a unit by its numeric specifications.
+
+Finding the closest rival to a unit meant walking the sidebar cascade brand
+by brand.  ``SimilarityIndex`` puts the numeric specs that size a unit
+(minimum, optimal and maximum airflow, supply filter dimensions, cross-section areas, sensible and
+impeller efficiency, filter air speed) into one matrix per loaded catalogue.
+Each feature is centred on its median and scaled by its interquartile
+range, sizes and airflows on a log scale so that a 10% difference weighs the
+same for small and large units; a missing value sits at the median and so
+neither helps nor hurts a match.
+
+Rows are searched within their Region by default (brands are surveyed in
+different quarters, so an edition rarely holds every rival), each region
+having its own KD-tree when scipy is installed, or a vectorised distance
+scan otherwise, which is as fast for catalogues of a few thousand rows.
+Results are one per unit (Brand, Unit name, Recovery type, Unit size and
+Type/Material), from whichever Year and Quarter lists it nearest, nearest
+first.  Where several rows share one selection only the first, the row the
+comparison shows for it, is searched, so a result's position and distance
+are those of the row a user sees when opening it.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # pragma: no cover - scipy is optional
+    cKDTree = None
+
+from .cascade import row_groups
+from .selection import selection_groups
+
+# Sensible efficiency of either exchanger, at the optimal airflow where given
+SENSIBLE_EFFICIENCY_FIELDS = ("sens_efficiency_opt_rrg", "sens_efficiency_opt_pcr_hex",
+                              "sens_efficiency_nominal_rrg", "sens_efficiency_nominal_pcr_hex")
+
+# (label, schema fields used in order of preference, compared on a log scale)
+SIMILARITY_FEATURES = (
+    ("Minimum airflow", ("minimum_airflow",), True),
+    ("Optimal airflow", ("optimal_airflow",), True),
+    ("Maximum airflow", ("maximum_airflow",), True),
+    ("Filter width", ("internal_width_supply_filter",), True),
+    ("Filter height", ("internal_height_supply_filter",), True),
+    ("Filter cross-section", ("unit_area_supply_filter",), True),
+    ("Fan cross-section", ("unit_area_supply_fan",), True),
+    ("Sensible efficiency", SENSIBLE_EFFICIENCY_FIELDS, False),
+    ("Impeller efficiency", ("impeller_efficiency",), False),
+    ("Filter air speed", ("air_speed_filter",), False),
+)
+
+# Cascade levels that identify a unit within a Year, Quarter and Region
+UNIT_LEVELS = slice(3, None)
+
+Neighbour = namedtuple("Neighbour", "position distance")
+
+
+def spec_values(df, schema, fields, specs=None):
+    """Numbers of the first of ``fields`` that has one in each row (NaN where none has), or None
+    when the catalogue has none of the columns.
+
+    With ``specs`` (the catalogue's ``SpecTable``) text columns give their
+    parsed values; otherwise only cells that are numbers count.
+    """
+    values = None
+    for field in fields:
+        column = getattr(schema, field)
+        if column is None or column not in df.columns:
+            continue
+        numbers = specs.value(column) if specs is not None else None
+        if numbers is None:
+            numbers = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        values = numbers if values is None else np.where(np.isnan(values), numbers, values)
+    return values
+
+
+def _feature(df, schema, fields, log, specs):
+    values = spec_values(df, schema, fields, specs)
+    if values is not None and log:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(values > 0, np.log(values), np.nan)
+    return values
+
+
+def _standardise(values):
+    present = values[~np.isnan(values)]
+    if not len(present):
+        return np.zeros_like(values)
+    q1, median, q3 = np.percentile(present, [25, 50, 75])
+    scale = (q3 - q1) / 1.349
+    if not scale > 0:
+        scale = present.std()
+    if not scale > 0:
+        scale = 1.0
+    return np.nan_to_num((values - median) / scale, nan=0.0)
+
+
+class SimilarityIndex:
+    """Standardised spec matrix of a catalogue, searchable for each row's nearest units."""
+
+    __slots__ = ("features", "points", "_brand", "_region", "_unit", "_searches")
+
+    def __init__(self, df, schema, features=SIMILARITY_FEATURES, specs=None):
+        columns, self.features = [], []
+        for label, fields, log in features:
+            values = _feature(df, schema, fields, log, specs)
+            if values is not None:
+                columns.append(_standardise(values))
+                self.features.append(label)
+        self.points = np.column_stack(columns) if columns else np.zeros((len(df), 0))
+
+        # Unit of each row, whichever Year, Quarter and Region list it; -1 where no selection reaches the row
+        unit = selection_groups(df, schema, schema.cascade_levels[UNIT_LEVELS])
+        self._unit = unit
+        self._brand = row_groups(df, [schema.brand]) if schema.brand else np.zeros(len(df), dtype=np.int64)
+        self._region = row_groups(df, [schema.region]) if schema.region else np.zeros(len(df), dtype=np.int64)
+
+        # Rows, points and KD-tree of every region, and of the whole catalogue (key None), searching
+        # only the first row of each selection, which ``Dataset.row_position`` shows for it
+        shown = selection_groups(df, schema)
+        _, first = np.unique(shown, return_index=True)
+        selectable = np.sort(first[shown[first] >= 0])
+        self._searches = {}
+        self._searches[None] = self._search(selectable)
+        order = selectable[np.argsort(self._region[selectable], kind="stable")]
+        regions, starts = np.unique(self._region[order], return_index=True)
+        for key, rows in zip(regions.tolist(), np.split(order, starts[1:])):
+            self._searches[key] = self._search(rows)
+
+    def _search(self, rows):
+        points = self.points[rows]
+        tree = cKDTree(points) if cKDTree is not None and len(rows) else None
+        return rows, points, tree
+
+    def __len__(self):
+        return len(self.points)
+
+    def _units(self, positions, distances, k):
+        """The first ``k`` rows of distinct units among ``positions`` (sorted nearest first)."""
+        _, first = np.unique(self._unit[positions], return_index=True)
+        first.sort()
+        return [Neighbour(int(positions[i]), float(distances[i])) for i in first[:k]]
+
+    def nearest(self, position, k=5, other_brands=True, same_region=True):
+        """Up to ``k`` ``Neighbour`` rows nearest to row ``position``, one per unit.
+
+        With ``other_brands`` only rows of other brands are returned, otherwise
+        only the unit of ``position`` itself is left out.  With
+        ``same_region`` the search stays within the row's Region.
+        """
+        if k <= 0 or self._unit[position] < 0:
+            return []
+        rows, points, tree = self._searches[self._region[position] if same_region else None]
+        if other_brands:
+            excluded = self._brand == self._brand[position]
+        else:
+            excluded = self._unit == self._unit[position]
+        point = self.points[position]
+
+        if tree is None:
+            # One scan of the allowed rows; a stable sort keeps equally near rows in catalogue order
+            allowed = ~excluded[rows]
+            positions = rows[allowed]
+            distances = np.sqrt(((points[allowed] - point) ** 2).sum(axis=1))
+            order = np.argsort(distances, kind="stable")
+            return self._units(positions[order], distances[order], k)
+
+        # The tree cannot skip excluded rows, so ask for more neighbours until k units are found
+        count = min(len(rows), 4 * k)
+        while True:
+            distances, local = tree.query(point, k=count)
+            positions, distances = rows[np.atleast_1d(local)], np.atleast_1d(distances)
+            keep = ~excluded[positions]
+            found = self._units(positions[keep], distances[keep], k)
+            if len(found) >= k or count == len(rows):
+                return found
+            count = min(len(rows), 4 * count)
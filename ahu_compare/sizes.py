@@ -0,0 +1,57 @@
+"""Size range of each unit line, for the unit cross-section area chart.
+
+The chart plots every size of a selected unit line (Year, Quarter, Region,
+Brand, Unit name and Recovery type, narrowed by Type or Material when one
+is chosen) against its supply filter cross-section area.  Masking the whole
+catalogue for each unit on every rerun is replaced by a table grouped once
+per loaded catalogue, holding the sizes and areas of each line as arrays.
+"""
+import numpy as np
+
+from .cascade import group_indices
+from .selection import RRG, branch_column
+
+_NO_POINTS = (np.empty(0, dtype=object), np.empty(0, dtype=object), np.empty(0))
+
+
+class SizeAreaTable:
+    """``(sizes, labels, areas)`` arrays per unit line of ``df``, in catalogue order.
+
+    ``labels`` are the sizes as text.  Rows without a size or an area are left
+    out, as are rows with a missing value in one of the grouping columns.
+    """
+
+    __slots__ = ("schema", "_groups")
+
+    def __init__(self, df, schema):
+        self.schema = schema
+        self._groups = {}
+        levels = schema.cascade_levels[:-1]
+        if None in levels or not schema.size or not schema.unit_area_supply_filter:
+            return
+
+        plotted = (df[schema.size].notna() & df[schema.unit_area_supply_filter].notna()).to_numpy()
+        frame = df.loc[plotted]
+        sizes = frame[schema.size].to_numpy(dtype=object)
+        labels = frame[schema.size].astype(str).to_numpy(dtype=object)
+        areas = frame[schema.unit_area_supply_filter].to_numpy()
+
+        for branch in (None, schema.type, schema.material):
+            if branch is None:
+                keys = levels
+            elif branch in frame.columns:
+                keys = levels + [branch]
+            else:
+                continue
+            for key, rows in group_indices(frame, keys).items():
+                if branch is not None:
+                    key = (key[:-1], branch, key[-1])
+                self._groups[key] = (sizes[rows], labels[rows], areas[rows])
+
+    def points(self, selection):
+        """Sizes, size labels and areas of the unit line ``selection`` belongs to."""
+        path = selection.path[:-1]
+        column = branch_column(self.schema, selection.recovery)
+        value = selection.type if selection.recovery == RRG else selection.material
+        key = (path, column, value) if column and value else path
+        return self._groups.get(key, _NO_POINTS)
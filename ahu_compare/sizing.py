@@ -0,0 +1,114 @@
+"""Unit sizes whose airflow range covers a required airflow.
+
+Users often start from the airflow a project needs rather than from a brand,
+and the sidebar cascade asks for the brand and unit name before the size.
+``AirflowIndex`` holds the minimum to maximum airflow range of the row
+each selection of the catalogue shows (the first of rows sharing one) in a ``pandas.IntervalIndex``, sorted by
+minimum airflow and with its interval tree built along with the catalogue,
+so a query walks the tree instead of comparing every row.
+
+Matches can be narrowed by Recovery type, Region, Quarter and Year, and are
+ranked by the supply filter air speed at the required airflow (the
+catalogue's speed at the optimal airflow, scaled linearly; lower first) or
+by sensible efficiency (higher first).  Rows without the ranking value come
+last.  Each ``Selection`` is listed once, by the row that the sidebar and
+the comparison show for it.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .selection import selection_groups
+from .similar import SENSIBLE_EFFICIENCY_FIELDS, spec_values
+
+RANKINGS = ("air_speed", "efficiency")
+SIZING_FILTERS = ("recovery", "region", "quarter", "year")
+
+SizingMatch = namedtuple("SizingMatch", "position air_speed efficiency")
+
+
+def _numbers(df, schema, fields, specs):
+    values = spec_values(df, schema, fields, specs)
+    return np.full(len(df), np.nan) if values is None else values
+
+
+class AirflowIndex:
+    """Airflow range of the row each selection shows, searchable by a required airflow."""
+
+    __slots__ = ("_positions", "_intervals", "_speed", "_optimal", "_efficiency", "_filters")
+
+    def __init__(self, df, schema, specs=None):
+        low = _numbers(df, schema, ("minimum_airflow",), specs)
+        high = _numbers(df, schema, ("maximum_airflow",), specs)
+        # Only the first row of each selection, which ``Dataset.row_position`` shows for it
+        selection = selection_groups(df, schema)
+        _, first = np.unique(selection, return_index=True)
+        shown = np.zeros(len(df), dtype=bool)
+        shown[first[selection[first] >= 0]] = True
+        rows = np.flatnonzero((low <= high) & shown)
+        rows = rows[np.argsort(low[rows], kind="stable")]
+        self._positions = rows
+        self._intervals = pd.IntervalIndex.from_arrays(low[rows], high[rows], closed="both")
+        if len(rows):
+            # The interval tree is built by the first lookup; have it built with the catalogue
+            self._intervals.get_indexer_non_unique([low[rows[0]]])
+
+        self._speed = _numbers(df, schema, ("air_speed_filter",), specs)
+        self._optimal = _numbers(df, schema, ("optimal_airflow",), specs)
+        self._efficiency = _numbers(df, schema, SENSIBLE_EFFICIENCY_FIELDS, specs)
+
+        # Field -> (code of each row, value -> code)
+        self._filters = {}
+        for field in SIZING_FILTERS:
+            column = getattr(schema, field)
+            if column is not None and column in df.columns:
+                codes, uniques = pd.factorize(df[column])
+                self._filters[field] = (codes, {value: code for code, value in enumerate(uniques.tolist())})
+
+    def __len__(self):
+        return len(self._positions)
+
+    def options(self, field):
+        """Values ``field`` can be narrowed to, sorted."""
+        if field not in self._filters:
+            return []
+        return sorted(self._filters[field][1])
+
+    def covering(self, airflow):
+        """Positions of the rows whose airflow range includes ``airflow``, by ascending minimum airflow."""
+        found, _ = self._intervals.get_indexer_non_unique([airflow])
+        return self._positions[np.sort(found[found >= 0])]
+
+    def _code(self, field, value):
+        codes, lookup = self._filters[field]
+        code = lookup.get(value)
+        if code is None:
+            # Values as typed, e.g. "2025" for the year 2025
+            text = str(value).strip()
+            code = next((c for v, c in lookup.items() if str(v) == text), None)
+        return codes, code
+
+    def search(self, airflow, rank_by="air_speed", limit=None, **filters):
+        """``SizingMatch`` of every selection whose airflow range covers ``airflow``, best first.
+
+        ``filters`` narrow the matches by the fields of ``SIZING_FILTERS``
+        (None leaves a field open); ``limit`` keeps the best ones.
+        """
+        if rank_by not in RANKINGS:
+            raise ValueError(f"rank_by must be one of {', '.join(RANKINGS)}, not {rank_by!r}")
+        positions = self.covering(airflow)
+        for field, value in filters.items():
+            if field not in SIZING_FILTERS:
+                raise TypeError(f"unknown sizing filter {field!r}")
+            if value is None or field not in self._filters:
+                continue
+            codes, code = self._code(field, value)
+            positions = positions[codes[positions] == code] if code is not None else positions[:0]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = self._speed[positions] * airflow / self._optimal[positions]
+        efficiency = self._efficiency[positions]
+        key = speed if rank_by == "air_speed" else -efficiency
+        order = np.lexsort((positions, np.where(np.isfinite(key), key, np.inf)))[:limit]
+        return [SizingMatch(int(positions[i]), float(speed[i]), float(efficiency[i])) for i in order]
@@ -0,0 +1,155 @@
+"""Numbers of the text spec columns, parsed once per loaded catalogue.
+
+Several spec columns mix numbers with ranges, alternatives and text
+("1.15 (0.8)" kW, " 1-4" sections, "2,5; 4,5; 7,5" kW steps, "-"), so they
+load as text and every consumer had to re-parse them, or skip them.
+``SpecTable`` parses them once: each distinct text of a column is parsed a
+single time and the results are spread over the rows through the column's
+codes, giving float arrays of its value and of its low and high end.  The
+display text stays the catalogue column itself, unchanged.
+
+How a text reads:
+
+- a number ("1.4", "6,5"): value, low and high are that number;
+- a number with alternatives in brackets ("280 (250)", "630 (500, 560)"):
+  the value is the first number, low and high span all of them;
+- a range ("1-2") or a list ("2,5; 4,5; 7,5"): low and high are its ends,
+  the value is NaN;
+- anything else ("L", "3 kW step", "-"): all NaN.
+
+A comma between digits is a decimal comma, a comma followed by a space or a
+semicolon separates numbers.  Numeric columns are served as they are.  Text
+columns are parsed when at least ``SPEC_MIN_SHARE`` of their present rows
+hold a number; the cascade columns, Type and Material identify units rather
+than size them and are never parsed.
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_SEPARATOR = r"\s*;\s*|,\s+"
+_SINGLE = re.compile(rf"\s*([-+]?{_NUMBER})\s*")
+_ALTERNATIVES = re.compile(rf"\s*({_NUMBER})\s*\(\s*({_NUMBER}(?:(?:{_SEPARATOR}){_NUMBER})*)\s*\)\s*")
+_RANGE = re.compile(rf"\s*({_NUMBER})\s*(?:-|–|—|\.\.|to)\s*({_NUMBER})\s*")
+_LIST = re.compile(rf"\s*{_NUMBER}(?:(?:{_SEPARATOR}){_NUMBER})+\s*")
+
+# Texts that stand for a missing value
+PLACEHOLDERS = frozenset({"", "-", "–", "—", "n/a", "na", "none"})
+
+# Share of a text column's present rows that must hold a number for it to be parsed
+SPEC_MIN_SHARE = 0.5
+
+SpecColumn = namedtuple("SpecColumn", "value low high")
+
+_NOTHING = (np.nan, np.nan, np.nan)
+
+
+def _number(text):
+    return float(text.replace(",", "."))
+
+
+def _numbers(text):
+    return [_number(part) for part in re.split(_SEPARATOR, text.strip())]
+
+
+def parse_spec(text):
+    """``(value, low, high)`` of one spec text, NaN where it holds none (see the module docstring)."""
+    if not isinstance(text, str):
+        if text is None or pd.isna(text):
+            return _NOTHING
+        number = float(text)
+        return number, number, number
+    if text.strip().lower() in PLACEHOLDERS:
+        return _NOTHING
+    match = _SINGLE.fullmatch(text)
+    if match:
+        number = _number(match.group(1))
+        return number, number, number
+    match = _ALTERNATIVES.fullmatch(text)
+    if match:
+        first = _number(match.group(1))
+        numbers = [first] + _numbers(match.group(2))
+        return first, min(numbers), max(numbers)
+    match = _RANGE.fullmatch(text)
+    if match:
+        ends = sorted((_number(match.group(1)), _number(match.group(2))))
+        return np.nan, ends[0], ends[1]
+    if _LIST.fullmatch(text):
+        numbers = _numbers(text)
+        return np.nan, min(numbers), max(numbers)
+    return _NOTHING
+
+
+def parse_column(series):
+    """``SpecColumn`` of a text column, or None when fewer than ``SPEC_MIN_SHARE`` of its rows hold a number."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    # One row per distinct text, plus a last all-NaN row that code -1 (missing) picks
+    parsed = np.array([parse_spec(text) for text in uniques] + [_NOTHING], dtype=np.float64)
+    present = np.array([not (isinstance(text, str) and text.strip().lower() in PLACEHOLDERS) for text in uniques]
+                       + [False])
+    valid = codes >= 0
+    counts = np.append(np.bincount(codes[valid], minlength=len(uniques)), np.count_nonzero(~valid))
+    holding = counts[~np.isnan(parsed[:, 1])].sum()
+    if not holding or holding < SPEC_MIN_SHARE * counts[present].sum():
+        return None
+    rows = parsed[codes]
+    return SpecColumn(rows[:, 0], rows[:, 1], rows[:, 2])
+
+
+class SpecTable:
+    """Float arrays of the catalogue's spec columns: value, low and high end of each row.
+
+    Parsed text columns are held as arrays; numeric columns are read from
+    the frame on request.  Columns that are neither give None.
+    """
+
+    __slots__ = ("_frame", "_parsed")
+
+    def __init__(self, df, schema=None):
+        self._frame = df
+        self._parsed = {}
+        skipped = set()
+        if schema is not None:
+            skipped = {col for col in schema.cascade_levels + [schema.type, schema.material] if col is not None}
+        for col in df.columns:
+            series = df[col]
+            if col in skipped or _is_numeric(series):
+                continue
+            parsed = parse_column(series)
+            if parsed is not None:
+                self._parsed[col] = parsed
+
+    @property
+    def parsed_columns(self):
+        """Text columns that were parsed into numbers, in catalogue order."""
+        return list(self._parsed)
+
+    def __contains__(self, col):
+        return col in self._parsed or (col in self._frame.columns and _is_numeric(self._frame[col]))
+
+    def column(self, col):
+        """``SpecColumn`` of ``col``, or None when it is neither numeric nor parsed."""
+        parsed = self._parsed.get(col)
+        if parsed is None and col in self._frame.columns and _is_numeric(self._frame[col]):
+            values = self._frame[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            parsed = SpecColumn(values, values, values)
+        return parsed
+
+    def value(self, col):
+        """Value of ``col`` in each row as float64 (NaN where it has none), or None."""
+        parsed = self.column(col)
+        return None if parsed is None else parsed.value
+
+    def display(self, col):
+        """The catalogue column ``col``, as the page shows it."""
+        return self._frame[col]
+
+
+def _is_numeric(series):
+    return isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf"
@@ -0,0 +1,143 @@
+"""Larger catalogues built from the real one, for benchmarks and scale tests.
+
+``scale_catalogue`` simply repeats the frame.  ``generate_catalogue`` grows
+it the way the production catalogue grows: every brand republishes its unit
+lines for each (Year, Quarter, Region) edition.  The distinct product rows of
+the template (one per brand / unit / recovery / size / type / material) are
+copied into as many editions as needed, optionally under extra brands that
+reuse an existing brand's lines.  Within each edition a brand's dimensions
+drift by a random factor, applied consistently to the x1..x15/y1..y15
+outlines and other lengths (area, airflow and capacity columns by its
+square), so charts stay well formed.  Text columns, recovery-type specific
+blanks and every other value are carried over from the template row.
+"""
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .loader import DEFAULT_SHEET, compact_frame, is_columnar, write_snapshot, write_workbook
+
+QUARTERS = ("Q1", "Q2", "Q3", "Q4")
+
+# Numeric columns scaled with the unit's linear size / with its cross-section
+_LENGTH = re.compile(r"\[mm\]")
+_LENGTH_EXCLUDE = re.compile(r"thickness|base frame", re.IGNORECASE)
+_SQUARE = re.compile(r"\[(m2|CMH|kW)\]")
+
+
+def scale_catalogue(df, schema, factor, brands_per_copy=True):
+    """Return ``df`` repeated ``factor`` times, compacted like a loaded catalogue.
+
+    Every copy after the first renames its brands ("Systemair" -> "Systemair
+    #2", ...) so the cascade grows wider as well as deeper; with
+    ``brands_per_copy=False`` copies keep their brand and only add rows.
+    """
+    if factor < 1:
+        raise ValueError("factor must be at least 1")
+    copies = [df]
+    for k in range(2, factor + 1):
+        copy = df.copy()
+        if brands_per_copy and schema.brand:
+            brand = copy[schema.brand]
+            copy[schema.brand] = brand.astype(object).where(brand.isna(), brand.astype(str) + f" #{k}")
+        copies.append(copy)
+    return compact_frame(pd.concat(copies, ignore_index=True))
+
+
+def scaled_columns(df, schema):
+    """``(length columns, area-like columns)`` of ``df`` that follow the unit's size."""
+    coords = {col for pair in schema.coords for col in pair if col}
+    numeric = [col for col in df.columns if df[col].dtype.kind in "iuf"]
+    lengths = [col for col in numeric
+               if col in coords or (_LENGTH.search(col) and not _LENGTH_EXCLUDE.search(col))]
+    squares = [col for col in numeric if col not in lengths and _SQUARE.search(col)]
+    return lengths, squares
+
+
+def _product_rows(template, schema):
+    keys = [col for col in (schema.brand, schema.unit_name, schema.recovery, schema.size, schema.type,
+                            schema.material) if col]
+    return template.drop_duplicates(subset=keys).reset_index(drop=True)
+
+
+def _editions(count, years, quarters, regions):
+    """``count`` (year, quarter, region) triples, newest year first, adding older years as needed."""
+    years = list(years)
+    editions = []
+    while len(editions) < count:
+        for year in years:
+            for quarter in quarters:
+                for region in regions:
+                    editions.append((year, quarter, region))
+        years = [min(years) - 1 - i for i in range(len(years))]
+    return editions[:count]
+
+
+def generate_catalogue(template, schema, rows, brands=None, years=None, quarters=QUARTERS, regions=None,
+                       drift=0.05, seed=0):
+    """A catalogue of ``rows`` rows with the columns of ``template``, compacted like a loaded one.
+
+    ``brands`` is the total number of brands (at least the template's); extra
+    brands are named "Brand NN" and reuse the lines of the template brands in
+    turn.  ``years`` and ``regions`` default to the template's values; when
+    the requested size needs more editions, earlier years are added.
+    ``drift`` bounds the per-edition, per-brand size factor (1 +/- drift).
+    """
+    if rows < 1:
+        raise ValueError("rows must be at least 1")
+    rng = np.random.default_rng(seed)
+    products = _product_rows(template, schema)
+
+    source_brands = list(pd.unique(products[schema.brand].dropna()))
+    brand_rows = {brand: np.flatnonzero((products[schema.brand] == brand).to_numpy()) for brand in source_brands}
+    pool = [(brand, brand) for brand in source_brands]
+    for k in range(len(pool) + 1, (brands or 0) + 1):
+        pool.append((f"Brand {k:02d}", source_brands[(k - 1) % len(source_brands)]))
+
+    rows_per_edition = sum(len(brand_rows[source]) for _, source in pool)
+    editions = _editions(
+        math.ceil(rows / rows_per_edition),
+        years or sorted(pd.unique(template[schema.year].dropna()), reverse=True),
+        quarters,
+        regions or list(pd.unique(template[schema.region].dropna())),
+    )
+
+    # One block per (edition, brand): positions into `products` plus its identity and size factor
+    positions, block_sizes, identity = [], [], []
+    for edition in editions:
+        for brand, source in pool:
+            positions.append(brand_rows[source])
+            block_sizes.append(len(brand_rows[source]))
+            identity.append((*edition, brand))
+    positions = np.concatenate(positions)[:rows]
+    block_sizes = np.asarray(block_sizes)
+    factors = rng.uniform(1 - drift, 1 + drift, size=len(block_sizes))
+
+    out = products.iloc[positions].reset_index(drop=True)
+    for j, col in enumerate((schema.year, schema.quarter, schema.region, schema.brand)):
+        values = pd.Series(np.repeat(np.array([ident[j] for ident in identity], dtype=object), block_sizes)[:rows])
+        # New brand names are not among a categorical's categories; compact_frame re-encodes them
+        out[col] = values if isinstance(template[col].dtype, pd.CategoricalDtype) else values.astype(template[col].dtype)
+
+    factor = np.repeat(factors, block_sizes)[:rows]
+    lengths, squares = scaled_columns(template, schema)
+    for cols, power, decimals in ((lengths, 1, 1), (squares, 2, 3)):
+        for col in cols:
+            scaled = out[col].to_numpy(dtype=float) * factor ** power
+            if out[col].dtype.kind in "iu":
+                # Widened, as grown values may not fit the template's narrowed dtype
+                out[col] = np.rint(scaled).astype(np.int64)
+            else:
+                out[col] = np.round(scaled, decimals)
+    return compact_frame(out)
+
+
+def write_catalogue(df, path, sheet_name=DEFAULT_SHEET):
+    """Write ``df`` as a workbook, or as Feather when ``path`` ends in .feather/.arrow."""
+    if is_columnar(path):
+        write_snapshot(df, os.path.abspath(path))
+    else:
+        write_workbook(df, path, sheet_name)
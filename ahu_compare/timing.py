@@ -0,0 +1,180 @@
+"""Opt-in stage timings for app reruns.
+
+A ``StageTimer`` records nested stages of one rerun::
+
+    timer = StageTimer(enabled=timing_enabled())
+    with timer.stage("sidebar"):
+        with timer.stage("unit 1"):
+            ...
+    timer.finish()
+
+Stages are identified by their path ("sidebar/unit 1"); a path entered
+several times in one rerun (e.g. one "table" stage per table block) is
+summed.  When disabled, ``stage`` does nothing.
+
+Finished reruns are added to ``STATS``, which keeps a bounded window of
+recent durations per stage in this process for p50/p95 and cumulative
+counts/sums.  ``emit`` logs one JSON line per rerun on the
+``ahu_compare.timing`` logger and rewrites a Prometheus text-format file
+(``AHU_TIMING_PROM``, default ``.ahu_cache/timings.prom``) that a node
+exporter textfile collector can scrape.
+
+Timing is switched on with ``AHU_TIMING=1`` or, per session, with the
+``?timing=1`` query parameter.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from .loader import DEFAULT_WORKBOOK, snapshot_dir
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR = "AHU_TIMING"
+PROMETHEUS_ENV = "AHU_TIMING_PROM"
+METRIC = "ahu_compare_stage_seconds"
+QUANTILES = (0.5, 0.95)
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def timing_enabled(query_value=None):
+    """Whether timing is on, from ``AHU_TIMING`` or a query parameter value."""
+    values = [os.environ.get(ENV_VAR), query_value]
+    return any(str(value).strip().lower() in _TRUE for value in values if value is not None)
+
+
+class StageTimer:
+    """Nested wall-clock timings of one rerun, in seconds per stage path."""
+
+    def __init__(self, enabled=True, root="rerun"):
+        self.enabled = enabled
+        self.root = root
+        self.totals = {}
+        # Paths in the order they were first entered, with their depth
+        self.order = []
+        self._stack = [root]
+        self._start = time.perf_counter()
+        self.elapsed = None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        path = f"{self._stack[-1]}/{name}"
+        if path not in self.totals:
+            self.totals[path] = 0.0
+            self.order.append((path, len(self._stack)))
+        self._stack.append(path)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[path] += time.perf_counter() - start
+            self._stack.pop()
+
+    def finish(self):
+        """Stop the rerun clock; returns the total in seconds."""
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self._start
+            self.totals = {self.root: self.elapsed, **self.totals}
+            self.order.insert(0, (self.root, 0))
+        return self.elapsed
+
+    def rows(self):
+        """``(depth, path, name, milliseconds)`` per stage, in the order stages started."""
+        return [(depth, path, path.rsplit("/", 1)[-1], self.totals[path] * 1000) for path, depth in self.order]
+
+
+class LatencyStats:
+    """Recent stage durations of this process, for percentiles and Prometheus export."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._sums = {}
+        self._lock = threading.Lock()
+
+    def add(self, timer):
+        with self._lock:
+            for path, seconds in timer.totals.items():
+                samples = self._samples.get(path)
+                if samples is None:
+                    samples = self._samples[path] = deque(maxlen=self.window)
+                samples.append(seconds)
+                self._counts[path] = self._counts.get(path, 0) + 1
+                self._sums[path] = self._sums.get(path, 0.0) + seconds
+
+    def summary(self, quantiles=QUANTILES):
+        """``{path: {"count", "sum", quantile: seconds, ...}}`` over the current window."""
+        with self._lock:
+            snapshot = {path: (np.asarray(samples), self._counts[path], self._sums[path])
+                        for path, samples in self._samples.items()}
+        summary = {}
+        for path, (samples, count, total) in snapshot.items():
+            entry = {"count": count, "sum": total}
+            for q, value in zip(quantiles, np.quantile(samples, quantiles)):
+                entry[q] = float(value)
+            summary[path] = entry
+        return summary
+
+    def prometheus_text(self, metric=METRIC):
+        lines = [f"# HELP {metric} Wall-clock time of app rerun stages (recent-window quantiles).",
+                 f"# TYPE {metric} summary"]
+        for path, entry in sorted(self.summary().items()):
+            stage = path.replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{metric}{{stage="{stage}",quantile="{q}"}} {entry[q]:.6f}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {entry["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Rewrite ``path`` atomically so a scraper never reads a partial file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.prometheus_text())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._sums.clear()
+
+
+STATS = LatencyStats()
+
+
+def prometheus_path():
+    return os.environ.get(PROMETHEUS_ENV) or os.path.join(snapshot_dir(DEFAULT_WORKBOOK), "timings.prom")
+
+
+def emit(timer, stats=STATS, **fields):
+    """Record a finished rerun: add it to ``stats``, log it and rewrite the Prometheus file."""
+    timer.finish()
+    stats.add(timer)
+    record = {"event": "rerun_timing", **fields,
+              "stages_ms": {path: round(seconds * 1000, 3) for path, seconds in timer.totals.items()}}
+    logger.info(json.dumps(record, default=str))
+    try:
+        stats.write_prometheus(prometheus_path())
+    except OSError as e:
+        logger.warning("Could not write timing metrics: %s", e)
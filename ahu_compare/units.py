@@ -0,0 +1,90 @@
+"""Per-unit state of the comparison page, kept between reruns.
+
+Changing one selectbox of one unit reruns the whole page script, which used to
+rebuild every unit's row, table column, image lookups and chart traces.
+``UnitStates`` (kept in the session) holds one ``UnitState`` per unit slot:
+the selection and catalogue version it was built for, the matched row and the
+unit's column of the comparison matrix, plus whatever the page derives from
+them through ``UnitState.derive``.  ``update`` rebuilds only the slots whose
+selection changed; the comparison result and CSV are reassembled from the
+kept columns, and only when some slot changed.
+"""
+from .comparison import comparison_csv, display_items, matrix_from_columns, unit_column
+from .engine import ComparisonResult
+
+
+class UnitState:
+    """One unit slot: its selection, matched row, matrix column and derived artefacts."""
+
+    __slots__ = ("version", "selection", "row_position", "column", "_derived")
+
+    def __init__(self, dataset, selection):
+        self.version = dataset.version
+        self.selection = selection
+        self.row_position = dataset.row_position(selection)
+        self.column = unit_column(dataset.frame, self.row_position, dataset.rows)
+        self._derived = {}
+
+    @property
+    def found(self):
+        return self.row_position is not None
+
+    def matches(self, dataset, selection):
+        return self.version == dataset.version and self.selection == selection
+
+    def derive(self, key, factory):
+        """Value stored under ``key``, made by ``factory()`` the first time it is asked for."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            value = self._derived[key] = factory()
+            return value
+
+
+class UnitStates:
+    """``UnitState`` of each compared unit, rebuilt slot by slot as selections change."""
+
+    __slots__ = ("units", "changed", "result", "_csv")
+
+    def __init__(self):
+        self.units = []
+        # Slots rebuilt by the last update
+        self.changed = []
+        self.result = None
+        self._csv = None
+
+    def __len__(self):
+        return len(self.units)
+
+    def __getitem__(self, i):
+        return self.units[i]
+
+    def update(self, dataset, selections):
+        """Match the slots to ``selections``; returns the positions of the slots that were rebuilt."""
+        selections = tuple(selections)
+        units = self.units[:len(selections)]
+        changed = []
+        for i, selection in enumerate(selections):
+            if i < len(units) and units[i].matches(dataset, selection):
+                continue
+            state = UnitState(dataset, selection)
+            if i < len(units):
+                units[i] = state
+            else:
+                units.append(state)
+            changed.append(i)
+
+        if changed or len(units) != len(self.units) or self.result is None:
+            matrix = matrix_from_columns(dataset.frame.columns, dataset.schema, [u.column for u in units], selections)
+            self.result = ComparisonResult(selections, tuple(u.row_position for u in units), matrix,
+                                           tuple(display_items(matrix, dataset.schema)), dataset.version)
+            self._csv = None
+        self.units = units
+        self.changed = changed
+        return changed
+
+    def csv(self):
+        """The "Download Comparison as CSV" sheet of the current result."""
+        if self._csv is None:
+            self._csv = comparison_csv(self.result.matrix)
+        return self._csv
@@ -0,0 +1,150 @@
+"""The comparison sheet as a formatted XLSX workbook.
+
+The CSV download is plain text, so the section titles and per-unit colours of
+the page are lost.  ``write_comparison_xlsx`` writes the same sheet with them:
+the heading row in each unit's colour, section titles bold on a grey band,
+and each unit's values in its colour, as on the page.  Numbers are written as
+numbers.  Charts given as PNG images (see ``charts.figure_png``) go on a
+second "Charts" sheet.
+
+The workbook is written in openpyxl's write-only mode, rows taken one at a
+time from ``comparison_sheet`` without an intermediate DataFrame.  It streams
+straight to a path or file, which is what batch exports use;
+``comparison_xlsx`` returns the bytes for a download button, built in a
+``SpooledTemporaryFile`` that stays in memory up to ``SPOOL_SIZE`` and moves
+to disk beyond it.
+"""
+import io
+import math
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .comparison import comparison_sheet
+from .render import UNIT_COLORS, unit_color
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+SPOOL_SIZE = 8 * 1024 * 1024
+
+PARAMETER_WIDTH = 48
+UNIT_WIDTH = 24
+SECTION_FILL = "E8E8E8"
+# Default row height in pixels, used to leave room under each chart image
+ROW_PIXELS = 20
+
+
+def _argb(color):
+    return "FF" + color.lstrip("#").upper()
+
+
+def _cell_value(value):
+    """``value`` as openpyxl writes it: numbers as Python numbers, missing values as empty cells."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.floating):
+        if np.isnan(value):
+            return None
+        # float32 catalogue columns hold values whose text is the workbook's (see loader.compact_frame)
+        return float(str(value)) if value.dtype == np.float32 else float(value)
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+class _Styles:
+    """Fonts and fills of the sheet, made once per workbook rather than per cell."""
+
+    def __init__(self, num_units, colors):
+        from openpyxl.styles import Alignment, Font, PatternFill
+
+        self.heading = Font(bold=True)
+        self.unit_headings = [Font(bold=True, color="FFFFFFFF") for _ in range(num_units)]
+        self.unit_fills = [PatternFill("solid", fgColor=_argb(unit_color(i, colors))) for i in range(num_units)]
+        self.unit_fonts = [Font(color=_argb(unit_color(i, colors))) for i in range(num_units)]
+        self.section = Font(bold=True, size=12)
+        self.section_fill = PatternFill("solid", fgColor="FF" + SECTION_FILL)
+        self.centre = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+
+def _styled_row(ws, kind, cells, styles):
+    from openpyxl.cell import WriteOnlyCell
+
+    row = []
+    for j, value in enumerate(cells):
+        cell = WriteOnlyCell(ws, _cell_value(value))
+        if kind == "heading":
+            cell.font = styles.heading
+            if j:
+                cell.font = styles.unit_headings[j - 1]
+                cell.fill = styles.unit_fills[j - 1]
+                cell.alignment = styles.centre
+        elif kind == "section":
+            cell.font = styles.section
+            cell.fill = styles.section_fill
+        elif kind == "row" and j:
+            cell.font = styles.unit_fonts[j - 1]
+            cell.alignment = styles.centre
+        row.append(cell)
+    return row
+
+
+def _write_charts(wb, charts, heading_font):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.drawing.image import Image
+
+    ws = None
+    for title, png in charts:
+        if png is None:
+            continue
+        if ws is None:
+            ws = wb.create_sheet("Charts")
+            row = 1
+        title_cell = WriteOnlyCell(ws, title)
+        title_cell.font = heading_font
+        ws.append([title_cell])
+        image = Image(io.BytesIO(png) if isinstance(png, (bytes, bytearray)) else png)
+        ws.add_image(image, f"A{row + 1}")
+        # Rows under the image stay empty, then the next title follows it
+        skip = math.ceil(image.height / ROW_PIXELS) + 1
+        for _ in range(skip):
+            ws.append([])
+        row += 1 + skip
+
+
+def write_comparison_xlsx(matrix, target, sheet_name="Comparison", colors=UNIT_COLORS, charts=()):
+    """Write the comparison sheet of ``matrix`` to ``target`` (a path or a binary file).
+
+    ``charts`` is an iterable of ``(title, png)``, ``png`` being PNG bytes, a
+    path or None (skipped).
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    n = matrix.num_units
+    ws.column_dimensions["A"].width = PARAMETER_WIDTH
+    for i in range(n):
+        ws.column_dimensions[get_column_letter(i + 2)].width = UNIT_WIDTH
+    ws.freeze_panes = "B2"
+
+    styles = _Styles(n, colors)
+    for kind, cells in comparison_sheet(matrix):
+        ws.append(_styled_row(ws, kind, cells, styles))
+    _write_charts(wb, charts, styles.section)
+    wb.save(target)
+
+
+def comparison_xlsx(matrix, sheet_name="Comparison", colors=UNIT_COLORS, charts=(), spool_size=SPOOL_SIZE):
+    """The comparison sheet as XLSX workbook bytes (see ``write_comparison_xlsx``)."""
+    with tempfile.SpooledTemporaryFile(max_size=spool_size) as buf:
+        write_comparison_xlsx(matrix, buf, sheet_name, colors, charts)
+        buf.seek(0)
+        return buf.read()
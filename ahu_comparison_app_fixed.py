@@ -3,86 +3,90 @@ import streamlit as st
 import pandas as pd
 from PIL import Image
 import plotly.express as px
-import numpy as np
+
+from ahu_compare import DatasetHandle, Selection
 
 # -----------------------------
 # Load data
 # -----------------------------
-@st.cache_data
-def load_data():
-    return pd.read_excel("Data_2025_2.xlsx", sheet_name="data", engine="openpyxl")
+@st.cache_resource
+def load_dataset_handle():
+    # An edited workbook is reloaded in the background and swapped in when ready;
+    # with AHU_SHARED=1 all server processes on the host map one shared copy
+    return DatasetHandle()
 
 
-df = load_data()
+dataset = load_dataset_handle().dataset
+df = dataset.frame
 
 # -----------------------------
-# Helpers
+# Columns (aliases resolved once per header row in ahu_compare.schema)
 # -----------------------------
-def get_column_safe(df, name_options):
-    for name in name_options:
-        if name in df.columns:
-            return name
-    return None
-
-unit_name_col = get_column_safe(df, ["Unit name", "Unit Name"])
-region_col = get_column_safe(df, ["Region"])
-year_col = get_column_safe(df, ["Year"])
-quarter_col = get_column_safe(df, ["Quarter"])
-recovery_col = get_column_safe(df, ["Recovery type", "Recovery Type"])
-size_col = get_column_safe(df, ["Unit size", "Unit Size"])
-brand_col = get_column_safe(df, ["Brand name", "Brand"])
-logo_col = get_column_safe(df, ["Brand logo", "Brand Logo"])
-unit_photo_col = get_column_safe(df, ["Unit photo", "Unit Photo"])
-type_col = get_column_safe(df, ["Type"])
-material_col = get_column_safe(df, ["Material"])
+schema = dataset.schema
+
+unit_name_col = schema.unit_name
+region_col = schema.region
+year_col = schema.year
+quarter_col = schema.quarter
+recovery_col = schema.recovery
+size_col = schema.size
+brand_col = schema.brand
+logo_col = schema.logo
+unit_photo_col = schema.unit_photo
+type_col = schema.type
+material_col = schema.material
 
 # Updated columns
-impeller_size_col = get_column_safe(df, ["Impeller size (available optins)", "Impeller size"])
-impeller_efficiency_col = get_column_safe(df, ["Impeller efficiency at optimal airflow [%]", "Impeller efficiency at nominal airflow [%]"])
-capacity_note_col = get_column_safe(df, ["Capacity Note"])
-base_frame_height_col = get_column_safe(df, ["Base frame/Feets height  [mm]"])
-cabling_col = get_column_safe(df, ["Cabling"])
+impeller_size_col = schema.impeller_size
+impeller_efficiency_col = schema.impeller_efficiency
+capacity_note_col = schema.capacity_note
+base_frame_height_col = schema.base_frame_height
+cabling_col = schema.cabling
 
 # -----------------------------
 # Sidebar filter block per unit
 # -----------------------------
-def unit_filter_block(unit_idx, df):
+def unit_filter_block(unit_idx, dataset):
     st.markdown(f"### Select Unit {unit_idx}")
 
-    year = st.selectbox(f"Year (Unit {unit_idx})", sorted(df[year_col].dropna().unique()), key=f"year_{unit_idx}")
-    df_tmp = df[df[year_col] == year]
+    node = dataset.index.root
+    year = st.selectbox(f"Year (Unit {unit_idx})", node.options, key=f"year_{unit_idx}")
+    node = node.child(year)
 
-    quarter = st.selectbox(f"Quarter (Unit {unit_idx})", sorted(df_tmp[quarter_col].dropna().unique()), key=f"quarter_{unit_idx}")
-    df_tmp = df_tmp[df_tmp[quarter_col] == quarter]
+    quarter = st.selectbox(f"Quarter (Unit {unit_idx})", node.options, key=f"quarter_{unit_idx}")
+    node = node.child(quarter)
 
-    region = st.selectbox(f"Region (Unit {unit_idx})", sorted(df_tmp[region_col].dropna().unique()), key=f"region_{unit_idx}")
-    df_tmp = df_tmp[df_tmp[region_col] == region]
+    region = st.selectbox(f"Region (Unit {unit_idx})", node.options, key=f"region_{unit_idx}")
+    node = node.child(region)
 
-    brand = st.selectbox(f"Brand (Unit {unit_idx})", sorted(df_tmp[brand_col].dropna().unique()), key=f"brand_{unit_idx}")
-    df_tmp = df_tmp[df_tmp[brand_col] == brand]
+    brand = st.selectbox(f"Brand (Unit {unit_idx})", node.options, key=f"brand_{unit_idx}")
+    node = node.child(brand)
 
-    unit = st.selectbox(f"Unit name (Unit {unit_idx})", sorted(df_tmp[unit_name_col].dropna().unique()), key=f"unit_{unit_idx}")
-    df_tmp = df_tmp[df_tmp[unit_name_col] == unit]
+    unit = st.selectbox(f"Unit name (Unit {unit_idx})", node.options, key=f"unit_{unit_idx}")
+    node = node.child(unit)
 
-    recovery = st.selectbox(f"Recovery type (Unit {unit_idx})", sorted(df_tmp[recovery_col].dropna().unique()), key=f"recovery_{unit_idx}")
-    df_tmp = df_tmp[df_tmp[recovery_col] == recovery]
+    recovery = st.selectbox(f"Recovery type (Unit {unit_idx})", node.options, key=f"recovery_{unit_idx}")
+    node = node.child(recovery)
 
-    size = st.selectbox(f"Unit size (Unit {unit_idx})", sorted(df_tmp[size_col].dropna().unique()), key=f"size_{unit_idx}")
-    df_tmp = df_tmp[df_tmp[size_col] == size]
+    size = st.selectbox(f"Unit size (Unit {unit_idx})", node.options, key=f"size_{unit_idx}")
+    node = node.child(size)
 
     # conditional type / material filter
+    selected_type = None
+    selected_material = None
     if recovery == "RRG" and type_col:
-        types = sorted(df_tmp[type_col].dropna().unique())
-        if types:
-            selected_type = st.selectbox(f"Rotary wheel type (Unit {unit_idx})", types, key=f"type_{unit_idx}")
-            df_tmp = df_tmp[df_tmp[type_col] == selected_type]
+        types = node.branch(type_col)
+        if types.options:
+            selected_type = st.selectbox(f"Rotary wheel type (Unit {unit_idx})", types.options, key=f"type_{unit_idx}")
     elif recovery in ["HEX", "PCR"] and material_col:
-        materials = sorted(df_tmp[material_col].dropna().unique())
-        if materials:
-            selected_material = st.selectbox(f"PCR/HEX material (Unit {unit_idx})", materials, key=f"material_{unit_idx}")
-            df_tmp = df_tmp[df_tmp[material_col] == selected_material]
+        materials = node.branch(material_col)
+        if materials.options:
+            selected_material = st.selectbox(f"PCR/HEX material (Unit {unit_idx})", materials.options, key=f"material_{unit_idx}")
 
-    return df_tmp
+    selection = Selection(year=year, quarter=quarter, region=region, brand=brand, unit=unit,
+                          recovery=recovery, size=size, type=selected_type, material=selected_material)
+    # The rows shown come from the node the comparison table resolves, so the two always agree
+    return dataset.frame.iloc[dataset.node(selection).rows], selection
 
 # -----------------------------
 # Sidebar main
@@ -91,7 +95,9 @@ with st.sidebar:
     st.header("Unit Comparison Setup")
     n_units = st.slider("Number of AHUs to compare", 2, 10, 2)
     st.markdown("---")
-    filtered_units = [unit_filter_block(i, df) for i in range(1, n_units+1)]
+    blocks = [unit_filter_block(i, dataset) for i in range(1, n_units+1)]
+    filtered_units = [rows for rows, _ in blocks]
+    selections = tuple(selection for _, selection in blocks)
 
 # -----------------------------
 # Main content: Comparison
@@ -129,12 +135,12 @@ if all([not fu.empty for fu in filtered_units]):
             cols[i].write("No photo")
 
     # --- General Data Table ---
+    comparison = dataset.compare(selections).matrix
     st.subheader("General Data")
-    for col_name in df.columns:
+    for col_name, values in zip(comparison.columns, comparison.values):
         row_cols = st.columns([2] + [3]*n_units)
         row_cols[0].markdown(f"**{col_name}**")
-        for i, fu in enumerate(filtered_units):
-            val = fu[col_name].iloc[0] if col_name in fu.columns and not fu.empty else "-"
+        for i, val in enumerate(values):
             row_cols[i+1].write(val)
 
     # --- Specialized Sections ---
@@ -200,11 +206,8 @@ if all([not fu.empty for fu in filtered_units]):
     header_row = ["Parameter"] + [f"Unit {i+1}" for i in range(n_units)]
     csv_data.append(header_row)
 
-    for col in df.columns:
-        row = [col]
-        for fu in filtered_units:
-            row.append(fu[col].iloc[0] if col in fu.columns and not fu.empty else "-")
-        csv_data.append(row)
+    for col, values in zip(comparison.columns, comparison.values):
+        csv_data.append([col] + list(values))
 
     csv_df = pd.DataFrame(csv_data)
     csv_string = csv_df.to_csv(index=False, header=False)
@@ -1,102 +1,52 @@
+from functools import partial
+
 import streamlit as st
 import pandas as pd
-from PIL import Image
 import plotly.express as px
 import plotly.graph_objects as go
-import numpy as np
+
+from ahu_compare import EMPTY_NODE, DatasetHandle, Selection, UnitStates, comparison_xlsx, group_table_items, render_table_html
+from ahu_compare.charts import TraceCache, chart_title, figure_from_traces, figure_png
+from ahu_compare.images import ImageService
+from ahu_compare.report import PDF_MIME, ReportRenderer
+from ahu_compare.timing import STATS, StageTimer, emit, timing_enabled
+from ahu_compare.xlsx import XLSX_MIME
+
+# Opt-in stage timings (AHU_TIMING=1 or ?timing=1), shown in a debug panel at the bottom
+timings = StageTimer(enabled=timing_enabled(st.query_params.get("timing")))
 
 # Load data
-@st.cache_data
-def load_data():
-    # Assuming Data_2025_2.xlsx is in the same directory as app.py
-    url = "Data_2025_2.xlsx"
-    return pd.read_excel(url, sheet_name="data", engine='openpyxl')
-
-df = load_data()
-
-# Resolve potential column naming issues for robustness
-def get_column_safe(df, name_options):
-    for name in name_options:
-        if name in df.columns:
-            return name
-    return None
-
-unit_name_col = get_column_safe(df, ["Unit name", "Unit name", "Unit Name"])
-region_col = get_column_safe(df, ["Region"])
-year_col = get_column_safe(df, ["Year"])
-quarter_col = get_column_safe(df, ["Quarter"])
-recovery_col = get_column_safe(df, ["Recovery type", "Recovery Type", "Recovery_type"])
-size_col = get_column_safe(df, ["Unit size", "Unit Size"])
-brand_col = get_column_safe(df, ["Brand name", "Brand name", "Brand"])
-logo_col = get_column_safe(df, ["Brand logo", "Brand logo", "Brand Logo"])
-unit_photo_col = get_column_safe(df, ["Unit photo", "Unit photo", "Unit Photo", "Unit Photo Name"])
-unit_size_quantity_col = get_column_safe(df, ["Unit size quantity", "Unit Size quantity"])
-eurovent_model_box_col = get_column_safe(df, ["Eurovent Model Box"])
-
-# Specific columns to trigger chart or section header display
-internal_height_supply_filter_col = get_column_safe(df, ["Internal Height (Supply Filter) [mm]", "Internal Height (Supply Filter)", "Internal Height Supply Filter"])
-unit_cross_section_area_supply_fan_col = get_column_safe(df, ["Unit cross section area (Supply Fan) [m2]", "Unit cross section area (Supply Fan)", "Unit cross section area Supply Fan"])
-duct_connection_height_col = get_column_safe(df, ["Duct connection Height [mm]", "Duct connection Height", "Duct Connection Height"])
-duct_connection_diameter_col = get_column_safe(df, ["Duct connection Diameter [mm]", "Duct connection Diameter", "Duct Connection Diameter"])
-
-# New columns for dropdowns and chart
-type_col = get_column_safe(df, ["Type"])
-material_col = get_column_safe(df, ["Material"])
-capacity_range1_col = get_column_safe(df, ["Capacity range1 [kW]", "Capacity range1", "Capacity Range1"])
-capacity_range2_col = get_column_safe(df, ["Capacity range2 [kW]", "Capacity range2", "Capacity Range2"])
-capacity_range3_col = get_column_safe(df, ["Capacity range3 [kW]", "Capacity range3", "Capacity Range3"])
-heating_elements_type_col = get_column_safe(df, ["Heating elements type", "Heating Elements Type", "Heating_elements_type"])
-impeller_efficiency_col = get_column_safe(df, ["Impeller efficiency at optimal airflow [%]", "Impeller efficiency at nominal airflow [%]"])
-
-sens_efficiency_nominal_rrg_col = get_column_safe(df, ["Sens. efficiency at nominal balanced airflows_RRG [%]", "Sens. efficiency at nominal balanced airflows [%]"])
-sens_efficiency_opt_rrg_col = get_column_safe(df, ["Sens. efficiency at opt balanced airflows (ErP)_RRG [%]", "Sens. efficiency at opt balanced airflows (ErP) [%]"])
-sens_efficiency_nominal_pcr_hex_col = get_column_safe(df, ["Sens. efficiency at nominal balanced airflows_PCR/HEX [%]", "Sens. efficiency at nominal balanced airflows [%].1"])
-sens_efficiency_opt_pcr_hex_col = get_column_safe(df, ["Sens. efficiency at opt balanced airflows (ErP)_PCR/HEX [%]", "Sens. efficiency at opt balanced airflows (ErP) [%].1"])
-
-metal_sheet_thickness_external_col = get_column_safe(df, ["Metal sheet thickness (External) [mm]", "Metal sheet thickness (External)"])
-air_speed_filter_max_airflow_col = get_column_safe(df, ["Air speed on Filter at opt airflow (ErP) [m/s]", "Air speed on Filter at opt airflow (ErP)"])
-final_pd_supply_col = get_column_safe(df, ["Final PD_Supply", "Final PD_typ1"])
-final_pd_exhaust_col = get_column_safe(df, ["Final PD_Exhaust", "Final PD_typ2"])
-
-duct_connection_width_col = get_column_safe(df, ["Duct connection Width [mm]", "Duct connection Width"])
-water_heater_min_rows_col = get_column_safe(df, ["Water heater_min rows"])
-water_cooler_min_rows_col = get_column_safe(df, ["Water cooler_min rows"])
-dxh_min_rows_col = get_column_safe(df, ["DXH_min rows"])
-filter_type_supply_col = get_column_safe(df, ["Filter type_Supply"])
-filter_type_exhaust_col = get_column_safe(df, ["Filter type_Exhaust"])
-silencer_casing_col = get_column_safe(df, ["Silencer casing"])
-motor_type_col = get_column_safe(df, ["Motor type"])
-supply_col = get_column_safe(df, ["Supply"])
-capacity_note_col = get_column_safe(df, ["Capacity Note"])
-base_frame_height_col = get_column_safe(df, ["Base frame/Feets height [mm]"])
-cabling_col = get_column_safe(df, ["Cabling"])
-
-# Header trigger columns
-header_triggers_map = {
-    get_column_safe(df, ["Eurovent Certificate"]): "Certification data",
-    supply_col: "Available configurations",
-    get_column_safe(df, ["Insulation material"]): "Casing",
-    base_frame_height_col: "Construction details",
-    get_column_safe(df, ["Minimum airflow [CMH]"]): "Airflows",
-    get_column_safe(df, ["Internal Width (Supply Filter) [mm]"]): "Overall dimensions",
-    type_col: "Rotary wheel",
-    sens_efficiency_nominal_pcr_hex_col: "PCR/HEX recovery exchanger",
-    motor_type_col: "Fan section data",
-    heating_elements_type_col: "Electrical heater",
-    water_heater_min_rows_col: "Water heater",
-    water_cooler_min_rows_col: "Water cooler",
-    dxh_min_rows_col: "DX/DXH cooler",
-    filter_type_supply_col: "Supply Filter",
-    filter_type_exhaust_col: "Exhaust Filter",
-    silencer_casing_col: "Silencer data"
-}
-
-electrical_heater_chart_trigger_col = heating_elements_type_col
-
-# --- Chart coordinate column names ---
-coord_col_pairs_1_5 = [(get_column_safe(df, [f"x{i}", f"X{i}"]), get_column_safe(df, [f"y{i}", f"Y{i}"])) for i in range(1, 6)]
-coord_col_pairs_6_10 = [(get_column_safe(df, [f"x{i}", f"X{i}"]), get_column_safe(df, [f"y{i}", f"Y{i}"])) for i in range(6, 11)]
-coord_col_pairs_11_15 = [(get_column_safe(df, [f"x{i}", f"X{i}"]), get_column_safe(df, [f"y{i}", f"Y{i}"])) for i in range(11, 16)]
+@st.cache_resource
+def load_dataset_handle():
+    # Assuming Data_2025_2.xlsx is in the same directory as app.py.
+    # An edited workbook is loaded by a background thread and swapped in when ready,
+    # along with its sidebar cascade index and chart tables.
+    # With AHU_SHARED=1 all server processes on the host map one shared copy of the catalogue.
+    return DatasetHandle()
+
+with timings.stage("load"):
+    # One dataset for the whole rerun, even if a reload swaps it meanwhile
+    dataset = load_dataset_handle().dataset
+    df = dataset.frame
+
+# Column names are resolved once per header row; see ahu_compare.schema for the aliases
+schema = dataset.schema
+
+logo_col = schema.logo
+unit_photo_col = schema.unit_photo
+
+# Columns for the conditional dropdowns
+type_col = schema.type
+material_col = schema.material
+
+with timings.stage("load"):
+    cascade_index = dataset.index
+
+# Each unit's row, table column, image lookups and chart traces, kept between reruns of this
+# session and rebuilt only for the units whose selection changed
+if "unit_states" not in st.session_state:
+    st.session_state["unit_states"] = UnitStates()
+unit_states = st.session_state["unit_states"]
 
 st.title("Technical Data Comparison")
 
@@ -104,126 +54,162 @@ st.title("Technical Data Comparison")
 with st.sidebar:
     num_units = st.slider("Number of units for comparison", min_value=2, max_value=10, value=2)
 
-    filtered_dfs = []
     selections = []
 
     for i in range(num_units):
         st.markdown("---")
         # Use an expander for each unit to create the hidden/collapsible menu
-        with st.expander(f"Select Unit {i + 1}"):
+        with st.expander(f"Select Unit {i + 1}"), timings.stage("sidebar"), timings.stage(f"unit {i + 1}"):
             # Year filter
-            available_years = sorted(df[year_col].dropna().unique())
-            selected_year = st.selectbox(f"Year", available_years, key=f"year_{i}")
-            df_filtered_by_year = df[df[year_col] == selected_year]
+            node = cascade_index.root
+            selected_year = st.selectbox(f"Year", node.options, key=f"year_{i}")
+            node = node.child(selected_year)
 
             # Quarter filter
-            available_quarters = sorted(df_filtered_by_year[quarter_col].dropna().unique())
-            selected_quarter = st.selectbox(f"Quarter", available_quarters, key=f"quarter_{i}")
-            df_filtered_by_quarter = df_filtered_by_year[df_filtered_by_year[quarter_col] == selected_quarter]
+            selected_quarter = st.selectbox(f"Quarter", node.options, key=f"quarter_{i}")
+            node = node.child(selected_quarter)
 
             # Region filter
-            available_regions = sorted(df_filtered_by_quarter[region_col].dropna().unique())
-            selected_region = st.selectbox(f"Region", available_regions, key=f"region_{i}")
-            df_filtered_by_region = df_filtered_by_quarter[df_filtered_by_quarter[region_col] == selected_region]
+            selected_region = st.selectbox(f"Region", node.options, key=f"region_{i}")
+            node = node.child(selected_region)
 
             # Brand filter
-            available_brands = sorted(df_filtered_by_region[brand_col].dropna().unique())
-            selected_brand = st.selectbox(f"Select Brand", available_brands, key=f"brand_{i}")
-            df_filtered_by_brand = df_filtered_by_region[df_filtered_by_region[brand_col] == selected_brand]
+            selected_brand = st.selectbox(f"Select Brand", node.options, key=f"brand_{i}")
+            node = node.child(selected_brand)
 
             # Unit name filter
-            available_units = sorted(df_filtered_by_brand[unit_name_col].dropna().unique())
-            selected_unit = st.selectbox(f"Unit name", available_units, key=f"unit_{i}")
-            df_filtered_by_unit = df_filtered_by_brand[df_filtered_by_brand[unit_name_col] == selected_unit]
+            selected_unit = st.selectbox(f"Unit name", node.options, key=f"unit_{i}")
+            node = node.child(selected_unit)
 
             # Recovery type filter
-            available_recovery_types = sorted(df_filtered_by_unit[recovery_col].dropna().unique())
-            selected_recovery = st.selectbox(f"Recovery type", available_recovery_types, key=f"recovery_{i}")
-            df_filtered_by_recovery = df_filtered_by_unit[df_filtered_by_unit[recovery_col] == selected_recovery]
+            selected_recovery = st.selectbox(f"Recovery type", node.options, key=f"recovery_{i}")
+            node = node.child(selected_recovery)
 
             # Unit size filter
-            available_sizes = sorted(df_filtered_by_recovery[size_col].dropna().unique())
-            selected_size = st.selectbox(f"Unit size", available_sizes, key=f"size_{i}")
-            df_filtered_by_size = df_filtered_by_recovery[df_filtered_by_recovery[size_col] == selected_size]
+            selected_size = st.selectbox(f"Unit size", node.options, key=f"size_{i}")
+            node = node.child(selected_size)
 
             # Conditional dropdowns
             selected_type = None
             selected_material = None
-            df_temp_filtered = df_filtered_by_size
 
             if selected_recovery == "RRG" and type_col:
-                available_types = sorted(df_filtered_by_size[type_col].dropna().unique())
-                selected_type = st.selectbox(f"Rotary wheel type", available_types, key=f"type_{i}")
-                df_temp_filtered = df_filtered_by_size[df_filtered_by_size[type_col] == selected_type]
+                type_node = node.branch(type_col)
+                selected_type = st.selectbox(f"Rotary wheel type", type_node.options, key=f"type_{i}")
+                node = type_node.child(selected_type)
             elif selected_recovery in ["HEX", "PCR"] and material_col:
-                available_materials = sorted(df_filtered_by_size[material_col].dropna().unique())
-                selected_material = st.selectbox(f"PCR/HEX lamels material", available_materials, key=f"material_{i}")
-                df_temp_filtered = df_filtered_by_size[df_filtered_by_size[material_col] == selected_material]
+                material_node = node.branch(material_col)
+                selected_material = st.selectbox(f"PCR/HEX lamels material", material_node.options, key=f"material_{i}")
+                node = material_node.child(selected_material)
+
+        selections.append(Selection(
+            year=selected_year, quarter=selected_quarter, region=selected_region,
+            brand=selected_brand, unit=selected_unit, size=selected_size,
+            recovery=selected_recovery, type=selected_type, material=selected_material
+        ))
+
+    # --- Find Similar Units ---
+    def fill_units(slots, found):
+        """Select the units found (similar or sized) in the given sidebar slots, in order."""
+        for i, unit in zip(slots, found):
+            for field in ("year", "quarter", "region", "brand", "unit", "recovery", "size", "type", "material"):
+                value = getattr(unit.selection, field)
+                if value is not None:
+                    st.session_state[f"{field}_{i}"] = value
+
+    # Searches run only while their panel is switched on (a collapsed expander still runs its body),
+    # and each answer is kept per catalogue version and inputs, shared by all sessions
+    @st.cache_data(max_entries=256)
+    def find_similar(_dataset, version, selection, k, other_brands):
+        return _dataset.similar(selection, k=k, other_brands=other_brands)
 
-        filtered_dfs.append(df_temp_filtered)
-        selections.append({
-            "year": selected_year, "quarter": selected_quarter, "region": selected_region,
-            "brand": selected_brand, "unit": selected_unit, "size": selected_size,
-            "recovery": selected_recovery, "type": selected_type, "material": selected_material
-        })
+    st.markdown("---")
+    with st.expander("Find similar units"), timings.stage("similar"):
+        # Nearest by airflows, dimensions, cross-sections and efficiencies, within the unit's region
+        show_similar = st.checkbox("Search similar units", key="similar_show")
+        reference = st.selectbox("Reference unit", range(num_units), format_func=lambda i: f"Unit {i + 1}",
+                                 key="similar_reference")
+        num_similar = st.number_input("Number of results", min_value=1, max_value=20, value=5, key="similar_count")
+        other_brands = st.checkbox("Other brands only", value=True, key="similar_other_brands")
+        found = None
+        if show_similar:
+            found = find_similar(dataset, dataset.version, selections[reference], int(num_similar), other_brands)
+        if found:
+            st.dataframe(pd.DataFrame([{
+                "Unit": unit.selection.heading,
+                "Variant": unit.selection.type or unit.selection.material,
+                "Period": f"{unit.selection.year} {unit.selection.quarter}",
+                "Distance": round(unit.distance, 2),
+            } for unit in found]), hide_index=True)
+            st.button(f"Compare with the {min(len(found), num_units - 1)} nearest", key="similar_fill",
+                      on_click=fill_units, args=([i for i in range(num_units) if i != reference], found))
+        elif show_similar:
+            st.caption("No similar units found for this selection.")
+
+    # --- Size by Airflow ---
+    @st.cache_data(max_entries=256)
+    def find_sizes(_dataset, version, airflow, rank_by, filters):
+        return _dataset.size_for_airflow(airflow, rank_by=rank_by, limit=20, **dict(filters))
+
+    with st.expander("Size by airflow"), timings.stage("sizing"):
+        # Every unit size whose minimum to maximum airflow covers the required airflow, in any brand;
+        # the airflow index is built, and searched, only once the panel is switched on
+        show_sizing = st.checkbox("Size units by airflow", key="sizing_show")
+        if show_sizing:
+            airflow_index = dataset.airflows
+            required_airflow = st.number_input("Required airflow [CMH]", min_value=0, value=None, step=100,
+                                               key="sizing_airflow")
+            sizing_filters = {}
+            for field, label in (("recovery", "Recovery type"), ("region", "Region"), ("quarter", "Quarter")):
+                value = st.selectbox(label, ["Any"] + airflow_index.options(field), key=f"sizing_{field}")
+                sizing_filters[field] = None if value == "Any" else value
+            rank_by = st.radio("Rank by", ["air_speed", "efficiency"], key="sizing_rank", horizontal=True,
+                               format_func={"air_speed": "Filter air speed", "efficiency": "Sensible efficiency"}.get)
+            if required_airflow:
+                sized = find_sizes(dataset, dataset.version, required_airflow, rank_by,
+                                   tuple(sizing_filters.items()))
+                if sized:
+                    st.dataframe(pd.DataFrame([{
+                        "Unit": unit.selection.heading,
+                        "Variant": unit.selection.type or unit.selection.material,
+                        "Period": f"{unit.selection.year} {unit.selection.quarter}",
+                        "Air speed [m/s]": round(unit.air_speed, 2),
+                        "Sens. efficiency [%]": unit.efficiency,
+                    } for unit in sized]), hide_index=True)
+                    st.button(f"Compare the {min(len(sized), num_units)} best", key="sizing_fill",
+                              on_click=fill_units, args=(list(range(num_units)), sized))
+                else:
+                    st.caption(f"No unit size covers {required_airflow} CMH with these filters.")
+
+    # --- Quarter-over-Quarter Changes ---
+    def format_edition(edition):
+        return f"{edition[0]} {edition[1]}"
+
+    with st.expander("Quarter-over-quarter changes"):
+        # The same units of two editions aligned, and every changed parameter listed in the main area
+        editions = dataset.editions()
+        if not editions:
+            st.caption("The catalogue has no editions to compare.")
+            show_diff = False
+            diff_new = diff_old = None
+        else:
+            show_diff = st.checkbox("Show catalogue changes", key="diff_show")
+            diff_new = st.selectbox("Edition", editions, format_func=format_edition, key="diff_new")
+            diff_old = st.selectbox("Compared with", editions, index=min(1, len(editions) - 1),
+                                    format_func=format_edition, key="diff_old")
+            diff_node = cascade_index.node(*diff_new) if diff_new else EMPTY_NODE
+            diff_region = st.selectbox("Region", diff_node.options, key="diff_region")
+            diff_brand = st.selectbox("Brand", ["All brands"] + diff_node.child(diff_region).options,
+                                      key="diff_brand")
 
     # --- CSV Download Button ---
     st.markdown("---")
-    csv_header = ["Parameter"] + [f"{s['brand']} - {s['unit']} - {s['size']}" for s in selections]
-    csv_data = [csv_header]
-
-    raw_excluded_cols_base = [
-        brand_col, logo_col, unit_photo_col, year_col, quarter_col, region_col,
-        unit_name_col, recovery_col, size_col, type_col, material_col,
-        capacity_note_col, base_frame_height_col, cabling_col
-    ]
-    for pair in coord_col_pairs_1_5 + coord_col_pairs_6_10 + coord_col_pairs_11_15:
-        if pair[0]: raw_excluded_cols_base.append(pair[0])
-        if pair[1]: raw_excluded_cols_base.append(pair[1])
-
-    unit_area_col_name = get_column_safe(df, ["Unit cross section area (Supply Filter) [m2]"])
-    if unit_area_col_name: raw_excluded_cols_base.append(unit_area_col_name)
-
-    excluded_cols_from_table = list(set([col for col in raw_excluded_cols_base if col is not None]))
-    excluded_headers_from_display = set()
-
-    selected_recoveries = [s['recovery'] for s in selections]
-
-    if all(rec == "HEX" for rec in selected_recoveries):
-        if get_column_safe(df, ["Wheel diameter [mm]"]): excluded_cols_from_table.append(get_column_safe(df, ["Wheel diameter [mm]"]))
-        if get_column_safe(df, ["Distance between lamels [mm]"]): excluded_cols_from_table.append(get_column_safe(df, ["Distance between lamels [mm]"]))
-        if type_col: excluded_cols_from_table.append(type_col)
-        excluded_headers_from_display.add("Rotary wheel")
-        if sens_efficiency_nominal_rrg_col: excluded_cols_from_table.append(sens_efficiency_nominal_rrg_col)
-        if sens_efficiency_opt_rrg_col: excluded_cols_from_table.append(sens_efficiency_opt_rrg_col)
-
-    if all(rec == "RRG" for rec in selected_recoveries):
-        if material_col: excluded_cols_from_table.append(material_col)
-        if sens_efficiency_nominal_pcr_hex_col: excluded_cols_from_table.append(sens_efficiency_nominal_pcr_hex_col)
-        if sens_efficiency_opt_pcr_hex_col: excluded_cols_from_table.append(sens_efficiency_opt_pcr_hex_col)
-        excluded_headers_from_display.add("PCR/HEX recovery exchanger")
-
-    excluded_cols_from_table = list(set(excluded_cols_from_table))
-
-    csv_displayed_headers = set()
-    csv_data.append(["General data"] + [""] * num_units)
-
-    for col in df.columns:
-        triggered_header = header_triggers_map.get(col)
-        if triggered_header and triggered_header not in csv_displayed_headers and triggered_header not in excluded_headers_from_display:
-            csv_data.append([""] * (num_units + 1))
-            csv_data.append([triggered_header] + [""] * num_units)
-            csv_displayed_headers.add(triggered_header)
-
-        if col not in excluded_cols_from_table:
-            row = [col]
-            for i in range(num_units):
-                val = filtered_dfs[i][col].values[0] if not filtered_dfs[i].empty and col in filtered_dfs[i].columns else "-"
-                row.append(val)
-            csv_data.append(row)
-
-    csv_df = pd.DataFrame(csv_data)
-    csv_string = csv_df.to_csv(index=False, header=False)
+    with timings.stage("comparison"):
+        unit_states.update(dataset, selections)
+        result = unit_states.result
+        comparison = result.matrix
+    with timings.stage("csv"):
+        csv_string = unit_states.csv()
 
     st.download_button(
         label="Download Comparison as CSV",
@@ -233,294 +219,186 @@ with st.sidebar:
         key="csv_download_sidebar"
     )
 
+    # --- XLSX Download Button ---
+    def comparison_workbook(matrix, figures):
+        """Formatted comparison sheet, with the page's charts as images where they can be rendered."""
+        charts = [(chart_title(name), figure_png(fig)) for name, fig in figures.items()]
+        return comparison_xlsx(matrix, charts=charts)
+
+    # Built only when clicked, by then holding the charts drawn further down this rerun
+    chart_figures = {}
+    st.download_button(
+        label="Download Comparison as XLSX",
+        data=partial(comparison_workbook, comparison, chart_figures),
+        file_name="technical_data_comparison.xlsx",
+        mime=XLSX_MIME,
+        key="xlsx_download_sidebar"
+    )
+
+    # --- PDF Download Button ---
+    @st.cache_resource
+    def load_report_renderer():
+        # Resized images and chart images are kept for the next reports, across sessions
+        return ReportRenderer("images")
+
+    st.download_button(
+        label="Download Comparison as PDF",
+        data=partial(load_report_renderer().pdf, dataset, result),
+        file_name="technical_data_comparison.pdf",
+        mime=PDF_MIME,
+        key="pdf_download_sidebar"
+    )
+
 # --- Main Content Area ---
 
+# Resized logos and photos are cached in memory and on disk, shared by all sessions
+@st.cache_resource
+def load_image_service():
+    service = ImageService("images")
+    # Drop the disk thumbnails of images replaced or deleted since the last start
+    service.prune()
+    return service
+
+image_service = load_image_service()
+
+# Chart traces of every unit shown, shared by all sessions
+@st.cache_resource
+def load_trace_cache():
+    return TraceCache()
+
+trace_cache = load_trace_cache()
+
+def find_unit_image(i, col, what):
+    """File name of unit i's `col` image (None where unavailable) and the warning to show for it."""
+    unit = unit_states[i]
+    if not unit.found or col not in df.columns:
+        return None, None
+    raw = df.iat[unit.row_position, df.columns.get_loc(col)]
+    if pd.isna(raw) or not str(raw).strip():
+        return None, None
+    name = str(raw)
+    try:
+        image_service.native_size(name)
+    except FileNotFoundError:
+        return None, f"{what.capitalize()} not found for Unit {i+1}: images/{name}"
+    except Exception as e:
+        return None, f"Error loading {what} for Unit {i+1}: {e}"
+    return name, None
+
+def load_unit_images(col, what):
+    """Thumbnails of each unit's `col` image, scaled to the tallest one; None where unavailable."""
+    names = []
+    for i in range(num_units):
+        with timings.stage(f"unit {i + 1}"):
+            name, warning = unit_states[i].derive(("image", col), lambda: find_unit_image(i, col, what))
+        if warning:
+            st.warning(warning)
+        names.append(name)
+
+    max_height = max([image_service.native_size(name)[1] for name in names if name] or [0])
+    with timings.stage("thumbnails"):
+        loaded = image_service.thumbnails([(name, max_height) for name in names if name])
+    thumbnails = []
+    for i, name in enumerate(names):
+        thumb = loaded.pop(0) if name else None
+        if isinstance(thumb, Exception):
+            st.warning(f"Error loading {what} for Unit {i+1}: {thumb}")
+            thumb = None
+        thumbnails.append(thumb)
+    return thumbnails
+
 # --- Brand Logos ---
 st.subheader("Brand Logos")
 logo_cols = st.columns(num_units)
-loaded_logos = []
-for i in range(num_units):
-    logo_path = None
-    if not filtered_dfs[i].empty and logo_col in filtered_dfs[i].columns:
-        logo_path_raw = filtered_dfs[i][logo_col].iloc[0]
-        if pd.notna(logo_path_raw):
-            logo_path = str(logo_path_raw)
-
-    img = None
-    if logo_path and logo_path.strip():
-        try:
-            img = Image.open(f"images/{logo_path}")
-        except FileNotFoundError:
-            st.warning(f"Logo not found for Unit {i+1}: images/{logo_path}")
-        except Exception as e:
-            st.warning(f"Error loading logo for Unit {i+1}: {e}")
-    loaded_logos.append(img)
-
-max_logo_height = max([img.height for img in loaded_logos if img] or [0])
+with timings.stage("images"), timings.stage("logos"):
+    loaded_logos = load_unit_images(logo_col, "logo")
 
 for i in range(num_units):
     with logo_cols[i]:
         if loaded_logos[i]:
-            img = loaded_logos[i]
-            width = 150
-            height = int(img.height * (width / img.width))
-            if max_logo_height > 0:
-                width = int(img.width * (max_logo_height / img.height))
-                height = max_logo_height
-            st.image(img.resize((width, height)), caption=f"Logo for {selections[i]['brand']}")
+            st.image(loaded_logos[i].data, caption=f"Logo for {selections[i].brand}")
         else:
             st.write("No logo available.")
 
 # --- Unit Photos ---
 st.subheader("Unit Photo")
 photo_cols = st.columns(num_units)
-loaded_photos = []
-for i in range(num_units):
-    photo_path = None
-    if not filtered_dfs[i].empty and unit_photo_col in filtered_dfs[i].columns:
-        photo_path_raw = filtered_dfs[i][unit_photo_col].iloc[0]
-        if pd.notna(photo_path_raw):
-            photo_path = str(photo_path_raw)
-
-    img = None
-    if photo_path and photo_path.strip():
-        try:
-            img = Image.open(f"images/{photo_path}")
-        except FileNotFoundError:
-            st.warning(f"Unit photo not found for Unit {i+1}: images/{photo_path}")
-        except Exception as e:
-            st.warning(f"Error loading unit photo for Unit {i+1}: {e}")
-    loaded_photos.append(img)
-
-max_photo_height = max([img.height for img in loaded_photos if img] or [0])
+with timings.stage("images"), timings.stage("photos"):
+    loaded_photos = load_unit_images(unit_photo_col, "unit photo")
 
 for i in range(num_units):
     with photo_cols[i]:
         if loaded_photos[i]:
-            img = loaded_photos[i]
-            width = 250
-            height = int(img.height * (width / img.width))
-            if max_photo_height > 0:
-                width = int(img.width * (max_photo_height / img.height))
-                height = max_photo_height
-            st.image(img.resize((width, height)), caption=f"{selections[i]['unit']} Photo")
+            st.image(loaded_photos[i].data, caption=f"{selections[i].unit} Photo")
         else:
             st.write("No unit photo available.")
 
 
 # --- Comparison Table ---
-if not all(df.empty for df in filtered_dfs):
+if any(unit.found for unit in unit_states):
     st.subheader("General data")
 
-    # Table header
-    # Adjust column widths to make the 'Parameter' column wider
-    col_widths = [3] + [2] * num_units
-    header_cols = st.columns(col_widths)
-    with header_cols[0]:
-        st.markdown("**Parameter**")
-    for i in range(num_units):
-        with header_cols[i + 1]:
-            s = selections[i]
-            st.markdown(f'<div style="text-align: center;">**{s["brand"]} - {s["unit"]} - {s["size"]}**</div>', unsafe_allow_html=True)
-
-    displayed_headers = set()
-    display_items_ordered = []
-
-    for col_name in df.columns:
-        if col_name == get_column_safe(df, ["Execution"]):
-            if unit_size_quantity_col not in excluded_cols_from_table:
-                display_items_ordered.append({"type": "row", "col": unit_size_quantity_col})
-            display_items_ordered.append({"type": "chart", "name": "unit_area_chart"})
-            continue
-
-        header_title = header_triggers_map.get(col_name)
-        if header_title and header_title not in displayed_headers and header_title not in excluded_headers_from_display:
-            display_items_ordered.append({"type": "header", "title": header_title})
-            displayed_headers.add(header_title)
-
-        if col_name not in excluded_cols_from_table and col_name != unit_size_quantity_col:
-            display_items_ordered.append({"type": "row", "col": col_name})
-
-        if col_name == internal_height_supply_filter_col:
-            display_items_ordered.append({"type": "chart", "name": "chart1"})
-        elif col_name == unit_cross_section_area_supply_fan_col:
-            display_items_ordered.append({"type": "chart", "name": "chart2"})
-        elif col_name == duct_connection_height_col:
-            display_items_ordered.append({"type": "chart", "name": "chart3"})
-        elif col_name == electrical_heater_chart_trigger_col:
-            if capacity_range1_col: display_items_ordered.append({"type": "row", "col": capacity_range1_col})
-            if capacity_range2_col: display_items_ordered.append({"type": "row", "col": capacity_range2_col})
-            if capacity_range3_col: display_items_ordered.append({"type": "row", "col": capacity_range3_col})
-            if capacity_note_col: display_items_ordered.append({"type": "row", "col": capacity_note_col})
-            display_items_ordered.append({"type": "chart", "name": "electrical_heater_chart"})
-        elif col_name == base_frame_height_col:
-            if cabling_col: display_items_ordered.append({"type": "row", "col": cabling_col})
-
+    display_items_ordered = result.items
 
     colors = px.colors.qualitative.Plotly
 
-    for item in display_items_ordered:
-        if item["type"] == "header":
-            st.markdown(f'<h4 style="text-align: center; font-size: 1.2em; margin: 1em 0;">{item["title"]}</h4>', unsafe_allow_html=True)
-            # Re-add table headers for the new section with updated column widths
-            h_cols = st.columns(col_widths)
-            with h_cols[0]: st.markdown("**Parameter**")
-            for i in range(num_units):
-                with h_cols[i + 1]:
-                    s = selections[i]
-                    st.markdown(f'<div style="text-align: center;">**{s["brand"]} - {s["unit"]} - {s["size"]}**</div>', unsafe_allow_html=True)
-
-        elif item["type"] == "row":
-            col = item["col"]
-            # Use updated column widths for the data rows
-            row_cols = st.columns(col_widths)
-            with row_cols[0]:
-                st.write(f'<span style="font-family: sans-serif; font-size: 16px;">{col}</span>', unsafe_allow_html=True)
-            for i in range(num_units):
-                with row_cols[i + 1]:
-                    val = filtered_dfs[i][col].values[0] if not filtered_dfs[i].empty and col in filtered_dfs[i].columns else "-"
-                    color = colors[i % len(colors)]
-                    st.markdown(f'<div style="text-align: center; font-family: sans-serif; font-size: 16px; color: {color};">{val}</div>', unsafe_allow_html=True)
+    # Runs of headers and rows are drawn as one HTML table each; charts go in between
+    for item in group_table_items(display_items_ordered):
+        if item["type"] == "table":
+            with timings.stage("table"):
+                st.markdown(render_table_html(item, comparison, colors), unsafe_allow_html=True)
 
         elif item["type"] == "chart":
             chart_name = item["name"]
-            
-            if chart_name == "unit_area_chart":
-                chart_data_area = []
-                color_map_area = {}
-                unit_area_col_name = get_column_safe(df, ["Unit cross section area (Supply Filter) [m2]"])
-                if unit_area_col_name and size_col:
-                    for i in range(num_units):
-                        s = selections[i]
-                        label = f"Unit {i+1}: {s['brand']}"
-                        color_map_area[label] = colors[i % len(colors)]
-                        
-                        df_chart_base = df[
-                            (df[year_col] == s['year']) & (df[quarter_col] == s['quarter']) &
-                            (df[region_col] == s['region']) & (df[brand_col] == s['brand']) &
-                            (df[unit_name_col] == s['unit']) & (df[recovery_col] == s['recovery'])
-                        ].copy()
-
-                        if s['recovery'] == "RRG" and type_col and s['type']:
-                            df_chart_base = df_chart_base[df_chart_base[type_col] == s['type']]
-                        elif s['recovery'] in ["HEX", "PCR"] and material_col and s['material']:
-                            df_chart_base = df_chart_base[df_chart_base[material_col] == s['material']]
-
-                        if not df_chart_base.empty:
-                            for _, row in df_chart_base.iterrows():
-                                if pd.notna(row[unit_area_col_name]) and pd.notna(row[size_col]):
-                                    chart_data_area.append({
-                                        "Brand_UnitSize": f"{s['brand']} - Size {row[size_col]}",
-                                        "Unit Cross Section Area (m²)": row[unit_area_col_name],
-                                        "Unit Size": str(row[size_col]),
-                                        "Selection_Label": label,
-                                    })
-                if chart_data_area:
-                    chart_df_area = pd.DataFrame(chart_data_area)
-                    fig_area = px.scatter(chart_df_area, x="Unit Cross Section Area (m²)", y="Brand_UnitSize",
-                                          color="Selection_Label", text="Unit Size", 
-                                          title='Unit Cross Section Area (Supply Filter) vs. Unit Size',
-                                          color_discrete_map=color_map_area)
-                    fig_area.update_traces(textposition='top center')
-                    fig_area.update_layout(xaxis_title="Unit Cross Section Area (m²)", yaxis_title="Brand and Unit Size")
-                    st.plotly_chart(fig_area, use_container_width=True)
-
-
-            elif chart_name == "chart1":
-                chart_data = []
-                color_map = {}
-                for i in range(num_units):
-                    df_unit = filtered_dfs[i]
-                    s_unit = selections[i]
-                    label = f"Unit {i+1}: {s_unit['brand']} - {s_unit['size']}"
-                    color_map[label] = colors[i % len(colors)]
-                    can_plot = not df_unit.empty and all(pair[0] in df_unit.columns and pair[1] in df_unit.columns and pd.notna(df_unit[pair[0]].iloc[0]) and pd.notna(df_unit[pair[1]].iloc[0]) for pair in coord_col_pairs_1_5)
-                    if can_plot:
-                        for j, (x_name, y_name) in enumerate(coord_col_pairs_1_5):
-                            chart_data.append({'X': df_unit[x_name].values[0], 'Y': df_unit[y_name].values[0], 'Label': label, 'Order': j})
-                if chart_data:
-                    chart_df = pd.DataFrame(chart_data).sort_values(by=['Label', 'Order'])
-                    fig1 = px.line(chart_df, x="X", y="Y", color="Label", line_group="Label", markers=True, 
-                                   title='Internal Cross Section area (Supply Filter)',
-                                   color_discrete_map=color_map)
-                    fig1.update_layout(xaxis_title="Width (mm)", yaxis_title="Height (mm)", legend_title_text="Selection")
-                    fig1.update_yaxes(scaleanchor="x", scaleratio=1)
-                    st.plotly_chart(fig1, use_container_width=True)
-
-            elif chart_name == "chart2":
-                chart_data = []
-                color_map = {}
-                for i in range(num_units):
-                    df_unit = filtered_dfs[i]
-                    s_unit = selections[i]
-                    label = f"Unit {i+1}: {s_unit['brand']} - {s_unit['size']}"
-                    color_map[label] = colors[i % len(colors)]
-                    can_plot = not df_unit.empty and all(pair[0] in df_unit.columns and pair[1] in df_unit.columns and pd.notna(df_unit[pair[0]].iloc[0]) and pd.notna(df_unit[pair[1]].iloc[0]) for pair in coord_col_pairs_6_10)
-                    if can_plot:
-                        for j, (x_name, y_name) in enumerate(coord_col_pairs_6_10):
-                            chart_data.append({'X': df_unit[x_name].values[0], 'Y': df_unit[y_name].values[0], 'Label': label, 'Order': j})
-                if chart_data:
-                    chart_df = pd.DataFrame(chart_data).sort_values(by=['Label', 'Order'])
-                    fig2 = px.line(chart_df, x="X", y="Y", color="Label", line_group="Label", markers=True, 
-                                   title='Internal Cross Section area (Supply Fan)',
-                                   color_discrete_map=color_map)
-                    fig2.update_layout(xaxis_title="Width (mm)", yaxis_title="Height (mm)", legend_title_text="Selection")
-                    fig2.update_yaxes(scaleanchor="x", scaleratio=1)
-                    st.plotly_chart(fig2, use_container_width=True)
-
-            elif chart_name == "chart3":
-                chart_data = []
-                color_map = {}
-                for i in range(num_units):
-                    df_unit = filtered_dfs[i]
-                    s_unit = selections[i]
-                    label = f"Unit {i+1}: {s_unit['brand']} - {s_unit['size']}"
-                    color_map[label] = colors[i % len(colors)]
-
-                    is_rect = not df_unit.empty and any(pd.notna(df_unit[c].iloc[0]) and df_unit[c].iloc[0] != 0 for pair in coord_col_pairs_11_15 if pair[0] and pair[1] for c in pair)
-                    is_circ = not df_unit.empty and duct_connection_diameter_col in df_unit.columns and pd.notna(df_unit[duct_connection_diameter_col].iloc[0]) and df_unit[duct_connection_diameter_col].iloc[0] > 0
-
-                    if is_rect:
-                        for j, (x_name, y_name) in enumerate(coord_col_pairs_11_15):
-                             if x_name in df_unit.columns and y_name in df_unit.columns and pd.notna(df_unit[x_name].iloc[0]) and pd.notna(df_unit[y_name].iloc[0]):
-                                chart_data.append({'X': df_unit[x_name].values[0], 'Y': df_unit[y_name].values[0], 'Label': label, 'Order': j})
-                    elif is_circ:
-                        diameter = df_unit[duct_connection_diameter_col].values[0]
-                        radius = diameter / 2.0
-                        theta = np.linspace(0, 2 * np.pi, 100)
-                        for t in theta:
-                            chart_data.append({'X': radius + radius * np.cos(t), 'Y': radius + radius * np.sin(t), 'Label': label, 'Order': 0})
-
-                if chart_data:
-                    chart_df = pd.DataFrame(chart_data).sort_values(by=['Label', 'Order'])
-                    fig3 = px.line(chart_df, x="X", y="Y", color="Label", line_group="Label", markers=False, 
-                                   title='Supply Duct connection, mm',
-                                   color_discrete_map=color_map)
-                    fig3.update_layout(xaxis_title="Width (mm)", yaxis_title="Height (mm)", legend_title_text="Selection")
-                    fig3.update_yaxes(scaleanchor="x", scaleratio=1)
-                    st.plotly_chart(fig3, use_container_width=True)
-
-            elif chart_name == "electrical_heater_chart":
-                chart_data = []
-                color_map = {}
-                for i in range(num_units):
-                    df_unit = filtered_dfs[i]
-                    s_unit = selections[i]
-                    label = f"Unit {i+1}: {s_unit['brand']} - {s_unit['size']}"
-                    color_map[label] = colors[i % len(colors)]
-                    
-                    if not df_unit.empty and all(c in df_unit.columns and pd.notna(df_unit[c].iloc[0]) for c in [capacity_range1_col, capacity_range2_col, capacity_range3_col]):
-                        chart_data.append({"Capacity Range": "Range 1", "Value (kW)": df_unit[capacity_range1_col].values[0], "Selection": label})
-                        chart_data.append({"Capacity Range": "Range 2", "Value (kW)": df_unit[capacity_range2_col].values[0], "Selection": label})
-                        chart_data.append({"Capacity Range": "Range 3", "Value (kW)": df_unit[capacity_range3_col].values[0], "Selection": label})
-
-                if chart_data:
-                    chart_df = pd.DataFrame(chart_data)
-                    fig_heater = px.bar(chart_df, x="Capacity Range", y="Value (kW)", color="Selection", barmode="group", 
-                                        title='Electrical Heater Capacity (kW)',
-                                        color_discrete_map=color_map)
-                    fig_heater.update_layout(legend_title_text="Selection", yaxis_title="Capacity (kW)")
-                    st.plotly_chart(fig_heater, use_container_width=True)
+            with timings.stage("charts"), timings.stage(chart_name):
+                # Each unit's trace is built once per catalogue version and selection, for all sessions;
+                # only the figure is assembled every rerun
+                with timings.stage("traces"):
+                    traces = []
+                    for i, unit in enumerate(unit_states):
+                        traces.append(unit.derive(("trace", chart_name, tuple(colors)), lambda: trace_cache.trace(
+                            dataset, chart_name, i, unit.selection, colors, unit.row_position)))
+                with timings.stage("figure"):
+                    fig = figure_from_traces(chart_name, traces)
+                if fig is not None:
+                    chart_figures[chart_name] = fig
+                    with timings.stage("plotly_chart"):
+                        st.plotly_chart(fig, use_container_width=True)
 
 else:
     st.warning("Please make valid selections for all units to see a comparison.")
+
+# --- Catalogue changes between editions ---
+if show_diff and diff_old and diff_new:
+    with timings.stage("diff"):
+        changes = dataset.diff(diff_old, diff_new, region=diff_region,
+                               brand=None if diff_brand == "All brands" else diff_brand)
+    st.subheader(f"Catalogue changes: {format_edition(diff_old)} to {format_edition(diff_new)}, {diff_region}")
+    st.caption(f"{changes.changed_units} of {changes.matched} units changed ({len(changes.changes)} parameters), "
+               f"{len(changes.added)} added, {len(changes.removed)} removed")
+    if len(changes.changes):
+        st.dataframe(changes.changes, hide_index=True)
+    for title, units in (("Added units", changes.added), ("Removed units", changes.removed)):
+        if len(units):
+            st.caption(title)
+            st.dataframe(units, hide_index=True)
+    st.download_button(
+        label="Download changes as CSV",
+        data=changes.csv(),
+        file_name=f"catalogue_changes_{format_edition(diff_old)}_{format_edition(diff_new)}.csv".replace(" ", "_"),
+        mime="text/csv",
+        key="diff_download"
+    )
+
+# --- Timing debug panel ---
+if timings.enabled:
+    emit(timings, units=num_units, version=dataset.version)
+    with st.expander(f"Timings: {timings.elapsed * 1000:.0f} ms this rerun"):
+        st.code("\n".join(f"{'  ' * depth}{name:<{32 - 2 * depth}} {ms:10.1f} ms"
+                          for depth, path, name, ms in timings.rows()))
+        summary = STATS.summary()
+        st.caption("This process, recent reruns")
+        st.dataframe(pd.DataFrame(
+            [{"stage": path, "reruns": entry["count"], "p50 ms": entry[0.5] * 1000, "p95 ms": entry[0.95] * 1000}
+             for path, entry in summary.items()]
+        ), hide_index=True)
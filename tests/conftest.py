@@ -0,0 +1,57 @@
+"""Shared fixtures: the bundled workbook, loaded once per test session.
+
+Snapshots and thumbnails go to a temporary cache directory, never to the
+repository's ``.ahu_cache``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ahu_compare import Dataset, Selection
+from ahu_compare.loader import CACHE_DIR_ENV, DEFAULT_SHEET, _normalise_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKBOOK = os.path.join(ROOT, "Data_2025_2.xlsx")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def cache_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("ahu_cache")
+    previous = os.environ.get(CACHE_DIR_ENV)
+    os.environ[CACHE_DIR_ENV] = str(directory)
+    yield directory
+    if previous is None:
+        os.environ.pop(CACHE_DIR_ENV, None)
+    else:
+        os.environ[CACHE_DIR_ENV] = previous
+
+
+@pytest.fixture(scope="session")
+def dataset(cache_dir):
+    return Dataset.load(WORKBOOK, shared=False)
+
+
+@pytest.fixture(scope="session")
+def raw_frame():
+    """The sheet as the original app read it, mixed text/number columns kept as text (see loader)."""
+    return _normalise_frame(pd.read_excel(WORKBOOK, sheet_name=DEFAULT_SHEET, engine="openpyxl"))
+
+
+@pytest.fixture(scope="session")
+def reachable(dataset):
+    """``Selection`` of every catalogue row the sidebar can reach, in catalogue order."""
+    selections = [dataset.selection_at(pos) for pos in range(len(dataset.frame))]
+    return [s for s in selections if not dataset.node(s).empty]
+
+
+def pick(selections, count, seed):
+    """``count`` of ``selections`` drawn at random (with repeats), reproducibly."""
+    rng = np.random.default_rng(seed)
+    return [selections[i] for i in rng.integers(len(selections), size=count)]
+
+
+@pytest.fixture(scope="session")
+def unreachable():
+    return Selection(year=1900, quarter="Q0", region="-", brand="-", unit="-", recovery="RRG", size="-")
@@ -0,0 +1,56 @@
+"""CascadeIndex against the DataFrame-mask cascade the sidebar used to run on every rerun."""
+import numpy as np
+import pandas as pd
+
+from ahu_compare import EMPTY_NODE, CascadeIndex
+from ahu_compare.selection import PLATE_RECOVERIES, RRG
+
+
+def mask_options(frame, col):
+    return sorted(frame[col].dropna().unique())
+
+
+def walk(raw, node, levels, schema, path=()):
+    """Compare ``node`` with the masked ``raw`` rows below ``path``, then every child; returns nodes checked."""
+    assert np.array_equal(np.sort(node.rows), raw.index.to_numpy())
+    if levels:
+        assert node.options == mask_options(raw, levels[0])
+    else:
+        # The conditional last dropdown: Type for rotary wheels, Material for plate exchangers
+        recovery = path[-2]
+        column = schema.type if recovery == RRG else schema.material if recovery in PLATE_RECOVERIES else None
+        if column is None:
+            return 1
+        branch = node.branch(column)
+        assert branch.options == mask_options(raw, column)
+        for value in branch.options:
+            assert np.array_equal(np.sort(branch.child(value).rows), raw.index[raw[column] == value].to_numpy())
+        return 1
+
+    checked = 1
+    for value in node.options:
+        checked += walk(raw[raw[levels[0]] == value], node.child(value), levels[1:], schema, path + (value,))
+    return checked
+
+
+def test_every_node_matches_the_mask_cascade(dataset, raw_frame):
+    schema = dataset.schema
+    checked = walk(raw_frame, dataset.index.root, schema.cascade_levels, schema)
+    assert checked > len(schema.cascade_levels)
+
+
+def test_unknown_values_lead_to_the_empty_node(dataset):
+    index = dataset.index
+    year = index.root.options[0]
+    assert index.node(year, "no such quarter") is EMPTY_NODE
+    assert index.node(year, "no such quarter", "CER").options == []
+    assert index.root.child(year).branch("Type") is EMPTY_NODE
+
+
+def test_rows_missing_a_level_stop_at_that_level():
+    df = pd.DataFrame({"a": [1, 1, 2, None], "b": ["x", None, "y", "z"]})
+    index = CascadeIndex(df, ["a", "b"])
+    assert index.root.options == [1.0, 2.0]
+    assert index.node(1.0).options == ["x"]
+    assert list(index.node(1.0).rows) == [0, 1]
+    assert list(index.node(1.0, "x").rows) == [0]
@@ -0,0 +1,50 @@
+"""Chart traces and the version-keyed TraceCache."""
+import pytest
+
+from ahu_compare import Dataset
+from ahu_compare.charts import CHART_NAMES, TraceCache, figure_from_traces, unit_trace
+
+from conftest import pick
+
+
+@pytest.mark.parametrize("name", CHART_NAMES)
+def test_cached_figure_matches_a_fresh_build(dataset, reachable, name):
+    selections = pick(reachable, 3, 21)
+    positions = [dataset.row_position(s) for s in selections]
+    fresh = figure_from_traces(name, [unit_trace(name, dataset.frame, dataset.schema, i, s, pos,
+                                                 size_areas=dataset.size_areas)
+                                      for i, (s, pos) in enumerate(zip(selections, positions))])
+    cached = TraceCache().figure(dataset, name, selections)
+    assert (fresh is None) == (cached is None)
+    if fresh is not None:
+        assert cached.to_json() == fresh.to_json()
+
+
+def test_traces_are_reused_per_version_slot_and_selection(dataset, reachable):
+    cache = TraceCache(maxsize=8)
+    first, second = pick(reachable, 2, 22)
+    trace = cache.trace(dataset, "chart1", 0, first)
+    assert cache.trace(dataset, "chart1", 0, first) is trace
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.trace(dataset, "chart1", 1, first)
+    cache.trace(dataset, "chart1", 0, second)
+    assert cache.misses == 3
+
+    # Another catalogue version builds its own traces
+    reloaded = Dataset(dataset.frame, version="other")
+    cache.trace(reloaded, "chart1", 0, first)
+    assert cache.misses == 4 and len(cache) == 4
+
+
+def test_cache_is_bounded(dataset, reachable):
+    cache = TraceCache(maxsize=3)
+    for i, selection in enumerate(pick(reachable, 6, 23)):
+        cache.trace(dataset, "electrical_heater_chart", i, selection)
+    assert len(cache) == 3
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_unknown_chart(dataset, reachable):
+    with pytest.raises(KeyError):
+        TraceCache().trace(dataset, "pie_chart", 0, reachable[0])
@@ -0,0 +1,108 @@
+"""``python -m ahu_compare export`` writing every format into a directory."""
+import csv
+import json
+import os
+import re
+
+import pytest
+
+from ahu_compare import cli
+from ahu_compare.selection import CASCADE_FIELDS
+
+from conftest import ROOT, WORKBOOK, pick
+
+FIELDS = CASCADE_FIELDS + ("type", "material")
+
+
+def pdf_pages(data):
+    return len(re.findall(rb"/Type\s*/Page\b(?!s)", data))
+
+
+@pytest.fixture(scope="module")
+def sets(reachable):
+    """Two named comparisons of two units, and two rows without a set name (one comparison each)."""
+    units = pick(reachable, 6, 61)
+    return [("Topvex vs Gold", units[:2]), ("Set/2", units[2:4]), ("", units[4:])]
+
+
+def unit_values(unit):
+    return {field: "" if getattr(unit, field) is None else str(getattr(unit, field)) for field in FIELDS}
+
+
+@pytest.fixture
+def selections_csv(sets, tmp_path):
+    path = tmp_path / "sets.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, ("set",) + FIELDS)
+        writer.writeheader()
+        for name, units in sets:
+            for unit in units:
+                writer.writerow({"set": name, **unit_values(unit)})
+    return str(path)
+
+
+def run_export(selections, out, fmt, workers=1):
+    return cli.main(["--workbook", WORKBOOK, "export", selections, "-f", fmt, "-o", str(out),
+                     "-j", str(workers), "--images", os.path.join(ROOT, "images")])
+
+
+def test_read_selection_sets(selections_csv, sets):
+    read = cli.read_selection_sets(selections_csv)
+    assert [name for name, _ in read[:2]] == ["Topvex vs Gold", "Set/2"]
+    assert [len(units) for _, units in read] == [2, 2, 1, 1]
+    assert read[0][1][0]["brand"] == sets[0][1][0].brand
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_csv_export(dataset, selections_csv, tmp_path, workers):
+    out = tmp_path / "out"
+    assert run_export(selections_csv, out, "csv", workers) == 0
+    files = sorted(os.listdir(out))
+    assert files == ["Set_2.csv", "Topvex_vs_Gold.csv", "comparison_0005.csv", "comparison_0006.csv"]
+    for name, units in cli.read_selection_sets(selections_csv):
+        expected = dataset.compare([dataset.selection(values) for values in units]).csv()
+        with open(out / f"{cli._file_stem(name)}.csv", newline="", encoding="utf-8") as f:
+            assert f.read() == expected
+
+
+def test_xlsx_export(selections_csv, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    out = tmp_path / "out"
+    assert run_export(selections_csv, out, "xlsx") == 0
+    workbook = openpyxl.load_workbook(out / "Topvex_vs_Gold.xlsx")
+    assert workbook.sheetnames == ["Comparison"]
+    assert workbook.active["A1"].value == "Parameter"
+    assert len(os.listdir(out)) == 4
+
+
+def test_pdf_export(dataset, selections_csv, tmp_path):
+    pytest.importorskip("PIL")
+    from ahu_compare.report import ReportRenderer
+
+    out = tmp_path / "out"
+    assert run_export(selections_csv, out, "pdf") == 0
+    assert len(os.listdir(out)) == 4
+    renderer = ReportRenderer(os.path.join(ROOT, "images"))
+    for name, units in cli.read_selection_sets(selections_csv)[:2]:
+        data = (out / f"{cli._file_stem(name)}.pdf").read_bytes()
+        assert data.startswith(b"%PDF")
+        result = dataset.compare([dataset.selection(values) for values in units])
+        assert pdf_pages(data) == len(renderer.pages(dataset, result, title=name)) > 0
+
+
+def test_json_sets_with_repeated_names(dataset, sets, tmp_path):
+    path = tmp_path / "sets.json"
+    path.write_text(json.dumps([{"name": "Same", "units": [unit_values(u) for u in sets[0][1]]},
+                                {"name": "Same", "units": [unit_values(u) for u in sets[1][1]]},
+                                [unit_values(u) for u in sets[2][1]]]), encoding="utf-8")
+    out = tmp_path / "out"
+    assert run_export(str(path), out, "csv") == 0
+    assert sorted(os.listdir(out)) == ["Same.csv", "Same_2.csv", "comparison_0003.csv"]
+    expected = dataset.compare(sets[1][1]).csv()
+    assert (out / "Same_2.csv").read_text(encoding="utf-8") == expected
+
+
+def test_no_sets(tmp_path):
+    empty = tmp_path / "empty.csv"
+    empty.write_text("set," + ",".join(FIELDS) + "\n", encoding="utf-8")
+    assert run_export(str(empty), tmp_path / "out", "csv") == 1
@@ -0,0 +1,111 @@
+"""The comparison matrix and CSV against the cell-by-cell CSV the original app built.
+
+The one documented difference: the base frame column (whose header has two
+spaces in the workbook) is now found, so it opens the "Construction details"
+section; the reference below resolves it too.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ahu_compare import MISSING_VALUE, build_matrix, comparison_csv
+from ahu_compare.selection import PLATE_RECOVERIES, RRG
+
+from conftest import pick
+
+# Section titles by the Schema field of the column that opens them, as the original app listed them
+REFERENCE_SECTIONS = {
+    "eurovent_certificate": "Certification data",
+    "supply": "Available configurations",
+    "insulation_material": "Casing",
+    "base_frame_height": "Construction details",
+    "minimum_airflow": "Airflows",
+    "internal_width_supply_filter": "Overall dimensions",
+    "type": "Rotary wheel",
+    "sens_efficiency_nominal_pcr_hex": "PCR/HEX recovery exchanger",
+    "motor_type": "Fan section data",
+    "heating_elements_type": "Electrical heater",
+    "water_heater_min_rows": "Water heater",
+    "water_cooler_min_rows": "Water cooler",
+    "dxh_min_rows": "DX/DXH cooler",
+    "filter_type_supply": "Supply Filter",
+    "filter_type_exhaust": "Exhaust Filter",
+    "silencer_casing": "Silencer data",
+}
+
+
+def reference_rows(raw, schema, selection):
+    """Rows of ``raw`` matching ``selection``, masked level by level as the original sidebar did."""
+    rows = raw
+    for col, value in zip(schema.cascade_levels, selection.path):
+        rows = rows[rows[col] == value]
+    if selection.recovery == RRG:
+        rows = rows[rows[schema.type] == selection.type]
+    elif selection.recovery in PLATE_RECOVERIES:
+        rows = rows[rows[schema.material] == selection.material]
+    return rows
+
+
+def reference_csv(raw, schema, selections):
+    filtered = [reference_rows(raw, schema, s) for s in selections]
+    num_units = len(selections)
+    excluded = {
+        schema.brand, schema.logo, schema.unit_photo, schema.year, schema.quarter, schema.region,
+        schema.unit_name, schema.recovery, schema.size, schema.type, schema.material,
+        schema.capacity_note, schema.cabling, schema.unit_area_supply_filter,
+    }
+    excluded.update(col for pair in schema.coords for col in pair)
+    excluded_headers = set()
+    recoveries = [s.recovery for s in selections]
+    if all(rec == "HEX" for rec in recoveries):
+        excluded.update([schema.wheel_diameter, schema.distance_between_lamels, schema.type,
+                         schema.sens_efficiency_nominal_rrg, schema.sens_efficiency_opt_rrg])
+        excluded_headers.add("Rotary wheel")
+    if all(rec == "RRG" for rec in recoveries):
+        excluded.update([schema.material, schema.sens_efficiency_nominal_pcr_hex, schema.sens_efficiency_opt_pcr_hex])
+        excluded_headers.add("PCR/HEX recovery exchanger")
+    triggers = {getattr(schema, field): title for field, title in REFERENCE_SECTIONS.items()}
+
+    data = [["Parameter"] + [f"{s.brand} - {s.unit} - {s.size}" for s in selections]]
+    data.append(["General data"] + [""] * num_units)
+    shown_headers = set()
+    for col in raw.columns:
+        title = triggers.get(col)
+        if title and title not in shown_headers and title not in excluded_headers:
+            data.append([""] * (num_units + 1))
+            data.append([title] + [""] * num_units)
+            shown_headers.add(title)
+        if col not in excluded:
+            data.append([col] + [rows[col].values[0] if not rows.empty else "-" for rows in filtered])
+    return pd.DataFrame(data).to_csv(index=False, header=False)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_csv_matches_the_reference(dataset, raw_frame, reachable, seed):
+    selections = pick(reachable, 2 + seed % 4, seed)
+    result = dataset.compare(selections)
+    assert comparison_csv(result.matrix) == reference_csv(raw_frame, dataset.schema, selections)
+
+
+@pytest.mark.parametrize("recovery", ["RRG", "HEX"])
+def test_csv_for_a_single_recovery_type(dataset, raw_frame, reachable, recovery):
+    # The other exchanger's fields and section are left out
+    selections = pick([s for s in reachable if s.recovery == recovery], 3, 7)
+    assert comparison_csv(dataset.compare(selections).matrix) == reference_csv(raw_frame, dataset.schema, selections)
+
+
+def test_unmatched_selection_shows_missing_values(dataset, raw_frame, reachable, unreachable):
+    selections = pick(reachable, 1, 3) + [unreachable]
+    result = dataset.compare(selections)
+    assert result.row_positions[1] is None
+    assert set(result.matrix.values[:, 1]) == {MISSING_VALUE}
+    assert comparison_csv(result.matrix) == reference_csv(raw_frame, dataset.schema, selections)
+
+
+def test_row_reader_matches_iloc(dataset, reachable):
+    selections = pick(reachable, 4, 11)
+    positions = [dataset.row_position(s) for s in selections]
+    fast = build_matrix(dataset.frame, dataset.schema, positions, selections, dataset.rows)
+    slow = build_matrix(dataset.frame, dataset.schema, positions, selections)
+    assert comparison_csv(fast) == comparison_csv(slow)
+    assert np.array_equal(fast.shown, slow.shown)
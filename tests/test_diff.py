@@ -0,0 +1,163 @@
+"""edition_diff against a row-by-row, cell-by-cell comparison of the two editions."""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ahu_compare import Dataset, diff_columns, edition_diff
+from ahu_compare.loader import compact_frame
+from ahu_compare.selection import PLATE_RECOVERIES, RRG
+
+
+def plain(value):
+    return None if pd.isna(value) else value
+
+
+def unit_key(row, schema):
+    """Region, Brand, Unit name, Recovery type, Unit size and Type/Material of ``row``, or None if one is missing."""
+    key = [row[col] for col in schema.cascade_levels[2:]]
+    recovery = key[3]
+    variant_col = schema.type if recovery == RRG else schema.material if recovery in PLATE_RECOVERIES else None
+    variant = row[variant_col] if variant_col else None
+    if any(pd.isna(value) for value in key) or (variant_col and pd.isna(variant)):
+        return None
+    return tuple(key) + (variant,)
+
+
+def first_rows(frame, schema, edition, region, brand):
+    """Unit key -> position of its first row in ``edition``."""
+    rows = {}
+    for position, (_, row) in enumerate(frame.iterrows()):
+        if (row[schema.year], row[schema.quarter]) != edition:
+            continue
+        if region is not None and row[schema.region] != region:
+            continue
+        if brand is not None and row[schema.brand] != brand:
+            continue
+        key = unit_key(row, schema)
+        if key is not None:
+            rows.setdefault(key, position)
+    return rows
+
+
+def brute_force(frame, schema, old, new, region, brand):
+    old_rows = first_rows(frame, schema, old, region, brand)
+    new_rows = first_rows(frame, schema, new, region, brand)
+    matched = sorted((key for key in new_rows if key in old_rows), key=new_rows.get)
+    changes = []
+    for key in matched:
+        before, after = frame.iloc[old_rows[key]], frame.iloc[new_rows[key]]
+        for col in diff_columns(schema, frame.columns):
+            a, b = plain(before[col]), plain(after[col])
+            if a != b:
+                changes.append(key + (col, a, b))
+    added = sorted((key for key in new_rows if key not in old_rows), key=new_rows.get)
+    removed = sorted((key for key in old_rows if key not in new_rows), key=old_rows.get)
+    return changes, added, removed, len(matched)
+
+
+def records(frame):
+    return [tuple(plain(value) for value in record) for record in frame.itertuples(index=False, name=None)]
+
+
+def scopes(dataset):
+    index = dataset.index
+    for old, new in itertools.permutations(dataset.editions(), 2):
+        yield old, new, None, None
+        for region in index.node(*new).options:
+            yield old, new, region, None
+        brands = index.node(*new, index.node(*new).options[0]).options
+        yield old, new, index.node(*new).options[0], brands[0]
+
+
+def test_editions_to_compare(dataset):
+    assert len(dataset.editions()) >= 2
+
+
+@pytest.fixture(scope="module")
+def edited(raw_frame):
+    """The catalogue plus a "Q4" edition: a copy of the newest one with cells changed, units dropped and added."""
+    schema = Dataset(raw_frame).schema
+    newest = raw_frame[raw_frame[schema.quarter] == raw_frame[schema.quarter].max()]
+    edition = newest.copy()
+    edition[schema.quarter] = "Q4"
+    rng = np.random.default_rng(5)
+    numeric = [col for col in diff_columns(schema, edition.columns) if edition[col].dtype.kind in "if"]
+    text = [col for col in diff_columns(schema, edition.columns) if edition[col].dtype.kind not in "biuf"]
+    for n in range(len(edition)):
+        if n % 3 == 0:
+            col = numeric[rng.integers(len(numeric))]
+            edition.iloc[n, edition.columns.get_loc(col)] = edition[col].iloc[n] + 1
+        if n % 5 == 0:
+            col = text[rng.integers(len(text))]
+            edition.iloc[n, edition.columns.get_loc(col)] = "changed"
+        if n % 7 == 0:
+            col = text[rng.integers(len(text))]
+            edition.iloc[n, edition.columns.get_loc(col)] = None
+    edition = edition.drop(edition.index[4::11])
+    edition.iloc[:3, edition.columns.get_loc(schema.size)] = ["New 1", "New 2", "New 3"]
+    frame = pd.concat([raw_frame, edition], ignore_index=True)
+    return Dataset(compact_frame(frame))
+
+
+@pytest.fixture(scope="module")
+def regional(raw_frame):
+    """The catalogue plus its newest edition listed again in a second region, with other prices."""
+    schema = Dataset(raw_frame).schema
+    newest = raw_frame[raw_frame[schema.quarter] == raw_frame[schema.quarter].max()]
+    edition = newest.copy()
+    edition[schema.region] = "NOR"
+    numeric = [col for col in diff_columns(schema, edition.columns) if edition[col].dtype.kind in "if"]
+    edition[numeric[0]] = edition[numeric[0]] + 1
+    return Dataset(compact_frame(pd.concat([edition, raw_frame], ignore_index=True)))
+
+
+def test_diff_matches_brute_force(dataset, edited, regional):
+    found = 0
+    for data in (dataset, edited, regional):
+        for old, new, region, brand in scopes(data):
+            diff = data.diff(old, new, region=region, brand=brand)
+            changes, added, removed, matched = brute_force(data.frame, data.schema, old, new, region, brand)
+            assert records(diff.changes) == changes
+            assert records(diff.added) == added
+            assert records(diff.removed) == removed
+            assert diff.matched == matched
+            found += len(changes)
+    assert found
+
+
+def test_an_edition_against_itself_has_no_changes(dataset):
+    edition = dataset.editions()[0]
+    diff = edition_diff(dataset.frame, dataset.schema, edition, edition)
+    assert diff.changes.empty and diff.added.empty and diff.removed.empty
+    assert diff.matched > 0
+
+
+def test_report_csv(dataset):
+    new, old = dataset.editions()[:2]
+    region = dataset.index.node(*new).options[0]
+    diff = dataset.diff(old, new, region=region)
+    rows = diff.report_rows()
+    assert rows[0][-2:] == [f"{old[0]} {old[1]}", f"{new[0]} {new[1]}"]
+    assert len(rows) == 1 + len(diff.changes) + len(diff.added) + len(diff.removed)
+    assert diff.csv().count("\n") == len(rows)
+
+
+def test_units_are_aligned_within_their_region(regional):
+    new, old = regional.editions()[:2]
+
+    # The second region only lists the new edition: its units are added, not matched to the first region's
+    diff = regional.diff(old, new)
+    by_region = {region: regional.diff(old, new, region=region) for region in ("CER", "NOR")}
+    assert len(by_region["NOR"].added) == (diff.added["region"] == "NOR").sum() > 0
+    assert by_region["NOR"].matched == 0
+    for field in ("added", "removed", "changes"):
+        assert len(getattr(diff, field)) == sum(len(getattr(part, field)) for part in by_region.values())
+    assert diff.matched == by_region["CER"].matched
+
+    # An edition against itself matches every unit of both regions with no changes
+    diff = regional.diff(new, new)
+    assert diff.changes.empty and diff.added.empty and diff.removed.empty
+    assert diff.matched == sum(regional.diff(new, new, region=region).matched for region in ("CER", "NOR"))
+    assert diff.report_rows()[0][:2] == ["region", "brand"]
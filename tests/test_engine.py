@@ -0,0 +1,68 @@
+"""The headless engine: Dataset, compare() and importing without the app's libraries."""
+import subprocess
+import sys
+import threading
+
+from ahu_compare import Dataset, compare
+from ahu_compare.engine import default_dataset
+
+from conftest import ROOT, WORKBOOK, pick
+
+
+def test_imports_without_streamlit_plotly_or_pil():
+    blocked = ("streamlit", "plotly", "PIL")
+    code = (f"import sys; sys.modules.update(dict.fromkeys({blocked!r}))\n"
+            "import ahu_compare\n"
+            f"assert not any(name.split('.')[0] in {blocked!r} and sys.modules[name] is not None "
+            "for name in sys.modules)\n")
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_selection_round_trip(dataset, reachable):
+    for selection in reachable:
+        position = dataset.row_position(selection)
+        assert dataset.selection_at(position) == selection
+        assert position in dataset.node(selection).rows
+        assert len(dataset.unit_rows(selection)) == len(dataset.node(selection).rows)
+
+
+def test_selection_from_file_values(dataset, reachable):
+    selection = reachable[0]
+    values = {field: str(value) for field, value in vars(selection).items() if value is not None}
+    assert dataset.selection(values) == selection
+
+
+def test_compare(dataset, reachable, unreachable):
+    selections = pick(reachable, 3, 41) + [unreachable]
+    result = dataset.compare(selections)
+    assert result.selections == tuple(selections)
+    assert result.num_units == 4
+    assert result.found == (True, True, True, False)
+    assert result.row_positions[:3] == tuple(dataset.row_position(s) for s in selections[:3])
+    assert result.version == dataset.version
+    assert result.csv() == dataset.compare(selections).csv()
+    assert result.items
+
+
+def test_editions_newest_first(dataset):
+    editions = dataset.editions()
+    assert editions == sorted(editions, reverse=True)
+    assert len(set(editions)) == len(editions)
+
+
+def test_lazy_structures_are_built_once():
+    dataset = Dataset.load(WORKBOOK, shared=False)
+    built = []
+    threads = [threading.Thread(target=lambda: built.append((dataset.index, dataset.specs, dataset.similarity)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(a is b for structures in built for a, b in zip(structures, built[0]))
+
+
+def test_default_dataset_is_shared(reachable):
+    assert default_dataset(WORKBOOK) is default_dataset(WORKBOOK)
+    selections = pick(reachable, 2, 42)
+    assert compare(selections, default_dataset(WORKBOOK)).csv() == default_dataset(WORKBOOK).compare(selections).csv()
@@ -0,0 +1,100 @@
+"""ImageService: resized thumbnails in memory and on disk."""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from ahu_compare.cache import LRUCache
+from ahu_compare.images import ImageService
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for n, size in enumerate([(400, 200), (300, 300), (100, 400)]):
+        Image.new("RGB", size, (n * 80, 100, 200)).save(directory / f"unit{n}.png")
+    return directory
+
+
+@pytest.fixture
+def service(image_dir, tmp_path):
+    service = ImageService(str(image_dir), str(tmp_path / "thumbnails"), maxsize=2)
+    yield service
+    service.close()
+
+
+def disk_files(service):
+    return sorted(os.listdir(service.cache_dir)) if os.path.isdir(service.cache_dir) else []
+
+
+def test_lru_cache_evicts_the_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get_or_create("b", lambda: 4) == 4
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_thumbnail_keeps_the_aspect_ratio(service):
+    thumbnail = service.thumbnail("unit0.png", 100)
+    assert (thumbnail.width, thumbnail.height) == (200, 100)
+    with Image.open(io.BytesIO(thumbnail.data)) as img:
+        assert img.size == (200, 100) and img.format == "PNG"
+    assert service.native_size("unit2.png") == (100, 400)
+
+
+def test_memory_cache_evicts(service):
+    for n in range(3):
+        service.thumbnail(f"unit{n}.png", 50)
+    assert len(service._thumbnails) == 2
+    assert len(disk_files(service)) == 3
+
+
+def test_disk_hit_after_the_memory_cache_is_cleared(service, monkeypatch):
+    first = service.thumbnail("unit1.png", 60)
+    service._thumbnails.clear()
+
+    def no_resize(*args, **kwargs):
+        raise AssertionError("resampled again instead of reading the disk cache")
+
+    monkeypatch.setattr(Image.Image, "resize", no_resize)
+    assert service.thumbnail("unit1.png", 60) == first
+
+
+def test_replaced_image_is_redrawn_and_its_old_thumbnail_removed(service, image_dir):
+    old = service.thumbnail("unit0.png", 40)
+    Image.new("RGB", (100, 100)).save(image_dir / "unit0.png")
+    stat = os.stat(image_dir / "unit0.png")
+    os.utime(image_dir / "unit0.png", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    new = service.thumbnail("unit0.png", 40)
+    assert (new.width, old.width) == (40, 80)
+    assert len(disk_files(service)) == 1
+
+
+def test_prune_removes_thumbnails_of_replaced_and_deleted_images(service, image_dir):
+    for n in range(3):
+        service.thumbnail(f"unit{n}.png", 30)
+    service.thumbnail("unit0.png", 90)
+    assert len(disk_files(service)) == 4
+    os.remove(image_dir / "unit1.png")
+    stat = os.stat(image_dir / "unit2.png")
+    os.utime(image_dir / "unit2.png", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    open(os.path.join(service.cache_dir, "not-a-thumbnail.png"), "wb").close()
+    assert service.prune() == 3
+    assert len(disk_files(service)) == 2
+    # A missing image directory says nothing about the thumbnails
+    assert ImageService(str(image_dir / "missing"), service.cache_dir).prune() == 0
+    assert len(disk_files(service)) == 2
+
+
+def test_thumbnails_in_parallel(service):
+    results = service.thumbnails([("unit0.png", 20), ("missing.png", 20), ("unit2.png", 20)])
+    assert results[0].height == 20 and results[2].height == 20
+    assert isinstance(results[1], FileNotFoundError)
+    service.close()
+    assert service.thumbnails([("unit1.png", 25), ("unit2.png", 25)])[0].width == 25
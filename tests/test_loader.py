@@ -0,0 +1,43 @@
+"""The Feather snapshot cache of the catalogue."""
+import os
+
+import numpy as np
+
+from ahu_compare import load_catalogue, read_workbook
+from ahu_compare.loader import _prune_snapshots, snapshot_path
+
+from conftest import WORKBOOK
+
+
+def test_snapshot_loads_the_workbook_frame(cache_dir):
+    first = load_catalogue(WORKBOOK)
+    assert os.path.exists(snapshot_path(WORKBOOK))
+    again = load_catalogue(WORKBOOK)
+    assert again.equals(first)
+    assert again.equals(read_workbook(WORKBOOK))
+    # Numeric columns are views of the mapped snapshot
+    numeric = [col for col in again.columns if again[col].dtype.kind in "iuf"]
+    assert numeric and not any(again[col].to_numpy().flags.writeable for col in numeric)
+
+
+def test_prune_keeps_other_catalogues(tmp_path):
+    names = [
+        "AHU_v2.1.data.1-2.v2.feather",         # older version and format: pruned
+        "AHU_v2.1.data.3-4.v3.feather",         # current
+        "AHU_v2.1.data.x.data.5-6.v3.feather",  # workbook "AHU_v2.1.data.x"
+        "AHU_v2.data.7-8.v3.feather",           # workbook "AHU_v2"
+        "AHU_v2.1.other.1-2.v3.feather",        # other sheet
+        "AHU_v2.1.data.notes.feather",          # not a snapshot
+    ]
+    for name in names:
+        (tmp_path / name).touch()
+    _prune_snapshots(str(tmp_path / names[1]))
+    assert sorted(os.listdir(tmp_path)) == sorted(names[1:])
+
+
+def test_numbers_survive_narrowing(dataset, raw_frame):
+    for col in raw_frame.columns:
+        if raw_frame[col].dtype.kind == "f":
+            assert np.array_equal(dataset.frame[col].to_numpy(dtype=np.float64),
+                                  raw_frame[col].to_numpy(dtype=np.float64), equal_nan=True)
+            assert [str(v) for v in dataset.frame[col]] == [str(v) for v in raw_frame[col]]
@@ -0,0 +1,72 @@
+"""DatasetHandle follows the workbook in the background."""
+import os
+import shutil
+import time
+
+import pytest
+
+from ahu_compare.reload import DatasetHandle
+
+from conftest import WORKBOOK
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / os.path.basename(WORKBOOK)
+    shutil.copyfile(WORKBOOK, path)
+    return str(path)
+
+
+def bump(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_watcher_swaps_in_a_changed_workbook(workbook):
+    handle = DatasetHandle(workbook, interval=0.05)
+    try:
+        old = handle.dataset
+        assert old._similarity is not None  # warmed before it is served
+        bump(workbook)
+        assert wait_for(lambda: handle.reloads == 1)
+        new = handle.dataset
+        assert new is not old and new.version != old.version
+        assert handle.version == new.version
+        assert new._similarity is not None
+        assert new.frame.equals(old.frame)
+    finally:
+        handle.stop()
+
+
+def test_failed_reload_keeps_the_dataset(workbook):
+    handle = DatasetHandle(workbook, interval=0.05)
+    try:
+        old = handle.dataset
+        with open(workbook, "wb") as f:
+            f.write(b"not a workbook")
+        assert wait_for(lambda: handle._failed is not None)
+        assert handle.dataset is old and handle.reloads == 0
+        shutil.copyfile(WORKBOOK, workbook)
+        bump(workbook)
+        assert wait_for(lambda: handle.reloads == 1)
+        assert handle.dataset is not old and handle._failed is None
+    finally:
+        handle.stop()
+
+
+def test_no_watcher_reloads_on_demand(workbook):
+    handle = DatasetHandle(workbook, watch=False)
+    assert handle._thread is None
+    old = handle.dataset
+    bump(workbook)
+    assert handle.reload() is handle.dataset is not old
+    assert handle.reloads == 1
@@ -0,0 +1,103 @@
+"""PDF reports and the chart images drawn for them."""
+import io
+import os
+import re
+
+import pytest
+
+from ahu_compare import Dataset
+from ahu_compare.charts import CHART_NAMES, TraceCache
+from ahu_compare.report import PAGE_SIZE, ReportRenderer
+from ahu_compare.raster import figure_image
+
+from conftest import ROOT, pick
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def pdf_pages(data):
+    return len(re.findall(rb"/Type\s*/Page\b(?!s)", data))
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    return ReportRenderer(os.path.join(ROOT, "images"), str(tmp_path), maxsize=16, max_chart_files=8)
+
+
+def chart_files(renderer):
+    return sorted(os.listdir(renderer.chart_dir)) if os.path.isdir(renderer.chart_dir) else []
+
+
+@pytest.mark.parametrize("count", [1, 3, 6])
+def test_pdf_smoke(dataset, reachable, renderer, count):
+    result = dataset.compare(pick(reachable, count, 71))
+    pages = renderer.pages(dataset, result, title="Smoke")
+    assert pages and all(page.mode == "RGB" for page in pages)
+    # More units than fit in portrait are printed landscape
+    assert pages[0].size == (PAGE_SIZE if count <= 4 else PAGE_SIZE[::-1])
+    data = renderer.pdf(dataset, result, title="Smoke")
+    assert data.startswith(b"%PDF") and pdf_pages(data) == len(pages)
+
+
+def test_raster_charts(dataset, reachable):
+    selections = pick(reachable, 3, 72)
+    drawn = 0
+    for name in CHART_NAMES:
+        figure = TraceCache().figure(dataset, name, selections)
+        if figure is not None:
+            image = figure_image(figure, 600, 300)
+            assert image.size == (600, 300)
+            assert len(image.convert("L").getcolors()) > 2
+            drawn += 1
+    assert drawn
+
+
+def test_narrow_chart(dataset, reachable):
+    figure = TraceCache().figure(dataset, "unit_area_chart", pick(reachable, 3, 77))
+    assert figure_image(figure, 120, 60).size == (120, 60)
+
+
+def test_charts_are_read_back_from_disk(dataset, reachable, renderer, tmp_path):
+    result = dataset.compare(pick(reachable, 2, 73))
+    drawn = renderer.chart(dataset, result, "chart1", 500)
+    assert len(chart_files(renderer)) == 1
+    # Another renderer (e.g. another worker process) loads the same image
+    other = ReportRenderer(os.path.join(ROOT, "images"), str(tmp_path))
+    loaded = other.chart(dataset, result, "chart1", 500)
+    assert len(other.traces) == 0
+    assert loaded.tobytes() == drawn.tobytes()
+
+
+def test_prune_other_versions(dataset, reachable, renderer):
+    result = dataset.compare(pick(reachable, 2, 74))
+    os.makedirs(renderer.chart_dir)
+    for name in ("0-1.aaaa.png", "0123456789abcdef.png", f"{dataset.version}.bbbb.png"):
+        Image.new("RGB", (4, 4)).save(os.path.join(renderer.chart_dir, name))
+    renderer.chart(dataset, result, "chart1", 500)
+    files = chart_files(renderer)
+    assert len(files) == 2 and f"{dataset.version}.bbbb.png" in files
+    assert all(name.startswith(f"{dataset.version}.") for name in files)
+
+    reloaded = Dataset(dataset.frame, version="other")
+    renderer.chart(reloaded, reloaded.compare(result.selections), "chart1", 500)
+    assert [name.split(".")[0] for name in chart_files(renderer)] == ["other"]
+
+
+def test_prune_caps_the_directory(dataset, reachable, renderer):
+    # max_chart_files=8: pruned every 2 images written
+    for width in range(300, 320):
+        renderer.chart(dataset, dataset.compare(pick(reachable, 2, 75)), "chart1", width)
+    assert len(chart_files(renderer)) <= renderer.max_chart_files
+    assert renderer.prune_charts(dataset.version) == 0
+    renderer.max_chart_files = 3
+    assert renderer.prune_charts(dataset.version) == 5
+    assert len(chart_files(renderer)) == 3
+
+
+def test_pdf_to_a_file(dataset, reachable, renderer, tmp_path):
+    result = dataset.compare(pick(reachable, 2, 76))
+    path = tmp_path / "report.pdf"
+    renderer.write(dataset, result, str(path))
+    buf = io.BytesIO()
+    renderer.write(dataset, result, buf)
+    assert pdf_pages(path.read_bytes()) == pdf_pages(buf.getvalue()) > 0
@@ -0,0 +1,96 @@
+"""The JSON service over HTTP: responses, ETags and malformed requests."""
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from ahu_compare.service import MAX_BODY, make_server
+
+from conftest import WORKBOOK, pick
+
+
+@pytest.fixture(scope="module")
+def server(cache_dir):
+    server = make_server(WORKBOOK, port=0, watch=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.service.handle.stop()
+
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    yield connection
+    connection.close()
+
+
+def request(connection, method, path, body=None, headers=None):
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def units_query(selections):
+    units = [{field: value for field, value in vars(s).items() if value is not None} for s in selections]
+    return "/compare?units=" + json.dumps(units).replace(" ", "")
+
+
+def test_compare_then_not_modified(connection, reachable):
+    path = units_query(pick(reachable, 3, 1))
+    response, body = request(connection, "GET", path)
+    assert response.status == 200
+    etag = response.getheader("ETag")
+    assert etag and len(json.loads(body)["units"]) == 3
+
+    # Same connection: the 304 carries no body, so keep-alive continues
+    response, body = request(connection, "GET", path, headers={"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+    assert response.getheader("ETag") == etag
+
+    response, _ = request(connection, "GET", path, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status == 304
+    response, _ = request(connection, "GET", path, headers={"If-None-Match": '"other"'})
+    assert response.status == 200
+    response, body = request(connection, "HEAD", path, headers={"If-None-Match": etag})
+    assert response.status == 304
+
+
+def test_etag_follows_the_body(connection, reachable):
+    first, second = pick(reachable, 2, 2), pick(reachable, 2, 3)
+    tags = [request(connection, "GET", units_query(units))[0].getheader("ETag") for units in (first, second, first)]
+    assert tags[0] == tags[2] != tags[1]
+
+
+def test_post_is_never_not_modified(connection, reachable):
+    units = json.dumps([vars(s) for s in pick(reachable, 2, 4)])
+    response, _ = request(connection, "POST", "/compare", body=units)
+    etag = response.getheader("ETag")
+    response, body = request(connection, "POST", "/compare", body=units, headers={"If-None-Match": etag})
+    assert response.status == 200 and body
+
+
+def test_errors(connection):
+    assert request(connection, "GET", "/nowhere")[0].status == 404
+    assert request(connection, "GET", "/compare")[0].status == 400
+    assert request(connection, "GET", "/compare?units=[{")[0].status == 400
+    assert request(connection, "POST", "/options", body=b"{}")[0].status == 405
+    # The connection is still usable after each error
+    response, body = request(connection, "GET", "/version")
+    assert response.status == 200 and json.loads(body)["version"]
+
+
+@pytest.mark.parametrize("length, status", [("abc", 400), ("-5", 400), (str(MAX_BODY + 1), 413)])
+def test_bad_content_length(server, length, status):
+    with socket.create_connection(server.server_address[:2], timeout=10) as sock:
+        sock.sendall(f"POST /compare HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n\r\n".encode())
+        reply = b""
+        while chunk := sock.recv(65536):
+            reply += chunk
+    assert reply.startswith(f"HTTP/1.1 {status} ".encode())
+    assert b"Connection: close" in reply
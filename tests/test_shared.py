@@ -0,0 +1,59 @@
+"""The host-wide shared copy of the catalogue."""
+import os
+
+import pytest
+
+from ahu_compare import load_catalogue
+from ahu_compare.loader import SNAPSHOT_FORMAT, catalogue_version
+from ahu_compare.shared import _prune, attach, load_shared_catalogue, publish, shared_path
+
+from conftest import WORKBOOK
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def shm(tmp_path, monkeypatch):
+    monkeypatch.setenv("AHU_SHARED_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_publish_attach_round_trip(shm):
+    frame = load_catalogue(WORKBOOK)
+    target = str(shm / "catalogue.arrow")
+    publish(frame, target)
+    attached = attach(target)
+    assert attached.equals(frame)
+    assert list(attached.dtypes) == list(frame.dtypes)
+    # Numeric columns are read-only views of the mapped file
+    numeric = [col for col in attached.columns if attached[col].dtype.kind in "iuf"]
+    assert numeric and not any(attached[col].to_numpy().flags.writeable for col in numeric)
+    assert [name for name in os.listdir(shm) if name.endswith(".tmp")] == []
+
+
+def test_load_publishes_once_and_attaches(shm):
+    first = load_shared_catalogue(WORKBOOK)
+    shared = shared_path(WORKBOOK)
+    assert os.path.exists(shared)
+    assert shared.endswith(f".{catalogue_version(WORKBOOK)}.v{SNAPSHOT_FORMAT}.arrow")
+    mtime = os.stat(shared).st_mtime_ns
+    again = load_shared_catalogue(WORKBOOK)
+    assert os.stat(shared).st_mtime_ns == mtime
+    assert again.equals(first)
+    assert again.equals(load_catalogue(WORKBOOK))
+
+
+def test_prune_keeps_other_catalogues(tmp_path):
+    names = [
+        "AHU_v2.1.data.1-2.v2.arrow",         # older version and format: pruned
+        "AHU_v2.1.data.3-4.v3.arrow",         # current
+        "AHU_v2.1.data.x.data.5-6.v3.arrow",  # workbook "AHU_v2.1.data.x"
+        "AHU_v2.data.7-8.v3.arrow",           # workbook "AHU_v2"
+        "AHU_v2.1.other.1-2.v3.arrow",        # other sheet
+        "AHU_v2.1.data.notes.arrow",          # not a published catalogue
+        "AHU_v2.1.data.lock",
+    ]
+    for name in names:
+        (tmp_path / name).touch()
+    _prune(str(tmp_path / names[1]), "AHU_v2.1.data")
+    assert sorted(os.listdir(tmp_path)) == sorted(names[1:])
@@ -0,0 +1,98 @@
+"""Nearest competitors by numeric specs, with and without scipy's KD-tree."""
+import numpy as np
+import pytest
+
+from ahu_compare import similar
+from ahu_compare.similar import SimilarityIndex, UNIT_LEVELS
+from ahu_compare.selection import selection_groups
+
+from conftest import pick
+
+
+class BruteTree:
+    """Stands in for ``scipy.spatial.cKDTree``: exact ``query`` by a full scan."""
+
+    built = 0
+
+    def __init__(self, points):
+        self.points = np.asarray(points)
+        BruteTree.built += 1
+
+    def query(self, point, k=1):
+        distances = np.sqrt(((self.points - point) ** 2).sum(axis=1))
+        order = np.argsort(distances, kind="stable")[:k]
+        if k == 1:
+            return distances[order[0]], order[0]
+        return distances[order], order
+
+
+@pytest.fixture
+def scan_index(dataset, monkeypatch):
+    monkeypatch.setattr(similar, "cKDTree", None)
+    return SimilarityIndex(dataset.frame, dataset.schema, specs=dataset.specs)
+
+
+@pytest.fixture
+def tree_index(dataset, monkeypatch):
+    monkeypatch.setattr(similar, "cKDTree", BruteTree)
+    BruteTree.built = 0
+    index = SimilarityIndex(dataset.frame, dataset.schema, specs=dataset.specs)
+    assert BruteTree.built > 1
+    return index
+
+
+def test_results_are_the_rows_the_comparison_shows(dataset, reachable):
+    for selection in pick(reachable, 40, 31):
+        found = dataset.similar(selection, k=5)
+        assert found
+        for unit in found:
+            assert dataset.row_position(unit.selection) == unit.position
+            assert unit.selection.brand != selection.brand
+            assert unit.selection.region == selection.region
+        distances = [unit.distance for unit in found]
+        assert distances == sorted(distances)
+
+
+def test_scan_matches_brute_force(dataset, reachable, scan_index):
+    schema, frame = dataset.schema, dataset.frame
+    units = selection_groups(frame, schema, schema.cascade_levels[UNIT_LEVELS])
+    shown = sorted({dataset.row_position(s) for s in reachable})
+    brand, region = frame[schema.brand].astype(object), frame[schema.region].astype(object)
+    for selection in pick(reachable, 25, 32):
+        position = dataset.row_position(selection)
+        point = scan_index.points[position]
+        best = {}
+        for row in shown:
+            if brand.iat[row] == brand.iat[position] or region.iat[row] != region.iat[position]:
+                continue
+            distance = float(np.sqrt(((scan_index.points[row] - point) ** 2).sum()))
+            if units[row] not in best or distance < best[units[row]][1]:
+                best[units[row]] = (row, distance)
+        expected = sorted(best.values(), key=lambda item: item[1])[:5]
+        found = scan_index.nearest(position, k=5)
+        assert [n.distance for n in found] == pytest.approx([d for _, d in expected])
+        assert len({units[n.position] for n in found}) == len(found)
+
+
+@pytest.mark.parametrize("other_brands, same_region", [(True, True), (False, True), (True, False)])
+def test_tree_matches_scan(dataset, reachable, scan_index, tree_index, other_brands, same_region):
+    for selection in pick(reachable, 25, 33):
+        position = dataset.row_position(selection)
+        for k in (1, 5, 50):
+            scanned = scan_index.nearest(position, k, other_brands, same_region)
+            searched = tree_index.nearest(position, k, other_brands, same_region)
+            assert [n.position for n in searched] == [n.position for n in scanned]
+            assert [n.distance for n in searched] == pytest.approx([n.distance for n in scanned])
+
+
+def test_own_unit_is_left_out(dataset, reachable):
+    units = selection_groups(dataset.frame, dataset.schema, dataset.schema.cascade_levels[UNIT_LEVELS])
+    for selection in pick(reachable, 20, 34):
+        position = dataset.row_position(selection)
+        found = dataset.similarity.nearest(position, k=10, other_brands=False)
+        assert all(units[n.position] != units[position] for n in found)
+
+
+def test_nothing_to_compare(dataset, reachable, unreachable):
+    assert dataset.similar(unreachable) == []
+    assert dataset.similar(reachable[0], k=0) == []
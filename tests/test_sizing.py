@@ -0,0 +1,117 @@
+"""AirflowIndex range queries against a scan of every row."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ahu_compare import AirflowIndex, Dataset
+from ahu_compare.selection import selection_groups
+
+from conftest import WORKBOOK
+
+
+@pytest.fixture(scope="module")
+def ranges(dataset):
+    frame, schema = dataset.frame, dataset.schema
+    low = frame[schema.minimum_airflow].to_numpy(dtype=np.float64)
+    high = frame[schema.maximum_airflow].to_numpy(dtype=np.float64)
+    groups = selection_groups(frame, schema)
+    # The first row of each selection, which the sidebar and the comparison show
+    shown = np.array([groups[row] >= 0 and row == np.flatnonzero(groups == groups[row])[0]
+                      for row in range(len(frame))])
+    return low, high, groups, shown
+
+
+def scan(ranges, airflow):
+    """Shown rows covering ``airflow``, by ascending minimum airflow then catalogue order."""
+    low, high, _, shown = ranges
+    rows = np.flatnonzero((low <= airflow) & (airflow <= high) & shown)
+    return rows[np.lexsort((rows, low[rows]))]
+
+
+def airflows(ranges):
+    low, high = ranges[:2]
+    ends = np.unique(np.concatenate([low, high]))
+    return np.unique(np.concatenate([ends, ends - 1, ends + 1, (ends[:-1] + ends[1:]) / 2, [0, ends.max() * 2]]))
+
+
+def test_covering_matches_a_scan(dataset, ranges):
+    index = dataset.airflows
+    for airflow in airflows(ranges):
+        assert np.array_equal(index.covering(airflow), scan(ranges, airflow)), airflow
+
+
+def test_range_ends_are_inclusive(dataset, ranges):
+    low, high, _, shown = ranges
+    row = int(np.flatnonzero(shown)[0])
+    index = dataset.airflows
+    assert row in index.covering(low[row])
+    assert row in index.covering(high[row])
+    assert not len(index.covering(high.max() + 1))
+
+
+@pytest.mark.parametrize("rank_by", ["air_speed", "efficiency"])
+def test_search_lists_each_selection_once_best_first(dataset, ranges, rank_by):
+    index = dataset.airflows
+    groups = ranges[2]
+    recovery = dataset.frame[dataset.schema.recovery].astype(object).to_numpy()
+    for airflow in airflows(ranges)[::7]:
+        for wanted in (None, "RRG", "HEX"):
+            matches = index.search(airflow, rank_by=rank_by, recovery=wanted)
+            expected = scan(ranges, airflow)
+            if wanted is not None:
+                expected = expected[recovery[expected] == wanted]
+            positions = [m.position for m in matches]
+            assert sorted(set(groups[positions])) == sorted(set(groups[expected]))
+            assert len(set(groups[positions])) == len(positions)
+            assert sorted(positions) == sorted(expected)
+            key = [m.air_speed if rank_by == "air_speed" else -m.efficiency for m in matches]
+            finite = [k for k in key if np.isfinite(k)]
+            assert finite == sorted(finite)
+            assert key[:len(finite)] == finite
+
+
+def test_search_filters_and_limit(dataset):
+    index = dataset.airflows
+    airflow = float(np.median(dataset.frame[dataset.schema.minimum_airflow]))
+    everything = [m.position for m in index.search(airflow)]
+    assert len(everything) > 3
+    assert [m.position for m in index.search(airflow, limit=3)] == everything[:3]
+    year = index.options("year")[0]
+    by_year = [m.position for m in index.search(airflow, year=year)]
+    assert by_year and [m.position for m in index.search(airflow, year=str(year))] == by_year
+    assert index.search(airflow, region="no such region") == []
+    with pytest.raises(ValueError):
+        index.search(airflow, rank_by="price")
+    with pytest.raises(TypeError):
+        index.search(airflow, brand="Swegon")
+
+
+def test_index_without_airflow_columns(dataset):
+    frame = dataset.frame.drop(columns=[dataset.schema.minimum_airflow])
+    assert len(AirflowIndex(frame, dataset.schema)) == 0
+
+
+def test_matches_are_the_rows_the_comparison_shows(dataset, ranges):
+    for airflow in airflows(ranges)[::11]:
+        for unit in dataset.size_for_airflow(airflow):
+            assert dataset.row_position(unit.selection) == unit.position
+
+
+def test_duplicate_rows_do_not_match(dataset, ranges):
+    # A later copy of a selection's row, with an airflow range of its own
+    low, high, _, shown = ranges
+    row = int(np.flatnonzero(shown)[0])
+    frame = dataset.frame
+    copy = frame.iloc[[row]].copy()
+    copy[dataset.schema.minimum_airflow] = high.max() * 10
+    copy[dataset.schema.maximum_airflow] = high.max() * 20
+    edited = Dataset(pd.concat([frame, copy], ignore_index=True), version="copy")
+    assert edited.row_position(edited.selection_at(len(frame))) == row
+    assert edited.size_for_airflow(high.max() * 15) == []
+    assert row in [unit.position for unit in edited.size_for_airflow(low[row])]
+
+
+def test_warm_leaves_sizing_to_first_use(cache_dir):
+    dataset = Dataset.load(WORKBOOK, shared=False).warm()
+    assert dataset._similarity is not None and dataset._airflows is None
+    assert dataset.airflows is dataset.airflows
@@ -0,0 +1,80 @@
+"""Parsing the mixed-text spec cells into value, low and high."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ahu_compare import SpecTable, parse_spec
+from ahu_compare.specs import parse_column
+
+NAN = math.nan
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1.4", (1.4, 1.4, 1.4)),
+    ("6,5", (6.5, 6.5, 6.5)),
+    (" 12 ", (12.0, 12.0, 12.0)),
+    ("-3", (-3.0, -3.0, -3.0)),
+    ("1.15 (0.8)", (1.15, 0.8, 1.15)),
+    ("280 (250)", (280.0, 250.0, 280.0)),
+    ("630 (500, 560)", (630.0, 500.0, 630.0)),
+    ("630 (500; 700)", (630.0, 500.0, 700.0)),
+    (" 1-4", (NAN, 1.0, 4.0)),
+    ("4 - 1", (NAN, 1.0, 4.0)),
+    ("2..5", (NAN, 2.0, 5.0)),
+    ("2,5; 4,5; 7,5", (NAN, 2.5, 7.5)),
+    ("3, 9, 6", (NAN, 3.0, 9.0)),
+    ("L", (NAN, NAN, NAN)),
+    ("3 kW step", (NAN, NAN, NAN)),
+    ("-", (NAN, NAN, NAN)),
+    ("n/a", (NAN, NAN, NAN)),
+    ("", (NAN, NAN, NAN)),
+    (None, (NAN, NAN, NAN)),
+    (NAN, (NAN, NAN, NAN)),
+    (7, (7.0, 7.0, 7.0)),
+])
+def test_parse_spec(text, expected):
+    assert np.allclose(parse_spec(text), expected, equal_nan=True)
+
+
+def test_parse_column_spreads_each_distinct_text():
+    series = pd.Series(["1,5", "2-4", None, "1,5", "-", "x"], dtype="category")
+    parsed = parse_column(series)
+    assert np.allclose(parsed.value, [1.5, NAN, NAN, 1.5, NAN, NAN], equal_nan=True)
+    assert np.allclose(parsed.low, [1.5, 2.0, NAN, 1.5, NAN, NAN], equal_nan=True)
+    assert np.allclose(parsed.high, [1.5, 4.0, NAN, 1.5, NAN, NAN], equal_nan=True)
+
+
+def test_parse_column_leaves_mostly_text_columns():
+    assert parse_column(pd.Series(["EC", "AC", "EC", "1"])) is None
+    assert parse_column(pd.Series(["-", None, "-"])) is None
+    # Placeholders do not count against the share of rows holding a number
+    assert parse_column(pd.Series(["-", "-", "-", "2", "x"])) is not None
+
+
+def test_spec_table(dataset):
+    specs = dataset.specs
+    schema = dataset.schema
+    assert schema.type not in specs.parsed_columns
+    assert schema.unit_name not in specs.parsed_columns
+    for col in specs.parsed_columns:
+        column = specs.column(col)
+        assert len(column.value) == len(dataset.frame)
+        present = ~np.isnan(column.low)
+        assert present.any()
+        assert (column.low[present] <= column.high[present]).all()
+        assert specs.display(col).equals(dataset.frame[col])
+
+    numeric = next(col for col in dataset.frame.columns if dataset.frame[col].dtype.kind == "f")
+    assert numeric in specs
+    assert np.array_equal(specs.value(numeric), dataset.frame[numeric].to_numpy(dtype=np.float64),
+                          equal_nan=True)
+    assert specs.value(schema.unit_name) is None
+
+
+def test_spec_table_skips_identity_columns():
+    df = pd.DataFrame({"Unit size": ["1", "2", "3"], "Power [kW]": ["1,1", "2 (1.5)", "3-4"]})
+    assert SpecTable(df).parsed_columns == ["Unit size", "Power [kW]"]
+    schema = type("S", (), {"cascade_levels": ["Unit size"], "type": None, "material": None})()
+    assert SpecTable(df, schema).parsed_columns == ["Power [kW]"]
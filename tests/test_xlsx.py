@@ -0,0 +1,90 @@
+"""The comparison written as XLSX and read back with openpyxl."""
+import io
+import numbers
+
+import pytest
+
+from ahu_compare.comparison import comparison_sheet
+from ahu_compare.render import unit_color
+from ahu_compare.xlsx import SECTION_FILL, comparison_xlsx, write_comparison_xlsx
+
+from conftest import pick
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def png(width=40, height=30):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def blank(value):
+    return value is None or value == ""
+
+
+@pytest.fixture(scope="module")
+def result(dataset, reachable):
+    return dataset.compare(pick(reachable, 3, 51))
+
+
+@pytest.fixture(scope="module")
+def workbook(result, tmp_path_factory):
+    path = tmp_path_factory.mktemp("xlsx") / "comparison.xlsx"
+    write_comparison_xlsx(result.matrix, str(path), charts=[("Unit area", png()), ("Missing", None)])
+    return openpyxl.load_workbook(path)
+
+
+def test_sheets(workbook):
+    assert workbook.sheetnames == ["Comparison", "Charts"]
+    charts = workbook["Charts"]
+    assert charts["A1"].value == "Unit area"
+    assert len(charts._images) == 1
+
+
+def test_cells_match_the_comparison_sheet(workbook, result):
+    ws = workbook["Comparison"]
+    expected = list(comparison_sheet(result.matrix))
+    rows = list(ws.iter_rows(values_only=True))
+    assert len(rows) == len(expected)
+    assert list(rows[0]) == ["Parameter"] + list(result.matrix.headings)
+    checked = 0
+    for row, (kind, cells) in zip(rows, expected):
+        row = list(row) + [None] * (len(cells) - len(row))
+        for got, want in zip(row, cells):
+            if blank(want) or (isinstance(want, float) and want != want):
+                assert blank(got)
+            elif isinstance(want, numbers.Number) and not isinstance(want, bool):
+                # Numbers stay numbers, not text
+                assert isinstance(got, numbers.Number) and got == pytest.approx(float(str(want)))
+                checked += 1
+            else:
+                assert got == want
+    assert checked
+
+
+def test_styles(workbook, result):
+    ws = workbook["Comparison"]
+    assert ws.freeze_panes == "B2"
+    for j in range(result.matrix.num_units):
+        heading = ws.cell(row=1, column=j + 2)
+        assert heading.font.bold
+        assert heading.fill.fgColor.rgb == "FF" + unit_color(j).lstrip("#").upper()
+    kinds = [kind for kind, _ in comparison_sheet(result.matrix)]
+    sections = [i + 1 for i, kind in enumerate(kinds) if kind == "section"]
+    assert ws.cell(row=sections[0], column=1).value == "General data"
+    for row in sections:
+        for column in range(1, result.matrix.num_units + 2):
+            cell = ws.cell(row=row, column=column)
+            assert cell.font.bold and cell.fill.fgColor.rgb == "FF" + SECTION_FILL
+    values = kinds.index("row") + 1
+    assert ws.cell(row=values, column=2).font.color.rgb == "FF" + unit_color(0).lstrip("#").upper()
+
+
+def test_bytes_spill_to_disk_alike(result):
+    in_memory = openpyxl.load_workbook(io.BytesIO(comparison_xlsx(result.matrix)))
+    spilled = openpyxl.load_workbook(io.BytesIO(comparison_xlsx(result.matrix, spool_size=1)))
+    assert in_memory.sheetnames == spilled.sheetnames == ["Comparison"]
+    assert list(in_memory.active.values) == list(spilled.active.values)